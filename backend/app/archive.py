@@ -0,0 +1,238 @@
+"""
+Cold-storage archival for inactive sessions.
+
+Messages of a session that has been idle for N days are packed into one
+compressed blob in `session_archives` and removed from the hot `messages`
+table. They are rehydrated transparently on the next access: reading the
+history (`crud.get_session_messages`) or starting a new turn
+(`chat_engine.prepare_turn`, before the new user message is stored).
+
+Usage (batch job):
+    python -m app.archive --days 30 [--batch-size 100] [--dry-run]
+"""
+import argparse
+import json
+import logging
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CODEC = "zstd" if zstandard is not None else "zlib"
+
+
+# 1. Codecs
+def compress(data: bytes, codec: str = DEFAULT_CODEC) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd codec requested but 'zstandard' is not installed")
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    if codec == "zlib":
+        return zlib.compress(data, 9)
+    raise ValueError(f"Unknown archive codec: {codec}")
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Archive is zstd-compressed but 'zstandard' is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown archive codec: {codec}")
+
+
+# 2. Archive / rehydrate one session
+def _message_to_row(message) -> dict:
+    return {
+        "id": message.id,
+        "role": message.role,
+        "content": message.content,
+        "created_at": message.created_at.isoformat() if message.created_at else None,
+        "character_id": message.character_id,
+    }
+
+def _row_to_values(session_id: str, row: dict) -> dict:
+    created_at = row.get("created_at")
+    return {
+        "id": row["id"],
+        "session_id": session_id,
+        "role": row.get("role"),
+        "content": row.get("content"),
+        "created_at": datetime.fromisoformat(created_at) if created_at else None,
+        "character_id": row.get("character_id"),
+    }
+
+def _last_activity():
+    return func.coalesce(models.Session.last_activity_at, models.Session.created_at)
+
+def archive_session(db: Session, session_id: str, codec: str = DEFAULT_CODEC,
+                    idle_before: Optional[datetime] = None) -> Optional[dict]:
+    """
+    Move all messages of a session into one compressed blob.
+    With `idle_before`, the session is only archived if it is still idle since
+    then, checked in the same transaction that moves the rows.
+    Returns size stats, or None if there is nothing to archive.
+    """
+    # Marking the session first takes the write lock: no message can land between the check and the move
+    marked = db.query(models.Session)\
+        .filter(models.Session.id == session_id, models.Session.archived_at.is_(None))
+    if idle_before is not None:
+        marked = marked.filter(_last_activity() < idle_before)
+    if not marked.update({"archived_at": datetime.now(timezone.utc)}, synchronize_session=False):
+        db.rollback()
+        return None
+
+    messages = db.query(models.Message)\
+        .filter(models.Message.session_id == session_id)\
+        .order_by(models.Message.id.asc())\
+        .all()
+    if not messages:
+        db.rollback()
+        return None
+
+    raw = json.dumps([_message_to_row(m) for m in messages], ensure_ascii=False).encode("utf-8")
+    payload = compress(raw, codec)
+    db.add(models.SessionArchive(
+        session_id=session_id,
+        codec=codec,
+        payload=payload,
+        message_count=len(messages),
+        raw_size=len(raw),
+    ))
+    # Only the rows just packed: a message stored meanwhile stays hot
+    db.query(models.Message)\
+        .filter(models.Message.id.in_([m.id for m in messages]))\
+        .delete(synchronize_session=False)
+    db.commit()
+    return {"message_count": len(messages), "raw_size": len(raw), "compressed_size": len(payload)}
+
+def rehydrate_session(db: Session, session_id: str) -> int:
+    """
+    Restore an archived session's messages (same IDs) into the hot table and
+    mark the session active, so the next archival run does not pack it again.
+    Returns the number of archived messages, or 0 if the session was not archived.
+    Costs one primary-key lookup when there is no archive, so callers run it
+    before every history read instead of guessing from the hot rows.
+    """
+    archive = db.query(models.SessionArchive)\
+        .filter(models.SessionArchive.session_id == session_id)\
+        .first()
+    if archive is None:
+        return 0
+
+    rows = json.loads(decompress(archive.payload, archive.codec).decode("utf-8"))
+    try:
+        if rows:
+            db.execute(insert(models.Message), [_row_to_values(session_id, row) for row in rows])
+        db.delete(archive)
+        db.query(models.Session)\
+            .filter(models.Session.id == session_id)\
+            .update({"archived_at": None, "last_activity_at": datetime.now(timezone.utc)},
+                    synchronize_session=False)
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        # Usually a concurrent request rehydrated the same session first; if the blob
+        # is still there, its message IDs collide with hot rows instead
+        if db.query(models.SessionArchive.session_id)\
+                .filter(models.SessionArchive.session_id == session_id).first() is not None:
+            logger.error(f"Could not rehydrate session {session_id}: {e.orig}")
+        return len(rows)
+    logger.info(f"Rehydrated {len(rows)} archived messages for session {session_id}")
+    return len(rows)
+
+
+# 3. Batch job
+def _idle_cutoff(days: int) -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+def find_inactive_sessions(db: Session, days: int) -> List[str]:
+    """IDs of non-archived sessions with no activity in the last `days` days."""
+    rows = db.query(models.Session.id)\
+        .filter(models.Session.archived_at.is_(None), _last_activity() < _idle_cutoff(days))\
+        .order_by(_last_activity().asc())\
+        .all()
+    return [row.id for row in rows]
+
+def archive_inactive_sessions(db: Session, days: int, batch_size: int = 100,
+                              codec: str = DEFAULT_CODEC,
+                              progress: Optional[Callable[[int, int, int], None]] = None) -> dict:
+    """
+    Archive every session idle for `days` days, committing once per session.
+    A candidate that got a message while the job ran is skipped.
+    `progress(done, total, archived_messages)` is called after each batch.
+    """
+    cutoff = _idle_cutoff(days)
+    session_ids = find_inactive_sessions(db, days)
+    total = len(session_ids)
+    archived_sessions = 0
+    archived_messages = 0
+    raw_bytes = 0
+    compressed_bytes = 0
+
+    for start in range(0, total, batch_size):
+        for session_id in session_ids[start:start + batch_size]:
+            stats = archive_session(db, session_id, codec=codec, idle_before=cutoff)
+            if stats is None:
+                continue
+            archived_sessions += 1
+            archived_messages += stats["message_count"]
+            raw_bytes += stats["raw_size"]
+            compressed_bytes += stats["compressed_size"]
+        db.expunge_all()
+        if progress:
+            progress(min(start + batch_size, total), total, archived_messages)
+
+    return {
+        "candidates": total,
+        "archived_sessions": archived_sessions,
+        "archived_messages": archived_messages,
+        "raw_bytes": raw_bytes,
+        "compressed_bytes": compressed_bytes,
+        "ratio": round(compressed_bytes / raw_bytes, 3) if raw_bytes else None,
+    }
+
+
+def main():
+    from .database import SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Archive inactive chat sessions into compressed cold storage.")
+    parser.add_argument("--days", type=int, default=30, help="Archive sessions idle for at least this many days.")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--codec", choices=["zlib", "zstd"], default=DEFAULT_CODEC)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the sessions that would be archived.")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.dry_run:
+            print(f"{len(find_inactive_sessions(db, args.days))} sessions idle for {args.days}+ days")
+            return
+
+        def report(done, total, messages):
+            print(f"[{done}/{total}] sessions processed, {messages} messages archived", flush=True)
+
+        summary = archive_inactive_sessions(
+            db, args.days, batch_size=args.batch_size, codec=args.codec, progress=report
+        )
+        print(json.dumps(summary))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+In-process pub/sub of chat turns, keyed by session ID.
+
+The turn engine publishes every turn of a session once; any number of tabs
+or devices watch it through GET /api/sessions/chat/{id}/watch (SSE). Each
+event is rendered to an SSE frame once, not once per watcher, and the frames
+of a BROADCAST_FLUSH_MS window reach every watcher as a single write:
+
+    event: turn    {"content": user message, "characters": [{"id", "name"}, ...]}
+    event: delta   {"character_id", "name", "content"}
+    event: reply   {"character_id", "name", "message_id"}   reply persisted
+    event: done    {"status": "completed" | "interrupted"}
+    event: dropped {"reason": ...}   the watcher fell behind; reload the messages and reconnect
+
+Every watcher has a bounded buffer (BROADCAST_BUFFER_WRITES). Publishing
+never waits: a watcher whose buffer is full is dropped instead of slowing
+down the turn or growing without limit. Watchers only see turns handled by
+this process.
+"""
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from .session_cache import CharacterInfo
+
+
+# Pending writes per watcher; each write holds every frame of one flush window
+BROADCAST_BUFFER_WRITES = int(os.getenv("BROADCAST_BUFFER_WRITES", "64"))
+# Frames published within this window go out to every watcher as one write
+BROADCAST_FLUSH_MS = float(os.getenv("BROADCAST_FLUSH_MS", "50"))
+# Comment frames on idle streams keep proxies from closing them and expose dead clients
+BROADCAST_KEEPALIVE_SECONDS = float(os.getenv("BROADCAST_KEEPALIVE_SECONDS", "15"))
+
+_DROPPED = object()
+
+
+def _frame(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class Subscriber:
+    __slots__ = ("session_id", "queue")
+
+    def __init__(self, session_id: str, buffer_writes: int):
+        self.session_id = session_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_writes)
+
+
+class _Topic:
+    __slots__ = ("subscribers", "pending", "flush_handle")
+
+    def __init__(self):
+        self.subscribers: Set[Subscriber] = set()
+        self.pending: List[str] = []
+        self.flush_handle: Optional[asyncio.Handle] = None
+
+
+class BroadcastHub:
+    """
+    Must be used from the event loop thread (the turn engine and the watch
+    endpoint both run there).
+    """
+
+    def __init__(self, buffer_writes: int = BROADCAST_BUFFER_WRITES, flush_ms: float = BROADCAST_FLUSH_MS):
+        self.buffer_writes = buffer_writes
+        self.flush_seconds = flush_ms / 1000
+        self._topics: Dict[str, _Topic] = {}
+        self.published = 0
+        self.flushes = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, session_id: str) -> Subscriber:
+        subscriber = Subscriber(session_id, self.buffer_writes)
+        self._topics.setdefault(session_id, _Topic()).subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        topic = self._topics.get(subscriber.session_id)
+        if topic is not None:
+            topic.subscribers.discard(subscriber)
+            if not topic.subscribers:
+                if topic.flush_handle is not None:
+                    topic.flush_handle.cancel()
+                del self._topics[subscriber.session_id]
+
+    def publish(self, session_id: str, event: str, data: Dict):
+        """Render the event once and queue it for the session's next flush (no-op without watchers)."""
+        topic = self._topics.get(session_id)
+        if topic is None:
+            return
+        topic.pending.append(_frame(event, data))
+        self.published += 1
+        if topic.flush_handle is None:
+            loop = asyncio.get_running_loop()
+            topic.flush_handle = loop.call_later(self.flush_seconds, self._flush, session_id)
+
+    def _flush(self, session_id: str):
+        topic = self._topics.get(session_id)
+        if topic is None:
+            return
+        chunk = "".join(topic.pending)
+        topic.pending.clear()
+        topic.flush_handle = None
+        self.flushes += 1
+        for subscriber in list(topic.subscribers):
+            try:
+                subscriber.queue.put_nowait(chunk)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber):
+        self.unsubscribe(subscriber)
+        self.dropped += 1
+        # The backlog is useless to a dropped watcher: it has to reload anyway
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(_DROPPED)
+
+    async def stream(self, subscriber: Subscriber) -> AsyncIterator[str]:
+        """SSE frames for one watcher until it disconnects or is dropped."""
+        try:
+            yield ": watching\n\n"
+            while True:
+                try:
+                    async with asyncio.timeout(BROADCAST_KEEPALIVE_SECONDS):
+                        chunk = await subscriber.queue.get()
+                except TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if chunk is _DROPPED:
+                    yield _frame("dropped", {"reason": "watcher fell behind"})
+                    return
+                yield chunk
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> Dict:
+        return {
+            "sessions": len(self._topics),
+            "watchers": sum(len(topic.subscribers) for topic in self._topics.values()),
+            "buffer_writes": self.buffer_writes,
+            "flush_ms": self.flush_seconds * 1000,
+            "published": self.published,
+            "flushes": self.flushes,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+hub = BroadcastHub()
+
+
+def publish_turn_start(session_id: str, content: str, characters: List[CharacterInfo]):
+    hub.publish(session_id, "turn", {
+        "content": content,
+        "characters": [{"id": character.id, "name": character.name} for character in characters],
+    })
+
+
+def publish_turn_event(session_id: str, event: Dict):
+    """Forward one chat_engine event (delta / end) to the session's watchers."""
+    character = event["character"]
+    if event["type"] == "delta":
+        hub.publish(session_id, "delta", {
+            "character_id": character.id, "name": character.name, "content": event["content"]
+        })
+    else:
+        hub.publish(session_id, "reply", {
+            "character_id": character.id, "name": character.name, "message_id": event["message_id"]
+        })
+
+
+def publish_turn_end(session_id: str, status: str):
+    hub.publish(session_id, "done", {"status": status})
@@ -0,0 +1,86 @@
+"""
+Pluggable cache shared by the CRUD and LLM layers.
+
+The backend is chosen once per process from the environment:
+
+    CACHE_BACKEND=memory  (default)  in-process LRU, per worker
+    CACHE_BACKEND=sqlite  CACHE_URL=/tmp/guruchat-cache.db   shared by workers on one host
+    CACHE_BACKEND=redis   CACHE_URL=redis://localhost:6379/0 shared across hosts
+                          (falls back to an in-process cache while unreachable)
+
+Callers only use `get_cache(namespace, ...)` and the returned `Cache`.
+"""
+import os
+import threading
+from typing import Dict, Optional
+
+from .base import Cache, CacheBackend, Serializer, JSON_SERIALIZER, PICKLE_SERIALIZER, dataclass_serializer
+from .fallback import FallbackBackend
+from .memory import MemoryBackend
+from .sqlite_file import SQLiteFileBackend
+from .redis_backend import RedisBackend
+
+
+_backend: Optional[CacheBackend] = None
+_caches: Dict[str, Cache] = {}
+_lock = threading.Lock()
+
+
+def create_backend(kind: str = None, url: str = None) -> CacheBackend:
+    kind = (kind or os.getenv("CACHE_BACKEND", "memory")).lower()
+    url = url or os.getenv("CACHE_URL")
+    maxsize = int(os.getenv("CACHE_MAX_ENTRIES", "20000"))
+    if kind == "memory":
+        return MemoryBackend(maxsize=maxsize)
+    if kind == "sqlite":
+        return SQLiteFileBackend(url or "./cache.db")
+    if kind == "redis":
+        return FallbackBackend(RedisBackend(url or "redis://localhost:6379/0"),
+                               make_fallback=lambda: MemoryBackend(maxsize=maxsize))
+    raise ValueError(f"Unknown CACHE_BACKEND: {kind}")
+
+
+def get_backend() -> CacheBackend:
+    global _backend
+    with _lock:
+        if _backend is None:
+            _backend = create_backend()
+        return _backend
+
+
+def set_backend(backend: CacheBackend):
+    """Swap the process-wide backend (existing Cache objects follow the new one)."""
+    global _backend
+    with _lock:
+        _backend = backend
+        for cache in _caches.values():
+            cache.backend = backend
+            cache._version = None
+
+
+def get_cache(namespace: str, serializer: Serializer = JSON_SERIALIZER,
+              default_ttl: Optional[float] = None, local_ttl: Optional[float] = None) -> Cache:
+    """
+    Return the process-wide Cache for a namespace (created on first use).
+    Give namespaces that are invalidated on writes a local_ttl (see Cache).
+    """
+    backend = get_backend()
+    with _lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = Cache(backend, namespace, serializer=serializer, default_ttl=default_ttl,
+                          local_ttl=local_ttl)
+            _caches[namespace] = cache
+        return cache
+
+
+def all_cache_stats() -> Dict[str, Dict]:
+    with _lock:
+        return {namespace: cache.stats() for namespace, cache in _caches.items()}
+
+
+__all__ = [
+    "Cache", "CacheBackend", "Serializer", "JSON_SERIALIZER", "PICKLE_SERIALIZER", "dataclass_serializer",
+    "FallbackBackend", "MemoryBackend", "SQLiteFileBackend", "RedisBackend",
+    "create_backend", "get_backend", "set_backend", "get_cache", "all_cache_stats",
+]
@@ -0,0 +1,167 @@
+"""Backend-agnostic cache front-end: namespaces, TTLs, versioned invalidation, serialization."""
+import json
+import os
+import pickle
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Callable, Dict, Optional, get_origin
+
+
+class BackendError(Exception):
+    """The backend answered with an error; FallbackBackend treats it like an outage."""
+
+
+class CacheBackend(ABC):
+    """Raw byte store. Implementations must be safe to call from several threads."""
+
+    name = "base"
+    # True when every worker sees the same entries, so deletes and clear() reach all of them
+    shared = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        """Atomically increment an integer counter (created at 0) and return the new value."""
+
+    def get_counter(self, key: str) -> int:
+        value = self.get(key)
+        return int(value) if value is not None else 0
+
+    def probe(self, timeout: float):
+        """Raise if the backend cannot serve calls; remote backends should give up after `timeout`."""
+        self.get("__probe__")
+
+    def close(self):
+        pass
+
+
+@dataclass(frozen=True)
+class Serializer:
+    """Hooks turning values into bytes and back."""
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+
+
+JSON_SERIALIZER = Serializer(
+    dumps=lambda value: json.dumps(value, ensure_ascii=False).encode("utf-8"),
+    loads=lambda data: json.loads(data.decode("utf-8")),
+)
+
+PICKLE_SERIALIZER = Serializer(dumps=pickle.dumps, loads=pickle.loads)
+
+
+def dataclass_serializer(cls) -> Serializer:
+    """JSON serializer for a (frozen) dataclass; list fields come back as tuples where declared."""
+    tuple_fields = {f.name for f in fields(cls) if get_origin(f.type) is tuple}
+
+    def loads(data: bytes):
+        values = json.loads(data.decode("utf-8"))
+        for name in tuple_fields:
+            if isinstance(values.get(name), list):
+                values[name] = tuple(values[name])
+        return cls(**values)
+
+    return Serializer(dumps=lambda value: JSON_SERIALIZER.dumps(asdict(value)), loads=loads)
+
+
+# Namespace versions are re-read from the backend at most this often
+VERSION_CHECK_SECONDS = float(os.getenv("CACHE_VERSION_CHECK_SECONDS", "1.0"))
+
+
+class Cache:
+    """
+    One namespace of a backend.
+
+    `clear()` bumps the namespace version stored in the backend, which every
+    worker sharing the backend picks up within VERSION_CHECK_SECONDS. Per-key
+    `delete()` is visible to other workers immediately.
+
+    On a process-local backend invalidations never reach the other workers;
+    `local_ttl` then caps how long an entry can be served stale.
+    """
+
+    def __init__(self, backend: CacheBackend, namespace: str,
+                 serializer: Serializer = JSON_SERIALIZER, default_ttl: Optional[float] = None,
+                 local_ttl: Optional[float] = None):
+        self.backend = backend
+        self.namespace = namespace
+        self.serializer = serializer
+        self.default_ttl = default_ttl
+        self.local_ttl = local_ttl
+        self._version_key = f"__version__:{namespace}"
+        self._version = None
+        self._version_checked_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.queries_saved = 0
+
+    def _current_version(self) -> int:
+        now = time.monotonic()
+        if self._version is None or now - self._version_checked_at >= VERSION_CHECK_SECONDS:
+            self._version = self.backend.get_counter(self._version_key)
+            self._version_checked_at = now
+        return self._version
+
+    def version(self) -> int:
+        """Current namespace version; changes on every `clear()`."""
+        return self._current_version()
+
+    def _key(self, key) -> str:
+        return f"{self.namespace}:v{self._current_version()}:{key}"
+
+    def get(self, key, default=None, queries_saved: int = 1):
+        data = self.backend.get(self._key(key))
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.queries_saved += queries_saved
+        if data is None:
+            return default
+        return self.serializer.loads(data)
+
+    def count_saved(self, queries: int = 1):
+        """Record queries avoided by a lookup that spans several entries (see `get(queries_saved=0)`)."""
+        with self._lock:
+            self.queries_saved += queries
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = ttl if ttl is not None else self.default_ttl
+        if self.local_ttl is not None and not self.backend.shared:
+            ttl = min(ttl, self.local_ttl) if ttl else self.local_ttl
+        self.backend.set(self._key(key), self.serializer.dumps(value), ttl)
+
+    def delete(self, key):
+        self.backend.delete(self._key(key))
+
+    def clear(self):
+        """Invalidate the whole namespace for every worker sharing the backend."""
+        self._version = self.backend.incr(self._version_key)
+        self._version_checked_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "queries_saved": self.queries_saved,
+                "queries_saved_per_request": round(self.queries_saved / lookups, 4) if lookups else None,
+            }
@@ -0,0 +1,146 @@
+"""
+Embedded fake Redis server for local development and testing.
+
+Implements just the commands RedisBackend uses (PING, GET, SET [EX|PX], DEL,
+INCR, FLUSHALL) on a background thread:
+
+    server = FakeRedisServer().start()
+    backend = RedisBackend(server.url)
+    ...
+    server.stop()
+"""
+import socket
+import socketserver
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+class _Store:
+    def __init__(self):
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.server.connections.add(self.connection)
+
+    def finish(self):
+        self.server.connections.discard(self.connection)
+        super().finish()
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.strip().split()  # inline command (e.g. from telnet)
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _reply(self, value):
+        if value is None:
+            self.wfile.write(b"$-1\r\n")
+        elif isinstance(value, int):
+            self.wfile.write(b":%d\r\n" % value)
+        elif isinstance(value, str):
+            self.wfile.write(f"+{value}\r\n".encode())
+        elif isinstance(value, Exception):
+            self.wfile.write(f"-ERR {value}\r\n".encode())
+        else:
+            self.wfile.write(b"$%d\r\n%s\r\n" % (len(value), value))
+
+    def handle(self):
+        store: _Store = self.server.store
+        while True:
+            try:
+                args = self._read_command()
+            except (ConnectionError, OSError, ValueError):
+                return  # dropped by stop() or the client
+            if args is None:
+                return
+            if not args:
+                continue
+            command = args[0].upper()
+            with store.lock:
+                try:
+                    result = self._dispatch(store, command, args[1:])
+                except Exception as e:
+                    result = e
+            self._reply(result)
+
+    @staticmethod
+    def _dispatch(store: _Store, command: bytes, args):
+        if command == b"PING":
+            return "PONG"
+        if command in (b"SELECT", b"AUTH"):
+            return "OK"
+        if command == b"GET":
+            return store.get(args[0])
+        if command == b"SET":
+            expires_at = None
+            if len(args) >= 4 and args[2].upper() in (b"EX", b"PX"):
+                seconds = int(args[3]) / (1000 if args[2].upper() == b"PX" else 1)
+                expires_at = time.monotonic() + seconds
+            store.data[args[0]] = (args[1], expires_at)
+            return "OK"
+        if command == b"DEL":
+            return sum(1 for key in args if store.data.pop(key, None) is not None)
+        if command == b"INCR":
+            value = int(store.get(args[0]) or 0) + 1
+            store.data[args[0]] = (str(value).encode(), None)
+            return value
+        if command == b"FLUSHALL":
+            store.data.clear()
+            return "OK"
+        raise ValueError(f"unknown command '{command.decode()}'")
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeRedisServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, store: Optional[_Store] = None):
+        self._server = _ThreadingServer((host, port), _RespHandler)
+        # Pass the store of a stopped server to "restart" it with its data
+        self.store = self._server.store = store or _Store()
+        self._server.connections = set()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> "FakeRedisServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop listening and drop every client connection, like a server going away."""
+        self._server.shutdown()
+        self._server.server_close()
+        for connection in list(self._server.connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            connection.close()
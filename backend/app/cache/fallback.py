@@ -0,0 +1,135 @@
+"""
+Shared backend with a process-local stand-in for when it is unreachable.
+
+While the primary (Redis) is down or answers with errors, every call goes to
+a fresh in-process backend instead of raising. The primary is probed again
+every CACHE_RETRY_SECONDS by one caller, with a short CACHE_PROBE_TIMEOUT_SECONDS;
+the others keep using the fallback meanwhile instead of waiting on it. `shared` is False meanwhile, so namespaces with a
+`local_ttl` only cache briefly. Deletes and namespace clears made during the
+outage are replayed on the primary when it comes back, so it never serves an
+entry that was invalidated while it was away.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from .base import BackendError, CacheBackend
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_RETRY_SECONDS = float(os.getenv("CACHE_RETRY_SECONDS", "5"))
+CACHE_PROBE_TIMEOUT_SECONDS = float(os.getenv("CACHE_PROBE_TIMEOUT_SECONDS", "0.2"))
+# Connection problems and error replies alike send calls to the fallback
+BACKEND_FAILURES = (ConnectionError, OSError, BackendError)
+# Invalidations kept for replay; an outage with more than this many can leave stale entries
+MAX_PENDING_INVALIDATIONS = 10000
+
+
+class FallbackBackend(CacheBackend):
+    def __init__(self, primary: CacheBackend, make_fallback: Callable[[], CacheBackend],
+                 retry_seconds: float = CACHE_RETRY_SECONDS,
+                 probe_timeout: float = CACHE_PROBE_TIMEOUT_SECONDS):
+        self.primary = primary
+        self.make_fallback = make_fallback
+        self.retry_seconds = retry_seconds
+        self.probe_timeout = probe_timeout
+        self.fallback: Optional[CacheBackend] = None
+        self._retry_at = 0.0
+        self._probing = False
+        # key -> "delete" | "incr", in order; replayed on the primary after an outage
+        self._pending: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.outages = 0
+
+    @property
+    def name(self) -> str:
+        if self.fallback is None:
+            return self.primary.name
+        return f"{self.fallback.name} (fallback: {self.primary.name} unreachable)"
+
+    @property
+    def shared(self) -> bool:
+        return self.fallback is None and self.primary.shared
+
+    def _backend(self) -> CacheBackend:
+        """The backend to use for the next call; retries the primary when due."""
+        with self._lock:
+            if self.fallback is None:
+                return self.primary
+            if self._probing or time.monotonic() < self._retry_at:
+                return self.fallback
+            self._probing = True
+            fallback = self.fallback
+        # Probed without the lock: a blackholed primary only holds up this one call
+        try:
+            self.primary.probe(self.probe_timeout)
+        except BACKEND_FAILURES:
+            with self._lock:
+                self._probing = False
+                self._retry_at = time.monotonic() + self.retry_seconds
+            return fallback
+
+        with self._lock:
+            self._probing = False
+            try:
+                for key, operation in self._pending.items():
+                    if operation == "incr":
+                        self.primary.incr(key)
+                    else:
+                        self.primary.delete(key)
+            except BACKEND_FAILURES:
+                self._retry_at = time.monotonic() + self.retry_seconds
+                return self.fallback
+            logger.info(f"Cache backend {self.primary.name} is back; "
+                        f"replayed {len(self._pending)} invalidations")
+            self._pending.clear()
+            self.fallback = None
+            return self.primary
+
+    def _primary_failed(self, error: Exception) -> CacheBackend:
+        with self._lock:
+            if self.fallback is None:
+                logger.warning(f"Cache backend {self.primary.name} unreachable ({error}); "
+                               f"using an in-process cache, retrying every {self.retry_seconds}s")
+                self.outages += 1
+                # Fresh each outage: entries kept from an earlier one may have been invalidated since
+                self.fallback = self.make_fallback()
+            self._retry_at = time.monotonic() + self.retry_seconds
+            return self.fallback
+
+    def _remember(self, key: str, operation: str):
+        with self._lock:
+            if self.fallback is not None and (key in self._pending or len(self._pending) < MAX_PENDING_INVALIDATIONS):
+                self._pending[key] = operation
+
+    def _call(self, method: str, *args):
+        backend = self._backend()
+        if backend is self.primary:
+            try:
+                return getattr(backend, method)(*args)
+            except BACKEND_FAILURES as e:
+                backend = self._primary_failed(e)
+        return getattr(backend, method)(*args)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._call("get", key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self._call("set", key, value, ttl)
+
+    def delete(self, key: str):
+        self._call("delete", key)
+        self._remember(key, "delete")
+
+    def incr(self, key: str) -> int:
+        value = self._call("incr", key)
+        self._remember(key, "incr")
+        return value
+
+    def close(self):
+        self.primary.close()
+        if self.fallback is not None:
+            self.fallback.close()
@@ -0,0 +1,159 @@
+"""
+Redis-protocol backend.
+
+Speaks RESP2 over a plain socket (no client library needed), so it works
+with Redis, Valkey, KeyDB or the embedded fake in `fake_redis.py`.
+"""
+import socket
+import threading
+from typing import List, Optional
+from urllib.parse import urlparse
+
+from .base import BackendError, CacheBackend
+
+
+class RedisError(BackendError):
+    """An error reply (NOAUTH, WRONGTYPE, ...)."""
+
+
+class RespConnection:
+    """One blocking RESP2 connection."""
+
+    def __init__(self, host: str, port: int, db: int = 0, password: Optional[str] = None,
+                 timeout: float = 2.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.reader = self.sock.makefile("rb")
+        try:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if password:
+                self.execute("AUTH", password)
+            if db:
+                self.execute("SELECT", str(db))
+        except Exception:
+            self.close()
+            raise
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if isinstance(arg, str):
+                arg = arg.encode("utf-8")
+            elif isinstance(arg, int):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read_reply(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode()
+        if prefix == b"-":
+            raise RedisError(payload.decode())
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if prefix == b"*":
+            count = int(payload)
+            if count == -1:
+                return None
+            return [self._read_reply() for _ in range(count)]
+        raise RedisError(f"Unexpected reply prefix: {prefix!r}")
+
+    def execute(self, *args):
+        self.sock.sendall(self._encode(args))
+        return self._read_reply()
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RedisBackend(CacheBackend):
+    name = "redis"
+    shared = True
+
+    def __init__(self, url: str = "redis://localhost:6379/0"):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.password = parsed.password
+        self._local = threading.local()
+        self._connections: List[RespConnection] = []
+        self._lock = threading.Lock()
+
+    def _conn(self) -> RespConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = RespConnection(self.host, self.port, db=self.db, password=self.password)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _drop(self, conn: RespConnection):
+        conn.close()
+        self._local.conn = None
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+
+    def _execute(self, *args):
+        conn = self._conn()
+        try:
+            return conn.execute(*args)
+        except (ConnectionError, OSError):
+            # Reconnect once (server restart, idle timeout)
+            self._drop(conn)
+        conn = self._conn()
+        try:
+            return conn.execute(*args)
+        except (ConnectionError, OSError):
+            self._drop(conn)
+            raise
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._execute("GET", key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        if ttl:
+            self._execute("SET", key, value, "PX", max(1, int(ttl * 1000)))
+        else:
+            self._execute("SET", key, value)
+
+    def delete(self, key: str):
+        self._execute("DEL", key)
+
+    def incr(self, key: str) -> int:
+        return self._execute("INCR", key)
+
+    def ping(self) -> bool:
+        return self._execute("PING") == "PONG"
+
+    def probe(self, timeout: float):
+        # A throwaway connection: the per-thread ones keep their regular timeout
+        conn = RespConnection(self.host, self.port, db=self.db, password=self.password, timeout=timeout)
+        try:
+            if conn.execute("PING") != "PONG":
+                raise RedisError("Unexpected PING reply")
+        finally:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
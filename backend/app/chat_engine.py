@@ -0,0 +1,216 @@
+"""
+Transport-independent chat turn engine.
+
+`prepare_turn` validates the session and stores the user message;
+`stream_turn_events` runs every selected guru in turn and yields plain event
+dicts. The SSE endpoint and the WebSocket endpoint only differ in how they
+frame these events; watchers of the session get them through app.broadcast.
+"""
+import asyncio
+import json
+import logging
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from . import archive, broadcast, crud, schemas, models
+from .session_cache import CharacterInfo
+from .tracing import NULL_TRACE
+from .utils.llm_chat import UpstreamCancel, generate_guru_response
+from .utils.responder_router import select_responders, log_selection
+
+
+logger = logging.getLogger(__name__)
+
+def _build_history_payload(messages: List[models.Message]):
+    """Convert DB messages into a lightweight history payload."""
+    history = []
+    for message in messages:
+        speaker = message.character.name if message.character else "User"
+        history.append({
+            "role": message.role or ("assistant" if message.character else "user"),
+            "speaker": speaker,
+            "content": message.content or ""
+        })
+    return history
+
+
+def _character_profile(character: CharacterInfo) -> Dict:
+    persona_data = character.persona_data or {}
+    if isinstance(persona_data, dict):
+        character_profile = dict(persona_data)
+    else:
+        try:
+            character_profile = json.loads(persona_data)
+        except (TypeError, json.JSONDecodeError):
+            character_profile = {"persona": persona_data}
+
+    character_profile.setdefault("name", character.name)
+    character_profile.setdefault("description", character.description)
+    character_profile.setdefault("id", character.id)
+    return character_profile
+
+
+def prepare_turn(db: Session, session_id: str, user_id: str,
+                 request: schemas.PostChatRequest, trace=NULL_TRACE) -> List[CharacterInfo]:
+    """
+    Check ownership, rehydrate an archived session, store the user message and
+    pick the gurus that answer.
+    Raises HTTPException (404/400) like the REST endpoints.
+    """
+    with trace.span("session.load"):
+        session = crud.get_session_meta(db, session_id=session_id)
+        if not session or session.user_id != user_id:
+            raise HTTPException(status_code=404, detail="Session not found")
+        characters = crud.get_characters_cached(db, session.character_ids)
+    if not characters:
+        raise HTTPException(status_code=400, detail="No characters in session")
+
+    # An archived session comes back before the new message lands next to its history
+    with trace.span("session.rehydrate") as attrs:
+        attrs["messages"] = archive.rehydrate_session(db, session_id)
+
+    with trace.span("user_message.save"):
+        crud.create_message(
+            db,
+            session_id=session_id,
+            content=request.content,
+            role="user"
+        )
+
+    # Only the gurus relevant to this question answer (all of them when responder_k is unset)
+    with trace.span("responders.select", k=session.responder_k) as attrs:
+        active_characters, scores = select_responders(
+            request.content, characters, k=session.responder_k
+        )
+        attrs["selected"] = [character.name for character in active_characters]
+    if session.responder_k:
+        log_selection(session_id, request.content, scores, active_characters)
+    return active_characters
+
+
+async def stream_turn_events(db: Session, session_id: str, request: schemas.PostChatRequest,
+                             characters: List[CharacterInfo], trace=NULL_TRACE) -> AsyncIterator[Dict]:
+    """
+    Generate replies for each character, one after another.
+
+    Yields {"type": "delta", "character": CharacterInfo, "content": str} while a
+    reply streams, then {"type": "end", "character": ..., "content": full_text,
+    "message_id": Optional[int]} once it has been persisted.
+
+    Every event is also published to the session's watchers (app.broadcast).
+    The trace is finished (and possibly written) when the generator ends.
+    """
+    broadcast.publish_turn_start(session_id, request.content, characters)
+    status = "interrupted"
+    try:
+        events = _turn_events(db, session_id, request, characters, trace)
+        async with aclosing(events):
+            async for event in events:
+                broadcast.publish_turn_event(session_id, event)
+                yield event
+        status = "completed"
+    except BaseException as exc:
+        trace.fail(exc)
+        raise
+    finally:
+        broadcast.publish_turn_end(session_id, status)
+        trace.finish()
+
+
+async def _turn_events(db: Session, session_id: str, request: schemas.PostChatRequest,
+                       characters: List[CharacterInfo], trace) -> AsyncIterator[Dict]:
+    user_message = request.content
+    style = request.style  # 'spicy' or 'cold'
+
+    loop = asyncio.get_running_loop()
+    llm_mode = "hot" if isinstance(style, str) and style.lower() == "spicy" else "cold"
+
+    with trace.span("history.load") as attrs:
+        existing_messages = crud.get_session_messages(db, session_id=session_id)
+        conversation_history = _build_history_payload(existing_messages)
+        attrs["messages"] = len(conversation_history)
+
+    for character in characters:
+        character_profile = _character_profile(character)
+
+        queue: asyncio.Queue = asyncio.Queue()
+        streamed_chunks = []
+        cancel = UpstreamCancel()
+
+        def enqueue_chunk(text: str):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, text)
+            except RuntimeError:
+                pass
+
+        def finish_stream():
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+            except RuntimeError:
+                pass
+
+        def llm_worker():
+            return generate_guru_response(
+                user_message,
+                llm_mode,
+                character_profile,
+                chat_history=conversation_history,
+                stream_callback=enqueue_chunk,
+                stream_end_callback=finish_stream,
+                trace=trace,
+                cancel=cancel
+            )
+
+        response_future = loop.run_in_executor(None, llm_worker)
+
+        try:
+            while True:
+                chunk_text = await queue.get()
+                if chunk_text is None:
+                    break
+                streamed_chunks.append(chunk_text)
+                yield {"type": "delta", "character": character, "content": chunk_text}
+        except BaseException:
+            # Task cancelled or the consumer closed the stream: stop the upstream request too
+            cancel.cancel()
+            raise
+
+        try:
+            assistant_response = await response_future
+        except HTTPException:
+            raise
+        except Exception as exc:
+            trace.fail(exc)
+            assistant_response = f"System Error: {exc}"
+
+        assistant_response = assistant_response or ""
+
+        if not streamed_chunks:
+            yield {"type": "delta", "character": character, "content": assistant_response}
+
+        message_id: Optional[int] = None
+        try:
+            with trace.span("reply.save", character=character.name):
+                db_message = crud.create_message(
+                    db,
+                    session_id=session_id,
+                    content=assistant_response,
+                    role="assistant",
+                    character_id=character.id
+                )
+            message_id = db_message.id
+        except Exception as e:
+            logger.error(f"Error saving message: {e}")
+            # Don't keep the failed write transaction (and SQLite's write lock) open while the next guru streams
+            db.rollback()
+
+        yield {"type": "end", "character": character, "content": assistant_response, "message_id": message_id}
+
+        conversation_history.append({
+            "role": "assistant",
+            "speaker": character.name,
+            "content": assistant_response
+        })
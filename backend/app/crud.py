@@ -1,9 +1,25 @@
 """DB SQL query operations"""
-from sqlalchemy.orm import Session, joinedload
-from . import models, schemas
+import hashlib
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload
+from . import models, schemas, archive
+from .session_cache import SessionMeta, CharacterInfo, session_meta_cache, character_cache
 
 
 # 1. User Logic
+# Process-local set of user IDs known to exist, so repeat visitors skip the upsert.
+# Users are never deleted, so entries cannot go stale; the set is simply reset when full.
+KNOWN_USER_IDS_MAX = 100_000
+_known_user_ids = set()
+
+_DIALECT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
 def get_user(db: Session, user_id: str):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
@@ -16,14 +32,34 @@ def create_user(db: Session, user_id: str):
 
 def ensure_user_exists(db: Session, user_id: str):
     """
-    If user does not exist, create one.
-    Else, return the existing user.
+    Make sure the user row exists with a single INSERT ... ON CONFLICT DO NOTHING.
+    Runs inside the caller's transaction (no commit), and is skipped entirely for
+    user IDs this process has already seen. Safe when two requests race.
     """
     user_id_str = str(user_id)
-    user = get_user(db, user_id_str)
-    if not user:
-        user = create_user(db, user_id_str)
-    return user
+    if user_id_str in _known_user_ids:
+        return user_id_str
+
+    dialect_insert = _DIALECT_INSERTS.get(db.get_bind().dialect.name)
+    if dialect_insert is not None:
+        db.execute(
+            dialect_insert(models.User)
+            .values(id=user_id_str, created_at=datetime.now(timezone.utc))
+            .on_conflict_do_nothing(index_elements=["id"])
+        )
+    elif get_user(db, user_id_str) is None:
+        try:
+            with db.begin_nested():
+                db.execute(insert(models.User).values(id=user_id_str, created_at=datetime.now(timezone.utc)))
+        except IntegrityError:
+            pass  # created concurrently
+    return user_id_str
+
+def remember_user(user_id: str):
+    """Record a user ID as existing (call only after the transaction that created it committed)."""
+    if len(_known_user_ids) >= KNOWN_USER_IDS_MAX:
+        _known_user_ids.clear()
+    _known_user_ids.add(str(user_id))
 
 
 # 2. Character Logic
@@ -44,6 +80,8 @@ def create_character(db: Session, character_data: dict):
     db.add(db_char)
     db.commit()
     db.refresh(db_char)
+    # clear() rather than delete(): the catalog version (ETags) follows the namespace version
+    character_cache.clear()
     return db_char
 
 def update_character_persona(db: Session, character_id: str, new_persona: dict):
@@ -53,47 +91,91 @@ def update_character_persona(db: Session, character_id: str, new_persona: dict):
         db_char.persona_data = new_persona
         db.commit()
         db.refresh(db_char)
+        character_cache.clear()
         return db_char
     return None
 
 
 # 3. Session Logic
 def create_session(db: Session, session: schemas.PostSessionRequest):
-    """Create a new session and associate characters (N:M)."""
+    """
+    Create a new session and associate characters (N:M).
+    User upsert, session row and character links are written in one transaction,
+    and the response is built from values we already have (no refresh round trips).
+    """
     
-    # 1. Ensure user exists (create if not)
+    # 1. Ensure user exists (create if not) - same transaction as the session
     user_id_str = str(session.user_id)
     ensure_user_exists(db, user_id_str)
 
-    # 2. Retrieve actual character objects for requested character IDs
+    # 2. Retrieve the requested characters (plain columns, kept in request order)
     char_ids_str = [str(char_id) for char_id in session.character_ids]
-    characters = db.query(models.Character).filter(
-        models.Character.id.in_(char_ids_str)
-    ).all()
+    rows = db.query(models.Character.id, models.Character.name, models.Character.description)\
+        .filter(models.Character.id.in_(char_ids_str))\
+        .all()
+    order = {char_id: idx for idx, char_id in enumerate(char_ids_str)}
+    characters = sorted(rows, key=lambda row: order[row.id])
 
-    # 3. Create session (SQLAlchemy automatically handles the intermediate table session_characters)
-    db_session = models.Session(
+    # 3. Insert session and session_characters links
+    session_id = str(uuid.uuid4())
+    created_at = datetime.now(timezone.utc)
+    title = f"New Chat with {', '.join([char.name for char in characters])}" # Initial title
+    db.execute(insert(models.Session).values(
+        id=session_id,
         user_id=user_id_str,
-        title=f"New Chat with {', '.join([char.name for char in characters])}", # Initial title
-        characters=characters 
-    )
-    
-    db.add(db_session)
+        title=title,
+        responder_k=session.responder_k,
+        created_at=created_at,
+        last_activity_at=created_at
+    ))
+    if characters:
+        db.execute(insert(models.session_characters), [
+            {"session_id": session_id, "character_id": char.id} for char in characters
+        ])
     db.commit()
-    db.refresh(db_session)
-    return db_session
+    remember_user(user_id_str)
+    session_meta_cache.set(session_id, SessionMeta(
+        id=session_id,
+        user_id=user_id_str,
+        title=title,
+        responder_k=session.responder_k,
+        character_ids=tuple(char.id for char in characters)
+    ))
+
+    return schemas.PostSessionResponse(
+        id=session_id,
+        user_id=user_id_str,
+        title=title,
+        responder_k=session.responder_k,
+        created_at=created_at,
+        characters=[
+            schemas.CharacterSummary(id=char.id, name=char.name, description=char.description)
+            for char in characters
+        ]
+    )
 
 def get_user_sessions(db: Session, user_id: str):
     """
     Retrieve list of my chat rooms (most recent first).
-    To display thumbnails in the list, load the characters relationship with joinedload at once.
+    Characters (for the thumbnails) come from one extra IN query on the
+    session_characters primary key; a joinedload made SQLite materialize the
+    whole link table for every call.
     """
     return db.query(models.Session)\
-        .options(joinedload(models.Session.characters))\
+        .options(selectinload(models.Session.characters))\
         .filter(models.Session.user_id == user_id)\
         .order_by(models.Session.created_at.desc())\
         .all()
 
+def get_user_sessions_stamp(db: Session, user_id: str):
+    """
+    (session count, latest last_activity_at) of a user: changes whenever the
+    session list does. Answered from the user_id index, no character rows.
+    """
+    return tuple(db.query(func.count(models.Session.id), func.max(models.Session.last_activity_at))
+                 .filter(models.Session.user_id == user_id)
+                 .one())
+
 def get_session(db: Session, session_id: str):
     """Retrieve session details (including character information)."""
     return db.query(models.Session)\
@@ -109,25 +191,86 @@ def update_session_title(db: Session, session_id: str, new_title: str):
     db_session = db.query(models.Session).filter(models.Session.id == session_id).first()
     if db_session:
         db_session.title = new_title
+        # Renames count as activity, so the session list's version stamp moves
+        db_session.last_activity_at = datetime.now(timezone.utc)
         db.commit()
+        session_meta_cache.delete(session_id)
         db.refresh(db_session)
         # Loading character information may be necessary to match the response schema
         # (Accessing characters on the Session object triggers Lazy Load)
         return db_session
     return None
 
+def update_session_responders(db: Session, session_id: str, responder_k: int = None):
+    """
+    Update how many characters answer each turn (None = all).
+    Note: Ownership verification is done in the Router layer.
+    """
+    db_session = db.query(models.Session).filter(models.Session.id == session_id).first()
+    if db_session:
+        db_session.responder_k = responder_k
+        db_session.last_activity_at = datetime.now(timezone.utc)
+        db.commit()
+        session_meta_cache.delete(session_id)
+        db.refresh(db_session)
+        return db_session
+    return None
+
+# Tables whose rows belong to a session, deleted before the session itself
+_SESSION_CHILD_TABLES = (
+    models.Message.__table__,
+    models.session_characters,
+    models.SessionArchive.__table__,
+    models.ChatTurn.__table__,
+)
+
+def _delete_sessions(db: Session, session_ids):
+    """
+    Set-based delete of sessions and their child rows; session_ids may be a subquery.
+    Children are deleted explicitly rather than left to ON DELETE CASCADE:
+    databases created before the cascades keep their old foreign keys.
+    """
+    for table in _SESSION_CHILD_TABLES:
+        db.execute(delete(table).where(table.c.session_id.in_(session_ids)))
+    return db.execute(delete(models.Session).where(models.Session.id.in_(session_ids)))
+
 def delete_session(db: Session, session_id: str, user_id: str):
-    """Delete session (including ownership verification)."""
-    db_session = db.query(models.Session).filter(
+    """
+    Delete session (including ownership verification).
+    One set-based DELETE per table, all scoped to the owner's session.
+    """
+    owned = select(models.Session.id).where(
         models.Session.id == session_id,
         models.Session.user_id == user_id
-    ).first()
-    
-    if db_session:
-        db.delete(db_session)
+    )
+    result = _delete_sessions(db, owned)
+    db.commit()
+    session_meta_cache.delete(session_id)
+    return result.rowcount > 0
+
+def count_user_sessions(db: Session, user_id: str):
+    return db.query(func.count(models.Session.id))\
+        .filter(models.Session.user_id == user_id)\
+        .scalar()
+
+def delete_user_sessions_chunked(db: Session, user_id: str, chunk_size: int = 100, pause: float = 0.01):
+    """
+    Delete all sessions of a user, `chunk_size` sessions per transaction.
+    Committing between chunks releases the write lock so concurrent writers are not starved.
+    """
+    deleted = 0
+    while True:
+        chunk = [row.id for row in db.query(models.Session.id)
+                 .filter(models.Session.user_id == user_id)
+                 .limit(chunk_size)]
+        if not chunk:
+            return deleted
+        result = _delete_sessions(db, chunk)
         db.commit()
-        return True
-    return False
+        for session_id in chunk:
+            session_meta_cache.delete(session_id)
+        deleted += result.rowcount
+        time.sleep(pause)
 
 
 # 4. Message Logic
@@ -141,14 +284,180 @@ def create_message(db: Session, session_id: str, content: str, role: str, charac
         character_id=character_id # Required if the message is from a character
     )
     db.add(db_message)
+    # Keep the session "hot" so the archival job skips it
+    db.query(models.Session)\
+        .filter(models.Session.id == session_id)\
+        .update({"last_activity_at": datetime.now(timezone.utc)}, synchronize_session=False)
     db.commit()
     db.refresh(db_message)
     return db_message
 
 def get_session_messages(db: Session, session_id: str):
-    """Retrieve all messages in a session, ordered by creation time ascending."""
+    """
+    Retrieve all messages in a session, ordered by creation time ascending.
+    An archived session is rehydrated first, so its history is never partial.
+    """
+    archive.rehydrate_session(db, session_id)
     return db.query(models.Message)\
         .options(joinedload(models.Message.character))\
         .filter(models.Message.session_id == session_id)\
         .order_by(models.Message.created_at.asc())\
-        .all()
\ No newline at end of file
+        .all()
+
+
+def get_session_messages_stamp(db: Session, session_id: str):
+    """(message count, last message ID) of a session; messages are append-only."""
+    return tuple(db.query(func.count(models.Message.id), func.max(models.Message.id))
+                 .filter(models.Message.session_id == session_id)
+                 .one())
+
+
+# 5. Idempotent chat turns
+def claim_chat_turn(db: Session, session_id: str, idempotency_key: str, request_hash: str, ttl: float):
+    """
+    Insert the turn record for (session, key) unless one exists.
+    Returns (turn, created); an expired record is replaced as if it never existed.
+    """
+    now = datetime.now(timezone.utc)
+    db.execute(delete(models.ChatTurn).where(
+        models.ChatTurn.session_id == session_id,
+        models.ChatTurn.idempotency_key == idempotency_key,
+        models.ChatTurn.expires_at <= now
+    ))
+    values = dict(session_id=session_id, idempotency_key=idempotency_key, request_hash=request_hash,
+                  status="running", message_ids=[], created_at=now,
+                  expires_at=now + timedelta(seconds=ttl))
+
+    dialect_insert = _DIALECT_INSERTS.get(db.get_bind().dialect.name)
+    if dialect_insert is not None:
+        result = db.execute(
+            dialect_insert(models.ChatTurn).values(**values)
+            .on_conflict_do_nothing(index_elements=["session_id", "idempotency_key"])
+        )
+        created = result.rowcount == 1
+    else:
+        try:
+            with db.begin_nested():
+                db.execute(insert(models.ChatTurn).values(**values))
+            created = True
+        except IntegrityError:
+            created = False  # claimed concurrently
+    db.commit()
+
+    turn = db.query(models.ChatTurn).filter(
+        models.ChatTurn.session_id == session_id,
+        models.ChatTurn.idempotency_key == idempotency_key
+    ).one()
+    return turn, created
+
+def finish_chat_turn(db: Session, turn_id: int, status: str, message_ids):
+    db.query(models.ChatTurn)\
+        .filter(models.ChatTurn.id == turn_id)\
+        .update({"status": status, "message_ids": list(message_ids)}, synchronize_session=False)
+    db.commit()
+
+def release_chat_turn(db: Session, turn_id: int):
+    """Forget a claimed key whose turn stored nothing, so a retry runs it."""
+    db.execute(delete(models.ChatTurn).where(models.ChatTurn.id == turn_id))
+    db.commit()
+
+def get_chat_turn_replies(db: Session, turn: models.ChatTurn):
+    """The assistant messages a finished turn stored, in reply order."""
+    if not turn.message_ids:
+        return []
+    archive.rehydrate_session(db, turn.session_id)
+    return db.query(models.Message)\
+        .filter(models.Message.id.in_(turn.message_ids))\
+        .order_by(models.Message.id.asc())\
+        .all()
+
+def prune_chat_turns(db: Session):
+    result = db.execute(delete(models.ChatTurn).where(models.ChatTurn.expires_at <= datetime.now(timezone.utc)))
+    db.commit()
+    return result.rowcount
+
+
+# 6. Cached lookups for the request hot path
+def get_session_meta(db: Session, session_id: str):
+    """
+    Owner, title and character IDs of a session, served from the session cache.
+    A miss costs one light query (no character rows are loaded).
+    """
+    meta = session_meta_cache.get(session_id)
+    if meta is not None:
+        return meta
+
+    rows = db.query(
+        models.Session.id,
+        models.Session.user_id,
+        models.Session.title,
+        models.Session.responder_k,
+        models.session_characters.c.character_id
+    ).outerjoin(
+        models.session_characters,
+        models.session_characters.c.session_id == models.Session.id
+    ).filter(models.Session.id == session_id).all()
+    if not rows:
+        return None
+
+    first = rows[0]
+    meta = SessionMeta(
+        id=first.id,
+        user_id=first.user_id,
+        title=first.title,
+        responder_k=first.responder_k,
+        character_ids=tuple(row.character_id for row in rows if row.character_id)
+    )
+    session_meta_cache.set(session_id, meta)
+    return meta
+
+def get_characters_cached(db: Session, character_ids):
+    """Resolve character IDs to CharacterInfo snapshots, querying only the ones not cached."""
+    resolved = {}
+    missing = []
+    for character_id in character_ids:
+        # Hits are counted per entry, but the query they avoid is the one IN (...) lookup below
+        info = character_cache.get(character_id, queries_saved=0)
+        if info is None:
+            missing.append(character_id)
+        else:
+            resolved[character_id] = info
+
+    if resolved and not missing:
+        character_cache.count_saved()
+    if missing:
+        for db_char in db.query(models.Character).filter(models.Character.id.in_(missing)):
+            info = CharacterInfo(
+                id=db_char.id,
+                name=db_char.name,
+                description=db_char.description,
+                persona_data=db_char.persona_data
+            )
+            character_cache.set(db_char.id, info)
+            resolved[db_char.id] = info
+
+    return [resolved[character_id] for character_id in character_ids if character_id in resolved]
+
+# Process-local (character cache version, digest); recomputed after character_cache.clear()
+_catalog_version = (None, None)
+
+def get_catalog_version(db: Session):
+    """
+    Digest of the character catalog. Computed from the rows only when the
+    character cache namespace version moves (seeding and persona updates clear
+    it), so it is the same in every worker and across restarts with the same data.
+    """
+    global _catalog_version
+    cache_version = character_cache.version()
+    cached_for, digest = _catalog_version
+    if cached_for == cache_version:
+        return digest
+
+    rows = db.query(models.Character.id, models.Character.name,
+                    models.Character.description, models.Character.persona_data)\
+        .order_by(models.Character.id)\
+        .all()
+    canonical = json.dumps([list(row) for row in rows], ensure_ascii=False, sort_keys=True)
+    digest = hashlib.blake2b(canonical.encode("utf-8"), digest_size=8).hexdigest()
+    _catalog_version = (cache_version, digest)
+    return digest
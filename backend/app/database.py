@@ -1,7 +1,11 @@
 """DB connection setup"""
-from sqlalchemy import create_engine
+import threading
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as WriterTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
 import os
 from dotenv import load_dotenv
 
@@ -12,14 +16,123 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sql_app.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-connect_args = {"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+# SQLITE_MODE=production: WAL + tuned pragmas, one serialized writer transaction
+# at a time and a separate read-only pool (see RoutingSession). Ignored for other databases.
+SQLITE_MODE = os.getenv("SQLITE_MODE", "default")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+
+
+def _sqlite_pragmas(engine, pragmas: dict):
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for key, value in pragmas.items():
+            cursor.execute(f"PRAGMA {key}={value}")
+        cursor.close()
+
+
+def _serialize_writes(engine):
+    """
+    One write transaction at a time per process: the lock is taken at the
+    first statement a writer connection runs and released on commit/rollback
+    (or when the connection goes back to the pool). Writers wait in this
+    process instead of spinning on SQLite's busy handler, and a session that
+    only holds a writer connection without writing blocks nobody.
+    """
+    lock = threading.Lock()
+
+    def _release(info):
+        if info.pop("holds_write_lock", False):
+            lock.release()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _acquire(conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get("holds_write_lock"):
+            return
+        if not lock.acquire(timeout=SQLITE_BUSY_TIMEOUT_MS / 1000):
+            raise WriterTimeoutError("Timed out waiting for the SQLite writer")
+        conn.info["holds_write_lock"] = True
+
+    # Released just before SQLite's own COMMIT/ROLLBACK; busy_timeout covers that instant
+    @event.listens_for(engine, "commit")
+    def _on_commit(conn):
+        _release(conn.info)
+
+    @event.listens_for(engine, "rollback")
+    def _on_rollback(conn):
+        _release(conn.info)
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        _release(connection_record.info)
+
+
+def production_pragmas() -> dict:
+    return {
+        "journal_mode": "WAL",
+        "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+        # In WAL mode NORMAL only syncs at checkpoints; a power loss can drop the
+        # last commits but never corrupts the database
+        "synchronous": "NORMAL",
+        "cache_size": -SQLITE_CACHE_KIB,
+        "mmap_size": SQLITE_MMAP_SIZE,
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    }
+
+
+class RoutingSession(Session):
+    """
+    Session over two engines: flushes and INSERT/UPDATE/DELETE statements use the
+    writer engine, whose write transactions run one at a time (see
+    _serialize_writes); everything else reads from the read-only pool, which WAL
+    lets run alongside the writer.
+    """
+
+    def __init__(self, write_bind=None, read_bind=None, **kwargs):
+        super().__init__(**kwargs)
+        self.write_bind = write_bind
+        self.read_bind = read_bind
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        # No clause: Session.connection() or an ORM bulk INSERT/UPDATE; assume it writes
+        if self._flushing or clause is None or isinstance(clause, UpdateBase):
+            return self.write_bind
+        return self.read_bind
+
+
+def create_session_factory(url: str, sqlite_mode: str = "default"):
+    """Return (engine, read_engine, sessionmaker); engine is the one to write/DDL with."""
+    if not url.startswith("sqlite"):
+        engine = create_engine(url)
+        return engine, engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    if sqlite_mode != "production":
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        # SQLite ignores foreign keys (and ON DELETE CASCADE) unless enabled per connection
+        _sqlite_pragmas(engine, {"foreign_keys": "ON"})
+        return engine, engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    connect_args = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    engine = create_engine(url, connect_args=connect_args)
+    _sqlite_pragmas(engine, production_pragmas())
+    _serialize_writes(engine)
+    read_engine = create_engine(
+        url, connect_args=connect_args,
+        pool_size=SQLITE_READ_POOL_SIZE, max_overflow=SQLITE_READ_POOL_SIZE
+    )
+    _sqlite_pragmas(read_engine, {**production_pragmas(), "query_only": "ON"})
+    factory = sessionmaker(
+        class_=RoutingSession, write_bind=engine, read_bind=read_engine,
+        autocommit=False, autoflush=False
+    )
+    return engine, read_engine, factory
 
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args=connect_args
-)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine, read_engine, SessionLocal = create_session_factory(DATABASE_URL, SQLITE_MODE)
 
 Base = declarative_base()
 
@@ -29,4 +142,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,45 @@
+"""
+Conditional GET for polled read endpoints.
+
+ETags are built from cheap version stamps (catalog digest, session count and
+last activity, message count and last message ID) instead of the response
+body, so a poll whose `If-None-Match` still matches is answered with 304
+before the full query and serialization run. The tags are weak: the same
+representation may be sent gzip or brotli encoded.
+"""
+import hashlib
+
+from fastapi import Request, Response
+
+
+# Let clients keep the body but revalidate on every use (browsers then send If-None-Match)
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    stamp = "|".join("" if part is None else str(part) for part in parts)
+    return f'W/"{hashlib.blake2b(stamp.encode("utf-8"), digest_size=12).hexdigest()}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Weak comparison of `etag` against the request's If-None-Match list."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(tag) for tag in header.split(",")}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
@@ -0,0 +1,156 @@
+"""
+Idempotent chat turns (POST .../chat with an Idempotency-Key header).
+
+The first request with a key claims a ChatTurn record and runs the turn as a
+background task, so the generation finishes and is stored even if the client
+drops the connection. The HTTP response only follows the task's events. A
+retry with the same key then:
+
+- attaches to the running turn (replaying the events so far, then live),
+- replays the stored replies from the DB once the turn has completed, or
+- gets 500 with `Idempotent-Replayed: failed` if the turn failed (or its worker
+  died): nothing is replayed, send it again with a new key,
+
+and never stores the user message or calls the LLM again. A turn that fails
+ends its followers' streams with an {"type": "error"} event. Running turns are
+tracked per process; a retry that lands on another worker while the turn is
+still running gets 409 with Retry-After.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from . import chat_engine, crud, database, models, schemas
+from .session_cache import CharacterInfo
+
+
+logger = logging.getLogger(__name__)
+
+# How long a key is remembered after the turn started
+IDEMPOTENCY_KEY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 3600)))
+# A 'running' record without a live task is treated as failed after this long (its worker died)
+IDEMPOTENCY_STALE_SECONDS = float(os.getenv("IDEMPOTENCY_STALE_SECONDS", "600"))
+IDEMPOTENCY_PRUNE_INTERVAL_SECONDS = 600
+MAX_KEY_LENGTH = 255
+
+
+def request_hash(request: schemas.PostChatRequest) -> str:
+    canonical = json.dumps(request.model_dump(), ensure_ascii=False, sort_keys=True)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class InFlightTurn:
+    """Events of a running keyed turn, kept so late followers can catch up from the start."""
+
+    def __init__(self, turn_id: int):
+        self.turn_id = turn_id
+        self.events: List[Dict] = []
+        self.done = False
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, event: Dict):
+        async with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    async def close(self):
+        async with self._changed:
+            self.done = True
+            self._changed.notify_all()
+
+    async def follow(self) -> AsyncIterator[Dict]:
+        position = 0
+        while True:
+            async with self._changed:
+                while position == len(self.events) and not self.done:
+                    await self._changed.wait()
+                pending = self.events[position:]
+                finished = self.done
+            position += len(pending)
+            for event in pending:
+                yield event
+            if finished and position == len(self.events):
+                return
+
+
+_in_flight: Dict[int, InFlightTurn] = {}
+_last_prune = 0.0
+
+
+def claim(db: Session, session_id: str, key: str, request: schemas.PostChatRequest):
+    """(ChatTurn, created) for this key; also prunes expired keys every few minutes."""
+    global _last_prune
+    now = time.monotonic()
+    if now - _last_prune >= IDEMPOTENCY_PRUNE_INTERVAL_SECONDS:
+        _last_prune = now
+        pruned = crud.prune_chat_turns(db)
+        if pruned:
+            logger.info(f"Pruned {pruned} expired idempotency keys")
+    return crud.claim_chat_turn(db, session_id, key, request_hash(request), IDEMPOTENCY_KEY_TTL_SECONDS)
+
+
+def get_in_flight(turn_id: int) -> Optional[InFlightTurn]:
+    return _in_flight.get(turn_id)
+
+
+def is_stale(turn: models.ChatTurn) -> bool:
+    created_at = turn.created_at
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - created_at > timedelta(seconds=IDEMPOTENCY_STALE_SECONDS)
+
+
+def start(turn_id: int, session_id: str, request: schemas.PostChatRequest,
+          characters: List[CharacterInfo], trace) -> InFlightTurn:
+    """Run the turn in the background; follow the returned InFlightTurn for its events."""
+    in_flight = InFlightTurn(turn_id)
+    _in_flight[turn_id] = in_flight
+    in_flight.task = asyncio.create_task(_run(in_flight, session_id, request, characters, trace))
+    return in_flight
+
+
+async def _run(in_flight: InFlightTurn, session_id: str, request: schemas.PostChatRequest,
+               characters: List[CharacterInfo], trace):
+    # Own DB session: the turn outlives the request that started it
+    db = database.SessionLocal()
+    message_ids: List[int] = []
+    status = "failed"
+    try:
+        async for event in chat_engine.stream_turn_events(db, session_id, request, characters, trace):
+            if event["type"] == "end" and event["message_id"] is not None:
+                message_ids.append(event["message_id"])
+            await in_flight.publish(event)
+        status = "completed"
+    except Exception as e:
+        logger.error(f"Idempotent turn {in_flight.turn_id} of session {session_id} failed: {e}")
+        await in_flight.publish({"type": "error", "detail": f"System Error: {e}"})
+    finally:
+        try:
+            crud.finish_chat_turn(db, in_flight.turn_id, status, message_ids)
+        except Exception as e:
+            logger.error(f"Could not record idempotent turn {in_flight.turn_id}: {e}")
+        finally:
+            db.close()
+            # Only now: a retry that misses the in-flight entry must find the final status
+            _in_flight.pop(in_flight.turn_id, None)
+            await in_flight.close()
+
+
+async def replay(db: Session, turn: models.ChatTurn) -> AsyncIterator[Dict]:
+    """The stored replies of a finished turn as engine events (one delta per reply)."""
+    messages = crud.get_chat_turn_replies(db, turn)
+    characters = {c.id: c for c in crud.get_characters_cached(db, {m.character_id for m in messages})}
+    for message in messages:
+        character = characters.get(message.character_id) or CharacterInfo(
+            id=message.character_id, name="Unknown", description=None, persona_data=None
+        )
+        yield {"type": "delta", "character": character, "content": message.content or ""}
+        yield {"type": "end", "character": character, "content": message.content or "", "message_id": message.id}
@@ -3,11 +3,16 @@ import json
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from . import models, database
-from .routers import sessions, chat, characters
+from . import models, database, migrations, session_cache
+from .compression import CompressionMiddleware
+from .logging_setup import setup_logging
+from .routers import sessions, chat, chat_ws, characters, admin
 
 
+setup_logging()
+
 models.Base.metadata.create_all(bind=database.engine)
+migrations.upgrade_schema(database.engine)
 
 app = FastAPI(title="Chat Session API", version="1.0.0")
 
@@ -17,11 +22,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let browser clients read the tag they revalidate with and whether a turn was replayed
+    expose_headers=["ETag", "Idempotent-Replayed"],
 )
+app.add_middleware(CompressionMiddleware)
 
 app.include_router(sessions.router)
 app.include_router(chat.router)
+app.include_router(chat_ws.router)
 app.include_router(characters.router)
+app.include_router(admin.router)
 
 
 # Seed character data from JSON files in the data directory
@@ -78,6 +88,7 @@ def seed_characters():
                 print(f"Failed to process file ({file_path.name}): {file_error}")
 
         db.commit()
+        session_cache.character_cache.clear()
         
     except Exception as e:
         print(f"Seeding failed: {e}")
@@ -0,0 +1,87 @@
+"""
+Startup schema upgrades for databases created by an older version.
+
+create_all only creates missing tables, it never alters existing ones. Each
+entry in ADDED_COLUMNS adds a column introduced later (and backfills it) if
+the table does not have it yet; indexes declared on the models are created
+if missing. On SQLite an old `messages` table is rebuilt with AUTOINCREMENT.
+Every step checks first, so this runs on every start.
+"""
+import json
+import logging
+
+from sqlalchemy import inspect, text
+
+from . import archive, models
+
+
+logger = logging.getLogger(__name__)
+
+# (table, column, backfill statement or None), in the order they were introduced
+ADDED_COLUMNS = [
+    ("sessions", "responder_k", None),
+    ("sessions", "archived_at", None),
+    # Old sessions count as last active at their latest message
+    ("sessions", "last_activity_at",
+     "UPDATE sessions SET last_activity_at = COALESCE("
+     "(SELECT MAX(messages.created_at) FROM messages WHERE messages.session_id = sessions.id), "
+     "sessions.created_at)"),
+]
+
+
+def _highest_archived_message_id(conn) -> int:
+    highest = 0
+    if not inspect(conn).has_table("session_archives"):
+        return highest
+    for row in conn.execute(text("SELECT codec, payload FROM session_archives")):
+        for message in json.loads(archive.decompress(row.payload, row.codec).decode("utf-8")):
+            highest = max(highest, message["id"])
+    return highest
+
+def _autoincrement_sqlite_messages(conn) -> bool:
+    """
+    Without AUTOINCREMENT SQLite hands out MAX(id) + 1, so once the newest
+    messages are archived their IDs are reused and rehydrating them collides.
+    Rebuild the table with it, starting the sequence past every archived ID.
+    """
+    sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'messages'")).scalar()
+    if sql is None or "AUTOINCREMENT" in sql.upper():
+        return False
+    columns = ", ".join(column.name for column in models.Message.__table__.columns)
+    conn.execute(text("ALTER TABLE messages RENAME TO messages_old"))
+    for index in inspect(conn).get_indexes("messages_old"):
+        conn.execute(text(f"DROP INDEX {index['name']}"))
+    models.Message.__table__.create(conn)
+    conn.execute(text(f"INSERT INTO messages ({columns}) SELECT {columns} FROM messages_old"))
+    conn.execute(text("DROP TABLE messages_old"))
+    highest = max(conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM messages")).scalar(),
+                  _highest_archived_message_id(conn))
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'messages'"))
+    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('messages', :seq)"), {"seq": highest})
+    return True
+
+def upgrade_schema(engine):
+    """Bring an existing database up to the current models. Returns the changes made."""
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for table_name, column_name, backfill in ADDED_COLUMNS:
+            existing = {column["name"] for column in inspector.get_columns(table_name)}
+            if column_name in existing:
+                continue
+            column = models.Base.metadata.tables[table_name].c[column_name]
+            column_type = column.type.compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
+            if backfill:
+                conn.execute(text(backfill))
+            added.append(f"{table_name}.{column_name}")
+        if engine.dialect.name == "sqlite" and _autoincrement_sqlite_messages(conn):
+            added.append("messages.id AUTOINCREMENT")
+
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+    if added:
+        logger.info(f"Schema upgraded: added {', '.join(added)}")
+    return added
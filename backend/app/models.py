@@ -1,5 +1,5 @@
 """DB ERD definitions"""
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table, JSON, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 import uuid
@@ -31,7 +31,7 @@ class User(Base):
     created_at = Column(DateTime, default=_get_utc_now)
 
     # One-to-many relationship with Session
-    sessions = relationship("Session", back_populates="user", cascade="all, delete-orphan")
+    sessions = relationship("Session", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
 
 class Character(Base):
     __tablename__ = "characters"
@@ -47,22 +47,37 @@ class Character(Base):
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        # The session list (newest first) and its ETag stamp read only the user's index range
+        Index("ix_sessions_user_created", "user_id", "created_at"),
+        Index("ix_sessions_user_activity", "user_id", "last_activity_at"),
+    )
 
     id = Column(String, primary_key=True, default=_generate_uuid, index=True)
-    user_id = Column(String, ForeignKey("users.id"), index=True)
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), index=True)
     title = Column(String, default="New Chat")
+    # Max number of gurus answering each turn (None = every guru answers)
+    responder_k = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=_get_utc_now)
+    # Bumped on every new message; drives cold-storage archival
+    last_activity_at = Column(DateTime, default=_get_utc_now, index=True)
+    # Set while the messages live in session_archives instead of messages
+    archived_at = Column(DateTime, nullable=True)
 
     # Relationships
     user = relationship("User", back_populates="sessions")
     characters = relationship("Character", secondary=session_characters, back_populates="sessions")
-    messages = relationship("Message", back_populates="session", cascade="all, delete-orphan")
+    # Never loaded to be deleted one by one: crud._delete_sessions removes child rows set-based
+    messages = relationship("Message", back_populates="session", cascade="all, delete-orphan", passive_deletes=True)
+    archive = relationship("SessionArchive", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
 
 class Message(Base):
     __tablename__ = "messages"
+    # Never reuse an ID: rows moved to session_archives come back with theirs on rehydration
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(String, ForeignKey("sessions.id"), index=True)
+    session_id = Column(String, ForeignKey("sessions.id", ondelete="CASCADE"), index=True)
     role = Column(String)   # 'user' or 'assistant'
     content = Column(Text)
     created_at = Column(DateTime, default=_get_utc_now)
@@ -72,4 +87,30 @@ class Message(Base):
 
     # Relationships
     session = relationship("Session", back_populates="messages")
-    character = relationship("Character")
\ No newline at end of file
+    character = relationship("Character")
+
+class SessionArchive(Base):
+    """Cold storage: all messages of an inactive session as one compressed blob."""
+    __tablename__ = "session_archives"
+
+    session_id = Column(String, ForeignKey("sessions.id", ondelete="CASCADE"), primary_key=True)
+    codec = Column(String, nullable=False)  # 'zlib' or 'zstd'
+    payload = Column(LargeBinary, nullable=False)
+    message_count = Column(Integer, nullable=False)
+    raw_size = Column(Integer, nullable=False)  # uncompressed JSON size in bytes
+    archived_at = Column(DateTime, default=_get_utc_now)
+
+class ChatTurn(Base):
+    """A chat turn sent with an Idempotency-Key: lets a retried POST attach or replay instead of re-running."""
+    __tablename__ = "chat_turns"
+    __table_args__ = (UniqueConstraint("session_id", "idempotency_key"),)
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False)
+    idempotency_key = Column(String, nullable=False)
+    # Digest of the request body; the same key with a different body is rejected
+    request_hash = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="running")  # 'running', 'completed' or 'failed'
+    message_ids = Column(JSON, nullable=False, default=list)  # assistant replies, in order
+    created_at = Column(DateTime, default=_get_utc_now)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,111 @@
+import os
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .. import broadcast, database, transcripts, session_cache, tracing
+from ..utils import generation_budget, persona_compiler
+
+
+# Shared secret for the admin API, sent as X-Admin-Token; unset = admin API disabled.
+# Traces and stats expose other users' sessions and messages, so nothing here is public.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None, alias="X-Admin-Token")):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled (ADMIN_TOKEN is not set)")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Token")
+
+
+# Every admin endpoint (stats, traces, import) requires the token
+router = APIRouter(prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+# GET /api/admin/stats/generation
+@router.get("/stats/generation")
+def read_generation_stats():
+    """Mean stream chunks, upstream-reported tokens and stream duration per reply, per mode."""
+    return generation_budget.get_generation_stats()
+
+
+# GET /api/admin/stats/cache
+@router.get("/stats/cache")
+def read_cache_stats():
+    """Hit rate and DB queries saved by the session/character caches."""
+    return session_cache.cache_stats()
+
+
+# GET /api/admin/stats/personas
+@router.get("/stats/personas")
+def read_persona_stats():
+    """Prompt tokens of each persona before and after mode-specific compilation."""
+    return persona_compiler.get_persona_stats()
+
+
+# GET /api/admin/stats/tracing
+@router.get("/stats/tracing")
+def read_tracing_stats():
+    """Sampler and trace-writer counters (finished, sampled out, dropped, written)."""
+    return tracing.trace_stats()
+
+
+# GET /api/admin/stats/broadcast
+@router.get("/stats/broadcast")
+def read_broadcast_stats():
+    """Open watch streams and events published / delivered / dropped by the session hub."""
+    return broadcast.hub.stats()
+
+
+# GET /api/admin/traces/{trace_id}
+@router.get("/traces/{trace_id}")
+def read_trace(trace_id: str):
+    """Span timeline of one chat turn (trace ID from the X-Trace-ID header or WS 's' frame)."""
+    trace = tracing.get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (not sampled or not written yet)")
+    return trace
+
+
+# GET /api/admin/sessions/{session_id}/traces
+@router.get("/sessions/{session_id}/traces")
+def read_session_traces(session_id: str, limit: int = Query(20, ge=1, le=200)):
+    """Timelines of the most recent sampled turns of a session, newest first."""
+    return tracing.get_session_traces(session_id, limit=limit)
+
+
+# POST /api/admin/import
+@router.post("/import")
+async def import_transcripts(
+    request: Request,
+    batch_size: int = transcripts.IMPORT_BATCH_SIZE,
+    keep_ids: bool = False,
+    db: Session = Depends(database.get_db)
+):
+    """
+    Bulk-import an NDJSON transcript body (as produced by the export endpoints).
+    Each session is committed on its own: on an error the session in progress
+    is rolled back and the ones before it are kept (sending the file again skips
+    them). The body is read on the event loop; every DB call runs in the threadpool.
+    """
+    importer = await run_in_threadpool(transcripts.TranscriptImporter, db, batch_size, keep_ids)
+    remainder = b""
+    try:
+        async for chunk in request.stream():
+            lines = (remainder + chunk).split(b"\n")
+            remainder = lines.pop()
+            if lines:
+                await run_in_threadpool(importer.feed_lines, [line.decode("utf-8") for line in lines])
+        await run_in_threadpool(importer.feed_line, remainder.decode("utf-8"))
+        return await run_in_threadpool(importer.close)
+    except (ValueError, KeyError) as e:
+        await run_in_threadpool(db.rollback)
+        raise HTTPException(status_code=400, detail=f"Invalid transcript record: {e} "
+                            f"({importer.committed_sessions} sessions before it were imported)")
+    except IntegrityError as e:
+        await run_in_threadpool(db.rollback)
+        raise HTTPException(status_code=409, detail=f"Import conflicts with existing rows: {e.orig} "
+                            f"({importer.committed_sessions} sessions before it were imported)")
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
 from typing import List
-from .. import crud, schemas, database
+from .. import crud, schemas, database, http_cache
 
 
 router = APIRouter(prefix="/api/characters", tags=["characters"])
@@ -9,5 +9,9 @@ router = APIRouter(prefix="/api/characters", tags=["characters"])
 
 # GET /api/characters
 @router.get("/", response_model=List[schemas.CharacterSummary])
-def read_characters(db: Session = Depends(database.get_db)):
-    return crud.get_all_characters(db)
\ No newline at end of file
+def read_characters(request: Request, response: Response, db: Session = Depends(database.get_db)):
+    etag = http_cache.make_etag("characters", crud.get_catalog_version(db))
+    if http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified(etag)
+    http_cache.set_etag(response, etag)
+    return crud.get_all_characters(db)
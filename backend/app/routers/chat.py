@@ -1,11 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional
 import json
-import asyncio
-from .. import crud, schemas, database, models
-from ..utils.llm_chat import generate_guru_response
+from .. import archive, broadcast, crud, schemas, database, chat_engine, http_cache, idempotency, tracing
+from ..session_cache import CharacterInfo
 
 
 router = APIRouter(prefix="/api/sessions/chat", tags=["chat"])
@@ -15,162 +14,144 @@ router = APIRouter(prefix="/api/sessions/chat", tags=["chat"])
 @router.get("/{session_id}/messages", response_model=List[schemas.MessageInfo])
 def get_messages(
     session_id: str,
+    request: Request,
+    response: Response,
     user_id: str = Header(..., alias="X-User-ID"),
     db: Session = Depends(database.get_db)
 ):
     # Ensure user exists
-    session = crud.get_session(db, session_id=session_id)
+    session = crud.get_session_meta(db, session_id=session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     if session.user_id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to access this session")
-    
+
+    # Restore an archived session first: the stamp must describe the rows the body is built from
+    archive.rehydrate_session(db, session_id)
+    # Messages embed character summaries, so the catalog version is part of the tag
+    etag = http_cache.make_etag(
+        "messages", session_id, crud.get_catalog_version(db),
+        *crud.get_session_messages_stamp(db, session_id=session_id)
+    )
+    if http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified(etag)
+    http_cache.set_etag(response, etag)
     return crud.get_session_messages(db, session_id=session_id)
 
 
-def _build_history_payload(messages: List[models.Message]):
-    """Convert DB messages into a lightweight history payload."""
-    history = []
-    for message in messages:
-        speaker = message.character.name if message.character else "User"
-        history.append({
-            "role": message.role or ("assistant" if message.character else "user"),
-            "speaker": speaker,
-            "content": message.content or ""
-        })
-    return history
+# GET /api/sessions/{session_id}/watch
+@router.get("/{session_id}/watch")
+async def watch_session(
+    session_id: str,
+    # EventSource cannot send headers, so the user ID may also come as ?user_id=
+    user_id: Optional[str] = Query(None),
+    header_user_id: Optional[str] = Header(None, alias="X-User-ID")
+):
+    """Live turns of a session as SSE, whichever tab or device sent them (see app.broadcast)."""
+    user_id = header_user_id or user_id
+    # Short-lived DB session: a watch stream stays open for hours and must not hold a connection
+    db = database.SessionLocal()
+    try:
+        session = crud.get_session_meta(db, session_id=session_id)
+    finally:
+        db.close()
+    if not session or session.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    subscriber = broadcast.hub.subscribe(session_id)
+    return StreamingResponse(
+        broadcast.hub.stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 # POST /api/sessions/{session_id}/chat
 # Make streaming response
-async def generate_chat_stream(db: Session, session_id: str,
-                               request: schemas.PostChatRequest, characters: List[models.Character]):
-    """Get chat response for all characters in the session."""
-
-    user_message = request.content
-    style = request.style  # 'spicy' or 'cold'
-    model = request.model
-
-    loop = asyncio.get_running_loop()
-    llm_mode = "hot" if isinstance(style, str) and style.lower() == "spicy" else "cold"
-
-    existing_messages = crud.get_session_messages(db, session_id=session_id)
-    conversation_history = _build_history_payload(existing_messages)
-
-    for character in characters:
-        persona_data = character.persona_data or {}
-        if isinstance(persona_data, dict):
-            character_profile = dict(persona_data)
-        else:
-            try:
-                character_profile = json.loads(persona_data)
-            except (TypeError, json.JSONDecodeError):
-                character_profile = {"persona": persona_data}
-
-        character_profile.setdefault("name", character.name)
-        character_profile.setdefault("description", character.description)
-        character_profile.setdefault("id", character.id)
-
-        queue: asyncio.Queue = asyncio.Queue()
-        streamed_chunks = []
-
-        def enqueue_chunk(text: str):
-            try:
-                loop.call_soon_threadsafe(queue.put_nowait, text)
-            except RuntimeError:
-                pass
-
-        def finish_stream():
-            try:
-                loop.call_soon_threadsafe(queue.put_nowait, None)
-            except RuntimeError:
-                pass
-
-        def llm_worker():
-            return generate_guru_response(
-                user_message,
-                llm_mode,
-                character_profile,
-                chat_history=conversation_history,
-                stream_callback=enqueue_chunk,
-                stream_end_callback=finish_stream
-            )
-
-        response_future = loop.run_in_executor(None, llm_worker)
-
-        while True:
-            chunk_text = await queue.get()
-            if chunk_text is None:
-                break
-            streamed_chunks.append(chunk_text)
+async def sse_frames(events: AsyncIterator[Dict]):
+    """SSE framing of turn engine events."""
+    async for event in events:
+        if event["type"] == "error":
+            # Only keyed turns: the turn failed after the response started
+            yield f"event: error\ndata: {json.dumps({'detail': event['detail']})}\n\n"
+            continue
+        character = event["character"]
+        if event["type"] == "delta":
             chunk = {
                 "character_id": character.id,
                 "name": character.name,
-                "content": chunk_text
-            }
-            yield f"data: {json.dumps(chunk)}\n\n"
-
-        try:
-            assistant_response = await response_future
-        except HTTPException:
-            raise
-        except Exception as exc:
-            assistant_response = f"System Error: {exc}"
-
-        assistant_response = assistant_response or ""
-
-        if not streamed_chunks:
-            chunk = {
-                "character_id": character.id,
-                "name": character.name,
-                "content": assistant_response
+                "content": event["content"]
             }
             yield f"data: {json.dumps(chunk)}\n\n"
+        else:
+            # Send a space to indicate the end of message for this character
+            yield f"data: {json.dumps({'content': ' '})}\n\n"
+
+async def generate_chat_stream(db: Session, session_id: str, request: schemas.PostChatRequest,
+                               characters: List[CharacterInfo], trace=tracing.NULL_TRACE):
+    """Get chat response for all characters in the session (SSE framing of the turn engine)."""
+    async for frame in sse_frames(chat_engine.stream_turn_events(db, session_id, request, characters, trace)):
+        yield frame
+
+def _idempotent_turn(db: Session, session_id: str, user_id: str, request: schemas.PostChatRequest, key: str):
+    """Start a keyed turn, or attach to / replay the turn that already used this key."""
+    session = crud.get_session_meta(db, session_id=session_id)
+    if not session or session.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Session not found")
 
-        # Send a space to indicate the end of message for this character
-        yield f"data: {json.dumps({'content': ' '})}\n\n"
-
-        try:
-            crud.create_message(
-                db,
-                session_id=session_id,
-                content=assistant_response,
-                role="assistant",
-                character_id=character.id
-            )
-        except Exception as e:
-            print(f"Error saving message: {e}")
-
-        conversation_history.append({
-            "role": "assistant",
-            "speaker": character.name,
-            "content": assistant_response
-        })
+    turn, created = idempotency.claim(db, session_id, key, request)
+    if not created:
+        if turn.request_hash != idempotency.request_hash(request):
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        in_flight = idempotency.get_in_flight(turn.id)
+        if in_flight is not None:
+            events, replayed = in_flight.follow(), "attached"
+        elif turn.status == "running" and not idempotency.is_stale(turn):
+            # Running on another worker
+            raise HTTPException(status_code=409, detail="A turn with this Idempotency-Key is still running",
+                                headers={"Retry-After": "1"})
+        elif turn.status != "completed":
+            # Failed, or its worker died mid-turn: the stored replies would look like a short success
+            raise HTTPException(status_code=500, detail="The turn with this Idempotency-Key failed; "
+                                "send it again with a new key", headers={"Idempotent-Replayed": "failed"})
+        else:
+            events, replayed = idempotency.replay(db, turn), "true"
+        return StreamingResponse(sse_frames(events), media_type="text/event-stream",
+                                 headers={"Idempotent-Replayed": replayed})
+
+    trace = tracing.start_trace(session_id, transport="sse", style=request.style, idempotent=True)
+    try:
+        active_characters = chat_engine.prepare_turn(db, session_id, user_id, request, trace)
+    except Exception:
+        # Rejected before anything was stored: let a retry with this key run
+        crud.release_chat_turn(db, turn.id)
+        raise
+    in_flight = idempotency.start(turn.id, session_id, request, active_characters, trace)
+
+    headers = {"Idempotent-Replayed": "false"}
+    if trace.trace_id:
+        headers["X-Trace-ID"] = trace.trace_id
+    return StreamingResponse(sse_frames(in_flight.follow()), media_type="text/event-stream", headers=headers)
 
 @router.post("/{session_id}/chat")
 async def send_message(
     session_id: str,
     request: schemas.PostChatRequest,
     user_id: str = Header(..., alias="X-User-ID"),
+    # Retries with the same key attach to / replay the first turn instead of generating again
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=idempotency.MAX_KEY_LENGTH),
     db: Session = Depends(database.get_db)
 ):
-    # Validate session
-    session = crud.get_session(db, session_id=session_id)
-    if not session or session.user_id != user_id:
-        raise HTTPException(status_code=404, detail="Session not found")
-    if not session.characters:
-        raise HTTPException(status_code=400, detail="No characters in session")
-    
-    crud.create_message(
-        db,
-        session_id=session_id,
-        content=request.content,
-        role="user"
-    )
+    if idempotency_key:
+        return _idempotent_turn(db, session_id, user_id, request, idempotency_key)
 
-    active_characters = session.characters
+    trace = tracing.start_trace(session_id, transport="sse", style=request.style)
+    active_characters = chat_engine.prepare_turn(db, session_id, user_id, request, trace)
     
+    # X-Trace-ID: quote it when reporting a slow turn (GET /api/admin/traces/{trace_id})
+    headers = {"X-Trace-ID": trace.trace_id} if trace.trace_id else None
     return StreamingResponse(
-        generate_chat_stream(db, session_id, request, active_characters),
-        media_type="text/event-stream"
+        generate_chat_stream(db, session_id, request, active_characters, trace),
+        media_type="text/event-stream",
+        headers=headers
     )
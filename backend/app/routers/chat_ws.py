@@ -0,0 +1,164 @@
+"""
+WebSocket transport: many chat turns, for many sessions, over one connection.
+
+Connect to /api/sessions/chat/ws?user_id=<USER_ID> (or send X-User-ID).
+
+Client -> server (JSON objects):
+    {"op": "chat", "turn": "<id>", "session_id": "...", "content": "...", "style": "spicy"}
+    {"op": "cancel", "turn": "<id>"}      stops the turn and its upstream LLM request
+    {"op": "ping"}
+
+Server -> client (compact JSON arrays; `i` indexes the turn's character list):
+    ["s", turn, session_id, [[character_id, name], ...], trace_id]   turn started
+    ["d", turn, i, delta]                                  streamed text
+    ["e", turn, i, message_id]                             character finished (reply persisted)
+    ["f", turn]                                            turn finished
+    ["x", turn, status_code, detail]                       turn failed / rejected
+    ["p"]                                                  pong
+
+When several frames are queued they are sent together as one message holding
+a list of frames (e.g. [["d", ...], ["d", ...]]); check whether the first
+element is a string or a list.
+
+Frames go through a bounded per-connection queue: a slow client makes the
+turns wait (backpressure) instead of buffering without limit, and at most
+WS_MAX_ACTIVE_TURNS turns may run at once per connection.
+"""
+import asyncio
+import json
+import os
+import uuid
+from contextlib import aclosing
+from typing import Dict, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from .. import chat_engine, database, schemas, tracing
+
+
+router = APIRouter(prefix="/api/sessions/chat", tags=["chat"])
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_MAX_ACTIVE_TURNS = int(os.getenv("WS_MAX_ACTIVE_TURNS", "4"))
+WS_MAX_BATCH = 64
+
+
+class ChatConnection:
+    """State of one WebSocket client: outbound queue and running turns."""
+
+    def __init__(self, websocket: WebSocket, user_id: str):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        self.turns: Dict[str, asyncio.Task] = {}
+
+    async def send(self, frame):
+        # Blocks while the outbox is full, which pauses the producing turn
+        await self.outbox.put(frame)
+
+    async def writer(self):
+        while True:
+            frames = [await self.outbox.get()]
+            # Coalesce whatever else is already queued into one WebSocket message
+            while len(frames) < WS_MAX_BATCH and not self.outbox.empty():
+                frames.append(self.outbox.get_nowait())
+            payload = frames[0] if len(frames) == 1 else frames
+            await self.websocket.send_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")))
+
+    async def start_turn(self, message: dict):
+        turn_id = str(message.get("turn") or uuid.uuid4())
+        if turn_id in self.turns:
+            await self.send(["x", turn_id, 409, "Turn already running"])
+        elif len(self.turns) >= WS_MAX_ACTIVE_TURNS:
+            await self.send(["x", turn_id, 429, "Too many active turns on this connection"])
+        else:
+            self.turns[turn_id] = asyncio.create_task(self.run_turn(turn_id, message))
+
+    def cancel_turn(self, turn_id: str):
+        task = self.turns.get(str(turn_id))
+        if task is not None:
+            task.cancel()
+
+    async def run_turn(self, turn_id: str, message: dict):
+        # Each turn gets its own DB session: turns on one connection run concurrently
+        db = database.SessionLocal()
+        try:
+            session_id = str(message.get("session_id", ""))
+            request = schemas.PostChatRequest(**{
+                key: message[key] for key in ("content", "style", "model") if key in message
+            })
+            trace = tracing.start_trace(session_id, transport="ws", turn=turn_id, style=request.style)
+            characters = chat_engine.prepare_turn(db, session_id, self.user_id, request, trace)
+            await self.send(["s", turn_id, session_id, [[c.id, c.name] for c in characters], trace.trace_id])
+
+            index = {character.id: idx for idx, character in enumerate(characters)}
+            # Closed right away on cancel (not at GC), which also stops the upstream LLM request
+            events = chat_engine.stream_turn_events(db, session_id, request, characters, trace)
+            async with aclosing(events):
+                async for event in events:
+                    idx = index[event["character"].id]
+                    if event["type"] == "delta":
+                        await self.send(["d", turn_id, idx, event["content"]])
+                    else:
+                        await self.send(["e", turn_id, idx, event["message_id"]])
+            await self.send(["f", turn_id])
+        except asyncio.CancelledError:
+            raise
+        except HTTPException as e:
+            await self.send(["x", turn_id, e.status_code, e.detail])
+        except ValidationError as e:
+            await self.send(["x", turn_id, 422, str(e)])
+        except Exception as e:
+            await self.send(["x", turn_id, 500, f"System Error: {e}"])
+        finally:
+            db.close()
+            self.turns.pop(turn_id, None)
+
+    async def close(self):
+        tasks = list(self.turns.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# WS /api/sessions/chat/ws
+@router.websocket("/ws")
+async def chat_websocket(
+    websocket: WebSocket,
+    user_id: Optional[str] = Query(None),
+    header_user_id: Optional[str] = Header(None, alias="X-User-ID")
+):
+    user_id = header_user_id or user_id
+    if not user_id:
+        await websocket.close(code=1008, reason="user_id is required")
+        return
+
+    await websocket.accept()
+    connection = ChatConnection(websocket, user_id)
+    writer = asyncio.create_task(connection.writer())
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                await connection.send(["x", None, 400, "Invalid JSON frame"])
+                continue
+            if not isinstance(message, dict):
+                await connection.send(["x", None, 400, "Frame must be a JSON object"])
+                continue
+
+            op = message.get("op")
+            if op == "chat":
+                await connection.start_turn(message)
+            elif op == "cancel":
+                connection.cancel_turn(message.get("turn"))
+            elif op == "ping":
+                await connection.send(["p"])
+            else:
+                await connection.send(["x", message.get("turn"), 400, f"Unknown op: {op!r}"])
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await connection.close()
+        writer.cancel()
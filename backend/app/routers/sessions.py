@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+import logging
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
-from .. import crud, schemas, database
+from .. import crud, schemas, database, http_cache, transcripts
 
 
 router = APIRouter(prefix="/api/sessions", tags=["sessions"])
+logger = logging.getLogger(__name__)
 
 
 # POST /api/sessions
@@ -19,12 +22,60 @@ def create_session(
 # GET /api/sessions
 @router.get("/", response_model=List[schemas.SessionInfo])
 def read_sessions(
+    request: Request,
+    response: Response,
     user_id: str = Header(..., alias="X-User-ID"),
     db: Session = Depends(database.get_db)
 ):
+    # Stamped before the list query: a change racing with it costs one extra 200, never a stale 304
+    etag = http_cache.make_etag(
+        "sessions", user_id, crud.get_catalog_version(db), *crud.get_user_sessions_stamp(db, user_id=user_id)
+    )
+    if http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified(etag)
+    http_cache.set_etag(response, etag)
     return crud.get_user_sessions(db, user_id=user_id)
 
 
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "jsonl": "application/jsonl"}
+
+def _export_response(records, filename: str, export_format: str):
+    return StreamingResponse(
+        transcripts.to_ndjson(records),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
+
+
+# GET /api/sessions/export
+@router.get("/export")
+def export_user_sessions(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|jsonl)$"),
+    user_id: str = Header(..., alias="X-User-ID"),
+    db: Session = Depends(database.get_db)
+):
+    records = transcripts.iter_user_records(db, user_id=user_id)
+    return _export_response(records, f"sessions-{user_id}", export_format)
+
+
+# GET /api/sessions/{session_id}/export
+@router.get("/{session_id}/export")
+def export_session(
+    session_id: str,
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|jsonl)$"),
+    user_id: str = Header(..., alias="X-User-ID"),
+    db: Session = Depends(database.get_db)
+):
+    session = crud.get_session_meta(db, session_id=session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session.user_id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to export this session")
+
+    records = transcripts.iter_session_records(db, session_id=session_id)
+    return _export_response(records, f"session-{session_id}", export_format)
+
+
 # PATCH /api/sessions/{session_id}/title
 @router.patch("/{session_id}/title", response_model=schemas.PostSessionResponse)
 def update_session_title(
@@ -34,7 +85,7 @@ def update_session_title(
     db: Session = Depends(database.get_db)
 ):
     # Ensure user exists
-    session = crud.get_session(db, session_id=session_id)
+    session = crud.get_session_meta(db, session_id=session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     if session.user_id != user_id:
@@ -43,6 +94,23 @@ def update_session_title(
     return crud.update_session_title(db, session_id=session_id, new_title=request.title)
 
 
+# PATCH /api/sessions/{session_id}/responders
+@router.patch("/{session_id}/responders", response_model=schemas.PostSessionResponse)
+def update_session_responders(
+    session_id: str,
+    request: schemas.PatchSessionRespondersRequest,
+    user_id: str = Header(..., alias="X-User-ID"),
+    db: Session = Depends(database.get_db)
+):
+    session = crud.get_session_meta(db, session_id=session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session.user_id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to update this session")
+
+    return crud.update_session_responders(db, session_id=session_id, responder_k=request.responder_k)
+
+
 # DELETE /api/sessions/{session_id}
 @router.delete("/{session_id}", response_model=schemas.DeleteSessionResponse)
 def delete_session(
@@ -54,4 +122,31 @@ def delete_session(
     success = crud.delete_session(db, session_id=session_id, user_id=user_id)
     if not success:
         raise HTTPException(status_code=404, detail="Session not found or not authorized to delete")
-    return schemas.DeleteSessionResponse(status="deleted", session_id=session_id)
\ No newline at end of file
+    return schemas.DeleteSessionResponse(status="deleted", session_id=session_id)
+
+
+def _delete_all_sessions(user_id: str):
+    """Background job: runs after the response with its own DB session."""
+    db = database.SessionLocal()
+    try:
+        deleted = crud.delete_user_sessions_chunked(db, user_id=user_id)
+        logger.info(f"Deleted {deleted} sessions of user {user_id}")
+    except Exception as e:
+        logger.error(f"Bulk session deletion failed for user {user_id}: {e}")
+    finally:
+        db.close()
+
+
+# DELETE /api/sessions
+@router.delete("/", response_model=schemas.DeleteAllSessionsResponse, status_code=202)
+def delete_all_sessions(
+    background_tasks: BackgroundTasks,
+    user_id: str = Header(..., alias="X-User-ID"),
+    db: Session = Depends(database.get_db)
+):
+    session_count = crud.count_user_sessions(db, user_id=user_id)
+    if not session_count:
+        return schemas.DeleteAllSessionsResponse(status="nothing_to_delete", session_count=0)
+
+    background_tasks.add_task(_delete_all_sessions, user_id)
+    return schemas.DeleteAllSessionsResponse(status="scheduled", session_count=session_count)
\ No newline at end of file
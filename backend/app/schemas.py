@@ -14,6 +14,7 @@ class SessionInfo(BaseModel):
     id: UUID = Field(..., description="The unique identifier of the session.")
     title: str = Field(..., description="The title of the session.")
     created_at: datetime = Field(..., description="Timestamp when the session was created.")
+    responder_k: Optional[int] = Field(None, description="Max number of characters answering each turn (null = all).")
     characters: List[CharacterSummary] = Field(..., description="List of characters in the session.")
 
 class MessageInfo(BaseModel):
@@ -27,12 +28,14 @@ class MessageInfo(BaseModel):
 class PostSessionRequest(BaseModel):
     user_id: UUID = Field(..., description="The unique identifier of the user.")
     character_ids: List[UUID] = Field(..., description="List of character IDs to include in the session.")
+    responder_k: Optional[int] = Field(None, ge=1, description="Max number of characters answering each turn (null = all).")
 
 class PostSessionResponse(BaseModel):
     id: UUID = Field(..., description="The unique identifier of the created session.")
     user_id: UUID = Field(..., description="The unique identifier of the user who created the session.")
     title: str = Field(..., description="The title of the session.")
     created_at: datetime = Field(..., description="Timestamp when the session was created.")
+    responder_k: Optional[int] = Field(None, description="Max number of characters answering each turn (null = all).")
     characters: List[CharacterSummary] = Field(
         ...,
         serialization_alias="character_descriptions",
@@ -42,11 +45,18 @@ class PostSessionResponse(BaseModel):
 class PatchSessionTitleRequest(BaseModel):
     title: str = Field(..., description="The new title for the session.")
 
+class PatchSessionRespondersRequest(BaseModel):
+    responder_k: Optional[int] = Field(None, ge=1, description="Max number of characters answering each turn (null = all).")
+
 
 class DeleteSessionResponse(BaseModel):
     status: str = Field(..., description="Status message indicating the result of the deletion operation.")
     session_id: UUID = Field(..., description="The unique identifier of the deleted session.")
 
+class DeleteAllSessionsResponse(BaseModel):
+    status: str = Field(..., description="Status of the bulk deletion ('scheduled' or 'nothing_to_delete').")
+    session_count: int = Field(..., description="Number of sessions scheduled for deletion.")
+
 
 class PostChatRequest(BaseModel):
     content: str = Field(..., description="The content of the message.")
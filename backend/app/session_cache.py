@@ -0,0 +1,51 @@
+"""
+Caches for the request hot path (backend chosen by app.cache).
+
+- Session metadata (owner, character IDs, title): lets routers check
+  ownership without loading the session and all its characters.
+- Character catalog: tiny and rarely changing, so chat turns resolve
+  characters without a query.
+"""
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from .cache import get_cache, dataclass_serializer, all_cache_stats
+
+
+@dataclass(frozen=True)
+class SessionMeta:
+    id: str
+    user_id: str
+    title: str
+    responder_k: Optional[int]
+    character_ids: Tuple[str, ...]
+
+@dataclass(frozen=True)
+class CharacterInfo:
+    """Detached snapshot of a Character row (safe to share across threads)."""
+    id: str
+    name: str
+    description: Optional[str]
+    persona_data: Any
+
+
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "3600"))
+CHARACTER_CACHE_TTL = float(os.getenv("CHARACTER_CACHE_TTL", "3600"))
+# With a per-worker backend a rename, delete or persona edit only invalidates the
+# worker that handled it; the other workers may serve the old entry this long
+LOCAL_CACHE_TTL = float(os.getenv("SESSION_CACHE_LOCAL_TTL", "30"))
+
+session_meta_cache = get_cache(
+    "session_meta", serializer=dataclass_serializer(SessionMeta), default_ttl=SESSION_CACHE_TTL,
+    local_ttl=LOCAL_CACHE_TTL
+)
+character_cache = get_cache(
+    "characters", serializer=dataclass_serializer(CharacterInfo), default_ttl=CHARACTER_CACHE_TTL,
+    local_ttl=LOCAL_CACHE_TTL
+)
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit/miss counters of every cache namespace in this process."""
+    return all_cache_stats()
@@ -0,0 +1,310 @@
+"""
+Per-turn tracing.
+
+Every chat turn gets a Trace that collects timed spans in memory: session and
+history load, news rewrite/search, prompt build, upstream connect, first
+token, stream end and persistence. When the turn finishes the sampler decides
+whether to keep it: failed turns and turns slower than TRACE_SLOW_SECONDS are
+always kept, the rest with probability TRACE_SAMPLE_RATE.
+
+Kept traces go to a bounded queue drained by one writer thread, which batches
+them into a local SQLite file (TRACE_DB_PATH). The request never waits on
+trace I/O; when the queue is full the trace is dropped and counted.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") == "1"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "10"))
+TRACE_DB_PATH = os.getenv("TRACE_DB_PATH", "./traces.db")
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "1000"))
+TRACE_RETENTION_DAYS = float(os.getenv("TRACE_RETENTION_DAYS", "7"))
+
+
+class Trace:
+    """Spans of one chat turn. Spans may be recorded from any thread."""
+
+    def __init__(self, session_id: str, **attrs):
+        self.trace_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.attrs: Dict[str, Any] = attrs
+        self.started_at = time.time()
+        self.status = "ok"
+        self.spans: List[Dict[str, Any]] = []
+        self._t0 = time.perf_counter()
+        self._finished = False
+
+    def _offset_ms(self, t: float) -> float:
+        return round((t - self._t0) * 1000, 3)
+
+    @contextmanager
+    def span(self, name: str, character: Optional[str] = None, **attrs):
+        """Time the enclosed block. Yields the attrs dict so callers can add to it."""
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as exc:
+            attrs["error"] = f"{type(exc).__name__}: {exc}"[:300]
+            raise
+        finally:
+            self.spans.append({
+                "name": name,
+                "character": character,
+                "start_ms": self._offset_ms(start),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                "attrs": attrs,
+            })
+
+    def event(self, name: str, character: Optional[str] = None, **attrs):
+        """Record a point in time (zero-length span), e.g. the first streamed token."""
+        self.spans.append({
+            "name": name,
+            "character": character,
+            "start_ms": self._offset_ms(time.perf_counter()),
+            "duration_ms": 0.0,
+            "attrs": attrs,
+        })
+
+    def fail(self, exc: BaseException):
+        self.status = "error"
+        self.attrs["error"] = f"{type(exc).__name__}: {exc}"[:300]
+
+    def finish(self):
+        """Close the trace and hand it to the writer if the sampler keeps it."""
+        if self._finished:
+            return
+        self._finished = True
+        self.duration_ms = self._offset_ms(time.perf_counter())
+        _writer.offer(self)
+
+
+class NullTrace:
+    """Stand-in when no trace is being recorded (tracing off, or a non-chat caller)."""
+    trace_id = None
+
+    @contextmanager
+    def span(self, name: str, character: Optional[str] = None, **attrs):
+        yield attrs
+
+    def event(self, name: str, character: Optional[str] = None, **attrs):
+        pass
+
+    def fail(self, exc: BaseException):
+        pass
+
+    def finish(self):
+        pass
+
+
+NULL_TRACE = NullTrace()
+
+
+def start_trace(session_id: str, **attrs):
+    """New trace for a chat turn (NULL_TRACE when TRACING_ENABLED=0)."""
+    if not TRACING_ENABLED:
+        return NULL_TRACE
+    return Trace(session_id, **attrs)
+
+
+# ==========================================
+# Store
+# ==========================================
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS traces ("
+        " trace_id TEXT PRIMARY KEY, session_id TEXT NOT NULL, started_at REAL NOT NULL,"
+        " duration_ms REAL, status TEXT, attrs TEXT)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_traces_session ON traces (session_id, started_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_traces_started ON traces (started_at)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS trace_spans ("
+        " trace_id TEXT NOT NULL, seq INTEGER NOT NULL, name TEXT NOT NULL, character TEXT,"
+        " start_ms REAL, duration_ms REAL, attrs TEXT,"
+        " PRIMARY KEY (trace_id, seq)) WITHOUT ROWID"
+    )
+    return conn
+
+
+class TraceWriter:
+    """Samples finished traces and writes the kept ones from a background thread."""
+
+    BATCH_SIZE = 100
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self, path: str, queue_size: int):
+        self.path = path
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._last_prune = 0.0
+        self.stats = {"finished": 0, "sampled_out": 0, "dropped": 0, "written": 0, "write_errors": 0}
+
+    def _keep(self, trace: Trace) -> bool:
+        if trace.status != "ok" or trace.duration_ms >= TRACE_SLOW_SECONDS * 1000:
+            return True
+        return random.random() < TRACE_SAMPLE_RATE
+
+    def offer(self, trace: Trace):
+        self.stats["finished"] += 1
+        if not self._keep(trace):
+            self.stats["sampled_out"] += 1
+            return
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        """Block until every queued trace has been written."""
+        if self._thread is not None:
+            self.queue.join()
+
+    def _run(self):
+        conn = _connect(self.path)
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(conn, batch)
+                self.stats["written"] += len(batch)
+                self._maybe_prune(conn)
+            except sqlite3.Error as e:
+                self.stats["write_errors"] += 1
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                logger.warning(f"Trace write failed ({len(batch)} traces): {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _write(self, conn: sqlite3.Connection, batch: List[Trace]):
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT OR REPLACE INTO traces (trace_id, session_id, started_at, duration_ms, status, attrs)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [(t.trace_id, t.session_id, t.started_at, t.duration_ms, t.status,
+              json.dumps(t.attrs, ensure_ascii=False, default=str)) for t in batch]
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO trace_spans (trace_id, seq, name, character, start_ms, duration_ms, attrs)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(t.trace_id, seq, s["name"], s["character"], s["start_ms"], s["duration_ms"],
+              json.dumps(s["attrs"], ensure_ascii=False, default=str))
+             for t in batch for seq, s in enumerate(t.spans)]
+        )
+        conn.execute("COMMIT")
+
+    def _maybe_prune(self, conn: sqlite3.Connection):
+        now = time.time()
+        if now - self._last_prune < self.PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        cutoff = now - TRACE_RETENTION_DAYS * 86400
+        conn.execute("BEGIN")
+        conn.execute(
+            "DELETE FROM trace_spans WHERE trace_id IN (SELECT trace_id FROM traces WHERE started_at < ?)",
+            (cutoff,)
+        )
+        conn.execute("DELETE FROM traces WHERE started_at < ?", (cutoff,))
+        conn.execute("COMMIT")
+
+
+_writer = TraceWriter(TRACE_DB_PATH, TRACE_QUEUE_SIZE)
+
+
+# ==========================================
+# Queries (admin API)
+# ==========================================
+
+def _trace_dict(conn: sqlite3.Connection, row) -> Dict[str, Any]:
+    trace_id, session_id, started_at, duration_ms, status, attrs = row
+    spans = conn.execute(
+        "SELECT name, character, start_ms, duration_ms, attrs FROM trace_spans"
+        " WHERE trace_id = ? ORDER BY start_ms, seq",
+        (trace_id,)
+    ).fetchall()
+    return {
+        "trace_id": trace_id,
+        "session_id": session_id,
+        "started_at": started_at,
+        "duration_ms": duration_ms,
+        "status": status,
+        "attrs": json.loads(attrs or "{}"),
+        "spans": [
+            {"name": name, "character": character, "start_ms": start, "duration_ms": duration,
+             "attrs": json.loads(span_attrs or "{}")}
+            for name, character, start, duration, span_attrs in spans
+        ],
+    }
+
+
+def get_trace(trace_id: str) -> Optional[Dict[str, Any]]:
+    """Timeline of one turn, or None if it was not sampled (or not written yet)."""
+    conn = _connect(TRACE_DB_PATH)
+    try:
+        row = conn.execute(
+            "SELECT trace_id, session_id, started_at, duration_ms, status, attrs FROM traces WHERE trace_id = ?",
+            (trace_id,)
+        ).fetchone()
+        return _trace_dict(conn, row) if row else None
+    finally:
+        conn.close()
+
+
+def get_session_traces(session_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """Most recent sampled turns of a session, newest first."""
+    conn = _connect(TRACE_DB_PATH)
+    try:
+        rows = conn.execute(
+            "SELECT trace_id, session_id, started_at, duration_ms, status, attrs FROM traces"
+            " WHERE session_id = ? ORDER BY started_at DESC LIMIT ?",
+            (session_id, limit)
+        ).fetchall()
+        return [_trace_dict(conn, row) for row in rows]
+    finally:
+        conn.close()
+
+
+def trace_stats() -> Dict[str, Any]:
+    return {
+        "enabled": TRACING_ENABLED,
+        "sample_rate": TRACE_SAMPLE_RATE,
+        "slow_seconds": TRACE_SLOW_SECONDS,
+        "queued": _writer.queue.qsize(),
+        **_writer.stats,
+    }
+
+
+def flush():
+    _writer.flush()
@@ -0,0 +1,318 @@
+"""
+Streaming export / bulk import of session transcripts as NDJSON (JSON Lines).
+
+Each session is written as one "session" record followed by its "message"
+records. Messages are read with server-side cursors (`yield_per`) in bounded
+batches, so memory stays flat no matter how long a transcript is.
+
+Usage:
+    python -m app.transcripts export --session <SESSION_ID> [-o out.jsonl]
+    python -m app.transcripts export --user <USER_ID> [-o out.jsonl]
+    python -m app.transcripts import transcripts.jsonl [--batch-size 1000] [--keep-ids]
+"""
+import argparse
+import heapq
+import json
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.orm import Session
+
+from . import models, archive
+
+
+EXPORT_BATCH_SIZE = 500
+IMPORT_BATCH_SIZE = 1000
+# Target size of each chunk handed to the HTTP response / output file
+WRITE_CHUNK_BYTES = 64 * 1024
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+def _parse_dt(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+# 1. Export
+def _session_record(db: Session, db_session: models.Session) -> dict:
+    character_ids = [row.character_id for row in db.execute(
+        select(models.session_characters.c.character_id)
+        .where(models.session_characters.c.session_id == db_session.id)
+    )]
+    return {
+        "type": "session",
+        "id": db_session.id,
+        "user_id": db_session.user_id,
+        "title": db_session.title,
+        "responder_k": db_session.responder_k,
+        "created_at": _iso(db_session.created_at),
+        "last_activity_at": _iso(db_session.last_activity_at),
+        "character_ids": character_ids,
+    }
+
+def _archived_message_records(db: Session, session_id: str) -> Iterator[dict]:
+    """Read messages straight from the cold-storage blob (exporting does not rehydrate)."""
+    db_archive = db.query(models.SessionArchive)\
+        .filter(models.SessionArchive.session_id == session_id)\
+        .first()
+    if db_archive is None:
+        return
+    rows = json.loads(archive.decompress(db_archive.payload, db_archive.codec).decode("utf-8"))
+    for row in rows:
+        yield {"type": "message", "session_id": session_id, **row}
+
+def _hot_message_records(db: Session, session_id: str, batch_size: int) -> Iterator[dict]:
+    message = models.Message
+    rows = db.execute(
+        select(message.id, message.role, message.content, message.created_at, message.character_id)
+        .where(message.session_id == session_id)
+        .order_by(message.id.asc())
+        .execution_options(yield_per=batch_size)
+    )
+    for row in rows:
+        yield {
+            "type": "message",
+            "session_id": session_id,
+            "id": row.id,
+            "role": row.role,
+            "content": row.content,
+            "created_at": _iso(row.created_at),
+            "character_id": row.character_id,
+        }
+
+def iter_session_records(db: Session, session_id: str,
+                         batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[dict]:
+    """Yield the session record and then every message, oldest first."""
+    db_session = db.query(models.Session).filter(models.Session.id == session_id).first()
+    if db_session is None:
+        return
+    yield _session_record(db, db_session)
+
+    # Messages stored after archiving stay hot, and a rehydration may be half done:
+    # merge both sources by ID (each is already ordered) and drop duplicates
+    last_id = None
+    for record in heapq.merge(_archived_message_records(db, session_id),
+                              _hot_message_records(db, session_id, batch_size),
+                              key=lambda record: record["id"]):
+        if record["id"] != last_id:
+            yield record
+        last_id = record["id"]
+
+def iter_user_records(db: Session, user_id: str,
+                      batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[dict]:
+    """Yield every session of a user (oldest first), one after another."""
+    session_ids = [row.id for row in db.execute(
+        select(models.Session.id)
+        .where(models.Session.user_id == user_id)
+        .order_by(models.Session.created_at.asc())
+    )]
+    for session_id in session_ids:
+        yield from iter_session_records(db, session_id, batch_size=batch_size)
+        # Drop ORM objects of the finished session so the identity map stays small
+        db.expunge_all()
+
+def to_ndjson(records: Iterable[dict]) -> Iterator[str]:
+    """Serialize records as NDJSON, grouped into ~64 KB chunks."""
+    buffer: List[str] = []
+    size = 0
+    for record in records:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= WRITE_CHUNK_BYTES:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+# 2. Import
+class TranscriptImporter:
+    """
+    Feed NDJSON records one at a time; messages are written with batched
+    inserts. Sessions that already exist are skipped together with their messages.
+
+    Each session is committed once the next one starts (and by close()), so
+    the write lock is never held for a whole file. On an error the caller
+    rolls back the session in progress; the ones before it stay imported and
+    are skipped when the file is sent again. Messages get fresh IDs unless
+    keep_ids is set.
+    """
+
+    def __init__(self, db: Session, batch_size: int = IMPORT_BATCH_SIZE, keep_ids: bool = False):
+        self.db = db
+        self.batch_size = batch_size
+        self.keep_ids = keep_ids
+        self.counts = {"sessions": 0, "messages": 0, "skipped_sessions": 0, "skipped_messages": 0}
+        self._known_characters = {row.id for row in db.execute(select(models.Character.id))}
+        self._known_users = set()
+        self._accepted_sessions = set()
+        self._pending: List[dict] = []
+        self._explicit_ids = False
+        self.committed_sessions = 0
+
+    def feed_line(self, line: str):
+        line = line.strip()
+        if line:
+            self.feed(json.loads(line))
+
+    def feed_lines(self, lines: Iterable[str]):
+        for line in lines:
+            self.feed_line(line)
+
+    def feed(self, record: Dict):
+        kind = record.get("type")
+        if kind == "session":
+            self._add_session(record)
+        elif kind == "message":
+            self._add_message(record)
+        else:
+            raise ValueError(f"Unknown record type: {kind!r}")
+
+    def close(self) -> dict:
+        """Write what is left and commit the last session."""
+        self._commit()
+        return self.counts
+
+    def _commit(self):
+        self._flush()
+        if self._explicit_ids and self.db.get_bind().dialect.name == "postgresql":
+            # Explicit IDs bypass the sequence; move it past them or later inserts collide
+            self.db.execute(text(
+                "SELECT setval(pg_get_serial_sequence('messages', 'id'), "
+                "(SELECT COALESCE(MAX(id), 1) FROM messages))"
+            ))
+            self._explicit_ids = False
+        self.db.commit()
+        self.committed_sessions = self.counts["sessions"]
+
+    def _ensure_user(self, user_id: str):
+        if user_id in self._known_users:
+            return
+        if self.db.query(models.User.id).filter(models.User.id == user_id).first() is None:
+            self.db.execute(insert(models.User), [{"id": user_id}])
+        self._known_users.add(user_id)
+
+    def _add_session(self, record: Dict):
+        session_id = record["id"]
+        # Check our own uncommitted session too: a read-only connection cannot see it yet
+        exists = session_id in self._accepted_sessions or \
+            self.db.query(models.Session.id).filter(models.Session.id == session_id).first() is not None
+        if exists:
+            self.counts["skipped_sessions"] += 1
+            return
+
+        self._commit()
+        self._ensure_user(record["user_id"])
+        created_at = _parse_dt(record.get("created_at"))
+        self.db.execute(insert(models.Session), [{
+            "id": session_id,
+            "user_id": record["user_id"],
+            "title": record.get("title") or "New Chat",
+            "responder_k": record.get("responder_k"),
+            "created_at": created_at,
+            "last_activity_at": _parse_dt(record.get("last_activity_at")) or created_at,
+        }])
+        links = [
+            {"session_id": session_id, "character_id": character_id}
+            for character_id in record.get("character_ids") or []
+            if character_id in self._known_characters
+        ]
+        if links:
+            self.db.execute(insert(models.session_characters), links)
+        self._accepted_sessions.add(session_id)
+        self.counts["sessions"] += 1
+
+    def _add_message(self, record: Dict):
+        if record.get("session_id") not in self._accepted_sessions:
+            self.counts["skipped_messages"] += 1
+            return
+        character_id = record.get("character_id")
+        values = {
+            "session_id": record["session_id"],
+            "role": record.get("role"),
+            "content": record.get("content"),
+            "created_at": _parse_dt(record.get("created_at")),
+            "character_id": character_id if character_id in self._known_characters else None,
+        }
+        if self.keep_ids and record.get("id") is not None:
+            values["id"] = record["id"]
+            self._explicit_ids = True
+        self._pending.append(values)
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            # Rows with and without explicit IDs must not share one executemany
+            with_ids = [row for row in self._pending if "id" in row]
+            without_ids = [row for row in self._pending if "id" not in row]
+            for rows in (with_ids, without_ids):
+                if rows:
+                    self.db.execute(insert(models.Message), rows)
+            self.counts["messages"] += len(self._pending)
+            self._pending = []
+
+def import_records(db: Session, lines: Iterable[str], batch_size: int = IMPORT_BATCH_SIZE,
+                   keep_ids: bool = False) -> dict:
+    importer = TranscriptImporter(db, batch_size=batch_size, keep_ids=keep_ids)
+    try:
+        importer.feed_lines(lines)
+        return importer.close()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def main():
+    from .database import SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Export or import session transcripts as NDJSON.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="Stream transcripts to a file or stdout.")
+    target = export_cmd.add_mutually_exclusive_group(required=True)
+    target.add_argument("--session", help="Export a single session.")
+    target.add_argument("--user", help="Export all sessions of a user.")
+    export_cmd.add_argument("-o", "--output", help="Output file (default: stdout).")
+    export_cmd.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+
+    import_cmd = commands.add_parser("import", help="Bulk-import an NDJSON transcript file.")
+    import_cmd.add_argument("path", help="NDJSON file ('-' for stdin).")
+    import_cmd.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    import_cmd.add_argument("--keep-ids", action="store_true",
+                            help="Keep the exported message IDs instead of letting the database assign new ones.")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.command == "export":
+            if args.session:
+                records = iter_session_records(db, args.session, batch_size=args.batch_size)
+            else:
+                records = iter_user_records(db, args.user, batch_size=args.batch_size)
+            out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+            try:
+                for chunk in to_ndjson(records):
+                    out.write(chunk)
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+        else:
+            source = sys.stdin if args.path == "-" else open(args.path, "r", encoding="utf-8")
+            try:
+                counts = import_records(db, source, batch_size=args.batch_size, keep_ids=args.keep_ids)
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+            print(json.dumps(counts), file=sys.stderr)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Per-mode generation budgets for guru replies.
+
+Each mode gets a token cap (sent upstream as ``max_tokens``), an optional
+sentence limit enforced server-side, and a wall-clock deadline. A
+``BudgetTracker`` watches the stream and tells the engine when to stop.
+
+The tracker counts stream chunks, not tokens: a chunk usually carries one or a
+few tokens. Token counts come from the upstream ``usage`` block and are only
+known for replies that ran to the end of the stream.
+"""
+import logging
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+@dataclass(frozen=True)
+class GenerationBudget:
+    max_tokens: int
+    max_sentences: Optional[int]
+    deadline_seconds: float
+
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: Optional[int], allow_off: bool = False) -> Optional[int]:
+    """
+    A positive integer from the environment. With allow_off, 0 turns the limit
+    off (None); anything else that is not a positive integer falls back to the
+    default.
+    """
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        parsed = int(value)
+    except ValueError:
+        parsed = -1
+    if parsed == 0 and allow_off:
+        return None
+    if parsed <= 0:
+        logger.warning(f"Ignoring {name}={value!r}: expected a positive integer, using {default}")
+        return default
+    return parsed
+
+
+def _env_float(name: str, default: float) -> float:
+    """A positive, finite number of seconds from the environment; anything else falls back to the default."""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        parsed = float(value)
+    except ValueError:
+        parsed = -1.0
+    if not math.isfinite(parsed) or parsed <= 0:
+        logger.warning(f"Ignoring {name}={value!r}: expected a positive number, using {default}")
+        return default
+    return parsed
+
+
+def _load_budget(mode: str, max_tokens: int, max_sentences: Optional[int], deadline: float):
+    prefix = f"GEN_BUDGET_{mode.upper()}"
+    return GenerationBudget(
+        max_tokens=_env_int(f"{prefix}_MAX_TOKENS", max_tokens),
+        max_sentences=_env_int(f"{prefix}_MAX_SENTENCES", max_sentences, allow_off=True),
+        deadline_seconds=_env_float(f"{prefix}_DEADLINE_SECONDS", deadline),
+    )
+
+
+# Hot mode is told "Maximum 2-3 sentences", so cap it hard; cold mode may lecture.
+GENERATION_BUDGETS: Dict[str, GenerationBudget] = {
+    "hot": _load_budget("hot", max_tokens=200, max_sentences=3, deadline=20.0),
+    "cold": _load_budget("cold", max_tokens=1024, max_sentences=None, deadline=60.0),
+}
+
+SENTENCE_TERMINATORS = ".!?。！？"
+SENTENCE_CLOSERS = "\"')]”’」』"
+# A period after these words does not end a sentence
+ABBREVIATIONS = frozenset({
+    "e.g.", "i.e.", "etc.", "vs.", "cf.", "approx.", "no.", "mr.", "mrs.", "ms.", "dr.",
+    "prof.", "st.", "jr.", "sr.", "inc.", "ltd.", "co.", "corp.", "jan.", "feb.", "mar.",
+    "apr.", "jun.", "jul.", "aug.", "sep.", "sept.", "oct.", "nov.", "dec.",
+})
+# Initials and dotted acronyms: "J.", "U.S.", "a.m."
+_INITIALS = re.compile(r"^(?:[^\W\d_]\.)+$")
+
+
+def get_budget(mode: str) -> GenerationBudget:
+    return GENERATION_BUDGETS.get(mode, GENERATION_BUDGETS["cold"])
+
+
+class BudgetTracker:
+    """Track one reply against its budget while it streams."""
+
+    def __init__(self, mode: str, budget: Optional[GenerationBudget] = None):
+        self.mode = mode
+        self.budget = budget or get_budget(mode)
+        self.started_at = time.monotonic()
+        self.chunks = 0
+        self.tokens: Optional[int] = None
+        self.sentences = 0
+        self.stop_reason: Optional[str] = None
+        self._after_terminator = False
+        # The word being streamed, to tell "e.g. " from the end of a sentence
+        self._word = ""
+
+    @property
+    def exhausted(self) -> bool:
+        return self.stop_reason is not None
+
+    def remaining_seconds(self) -> float:
+        return max(0.0, self.budget.deadline_seconds - (time.monotonic() - self.started_at))
+
+    def check_deadline(self) -> bool:
+        """Return True (and mark the reply stopped) once the deadline has passed."""
+        if self.stop_reason is None and self.remaining_seconds() <= 0:
+            self.stop_reason = "deadline"
+        return self.stop_reason == "deadline"
+
+    def feed(self, text: str) -> str:
+        """
+        Account for one streamed chunk and return the part that fits the budget.
+        Text after the last allowed sentence boundary is dropped.
+        """
+        if self.exhausted:
+            return ""
+        self.chunks += 1
+
+        limit = self.budget.max_sentences
+        if limit:
+            for idx, char in enumerate(text):
+                if char.isspace():
+                    if self._after_terminator and not self._is_abbreviation(self._word):
+                        self.sentences += 1
+                        if self.sentences >= limit:
+                            self.stop_reason = "sentences"
+                            return text[:idx]
+                    self._after_terminator = False
+                    self._word = ""
+                    continue
+                self._word = self._word[-15:] + char
+                if char in SENTENCE_TERMINATORS:
+                    self._after_terminator = True
+                elif not (self._after_terminator and char in SENTENCE_CLOSERS):
+                    self._after_terminator = False
+
+        # Backstop only: upstream enforces max_tokens, and a chunk holds at least one token
+        if self.chunks >= self.budget.max_tokens:
+            self.stop_reason = "max_tokens"
+        return text
+
+    @staticmethod
+    def _is_abbreviation(word: str) -> bool:
+        word = word.rstrip(SENTENCE_CLOSERS).lower()
+        if not word.endswith("."):
+            return False
+        return word in ABBREVIATIONS or bool(_INITIALS.match(word))
+
+    def truncate(self, text: str) -> str:
+        """Apply the sentence limit to a complete (non-streamed) reply."""
+        return self.feed(text)
+
+    def finish(self, usage_tokens: Optional[int] = None) -> Dict[str, object]:
+        """Record the finished reply in the per-mode stats and return its summary."""
+        if usage_tokens:
+            self.tokens = usage_tokens
+        duration = time.monotonic() - self.started_at
+        _record(self.mode, self.chunks, self.tokens, duration, self.stop_reason)
+        return {
+            "mode": self.mode,
+            "chunks": self.chunks,
+            "tokens": self.tokens,
+            "duration": round(duration, 3),
+            "stop_reason": self.stop_reason or "complete",
+        }
+
+
+# ==========================================
+# Per-mode stats
+# ==========================================
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, object]] = {}
+
+
+def _record(mode: str, chunks: int, tokens: Optional[int], duration: float, stop_reason: Optional[str]):
+    with _stats_lock:
+        entry = _stats.setdefault(mode, {
+            "replies": 0, "chunks": 0, "usage_replies": 0, "tokens": 0, "duration": 0.0, "stop_reasons": {}
+        })
+        entry["replies"] += 1
+        entry["chunks"] += chunks
+        if tokens is not None:
+            entry["usage_replies"] += 1
+            entry["tokens"] += tokens
+        entry["duration"] += duration
+        reason = stop_reason or "complete"
+        entry["stop_reasons"][reason] = entry["stop_reasons"].get(reason, 0) + 1
+
+
+def get_generation_stats() -> Dict[str, Dict[str, object]]:
+    """
+    Mean stream chunks and duration per reply, per mode. mean_tokens only
+    covers the replies upstream reported usage for (usage_replies).
+    """
+    with _stats_lock:
+        report = {}
+        for mode, entry in _stats.items():
+            replies = entry["replies"] or 1
+            report[mode] = {
+                "replies": entry["replies"],
+                "mean_chunks": round(entry["chunks"] / replies, 1),
+                "usage_replies": entry["usage_replies"],
+                "mean_tokens": round(entry["tokens"] / entry["usage_replies"], 1) if entry["usage_replies"] else None,
+                "mean_duration_seconds": round(entry["duration"] / replies, 3),
+                "stop_reasons": dict(entry["stop_reasons"]),
+            }
+        return report
+
+
+def reset_generation_stats():
+    with _stats_lock:
+        _stats.clear()
@@ -1,17 +1,32 @@
 import os
 import json
+import logging
+import socket
+import threading
+import time
 import requests
 from fastapi import HTTPException
 from dotenv import load_dotenv
 from typing import Callable, Optional, List, Dict
+from .generation_budget import BudgetTracker
+from .persona_compiler import compile_persona, count_tokens
+from ..cache import get_cache
+from ..tracing import NULL_TRACE
 
 # 1. 환경 변수 및 설정 로드
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 FLOCK_API_KEY = os.getenv("FLOCK_API_KEY")
 SERPER_API_KEY = os.getenv("SERPER_API_KEY")
 FLOCK_BASE_URL = "https://api.flock.io/v1"
 MODEL_ID = "qwen3-235b-a22b-instruct-2507"
+UPSTREAM_CONNECT_TIMEOUT = 10
+
+# 같은 질문의 뉴스는 잠시 재사용 (검색어 변환 + 검색 호출 절약)
+NEWS_CACHE_TTL = float(os.getenv("NEWS_CACHE_TTL", "300"))
+news_cache = get_cache("news", default_ttl=NEWS_CACHE_TTL)
 
 # ==========================================    
 # [Part 1] 뉴스 검색 및 처리 도구 (Tools)
@@ -48,11 +63,22 @@ def search_news_api(keyword):
     except:
         return []
 
-def get_formatted_news(user_question):
+def get_formatted_news(user_question, trace=NULL_TRACE, character_name=None):
     """질문 -> 검색어 변환 -> 뉴스 검색 -> 텍스트 포맷팅"""
-    print(f"   🔎 [System] 뉴스 검색 중... (질문: {user_question})")
-    query = generate_search_query(user_question)
-    results = search_news_api(query)
+    cache_key = " ".join(str(user_question).lower().split())
+    cached = news_cache.get(cache_key)
+    if cached is not None:
+        trace.event("news.cache_hit", character=character_name)
+        logger.info(f"   📰 [System] 캐시된 뉴스 사용 (질문: {user_question})")
+        return cached
+
+    logger.info(f"   🔎 [System] 뉴스 검색 중... (질문: {user_question})")
+    with trace.span("news.rewrite", character=character_name) as attrs:
+        query = generate_search_query(user_question)
+        attrs["query"] = query
+    with trace.span("news.search", character=character_name) as attrs:
+        results = search_news_api(query)
+        attrs["results"] = len(results)
     
     if not results: return "No relevant news found."
 
@@ -61,6 +87,7 @@ def get_formatted_news(user_question):
         text += f"{i+1}. {item.get('title')} (Source: {item.get('source', 'Web')})\n"
         text += f"   Summary: {item.get('snippet')}\n\n"
     text += "</LATEST_MARKET_NEWS>"
+    news_cache.set(cache_key, text)
     return text
 
 # ==========================================
@@ -99,10 +126,76 @@ def _format_conversation_history(chat_history: Optional[List[Dict[str, str]]]):
     return "\n".join(lines)
 
 
+def _finish_reply(budget_tracker: BudgetTracker, character_name: str, text: str,
+                  usage_tokens: Optional[int] = None, trace=NULL_TRACE):
+    """Record budget stats for a finished reply and return its final text."""
+    summary = budget_tracker.finish(usage_tokens)
+    trace.event("stream.end", character=character_name, chunks=summary["chunks"],
+                tokens=summary["tokens"], stop_reason=summary["stop_reason"])
+    logger.info(f"   ⏱️ [Engine] {character_name} done: {summary['chunks']} chunks, "
+                f"{summary['tokens'] or '?'} tokens, {summary['duration']}s ({summary['stop_reason']})")
+    return text
+
+
+def _upstream_socket(response):
+    connection = getattr(getattr(response, "raw", None), "connection", None)
+    return getattr(connection, "sock", None)
+
+
+def _bound_read_timeout(response, seconds: float):
+    """Shrink the socket read timeout so a stalled stream cannot outlive the deadline."""
+    sock = _upstream_socket(response)
+    if sock is not None:
+        sock.settimeout(max(seconds, 0.001))
+
+
+class UpstreamCancel:
+    """
+    Stops a streaming reply from another thread (the client cancelled or left).
+    The read loop exits at its next line, and the upstream socket is shut down
+    so a read blocked on a stalled upstream returns at once; no more tokens
+    are generated for a reply nobody reads.
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._response = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def attach(self, response):
+        with self._lock:
+            self._response = response
+        if self.cancelled:
+            self._shutdown(response)
+
+    def cancel(self):
+        self._cancelled.set()
+        with self._lock:
+            response = self._response
+        if response is not None:
+            self._shutdown(response)
+
+    @staticmethod
+    def _shutdown(response):
+        sock = _upstream_socket(response)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        else:
+            response.close()
+
+
 def generate_guru_response(user_query, mode, character_profile,
                            chat_history: Optional[List[Dict[str, str]]] = None,
                            stream_callback: Optional[Callable[[str], None]] = None,
-                           stream_end_callback: Optional[Callable[[], None]] = None):
+                           stream_end_callback: Optional[Callable[[], None]] = None,
+                           trace=NULL_TRACE, cancel: Optional[UpstreamCancel] = None):
     """
     [범용 함수] 어떤 캐릭터든 프로필만 넣으면 그 사람처럼 연기함.
     
@@ -111,26 +204,33 @@ def generate_guru_response(user_query, mode, character_profile,
         mode (str): 'hot' 또는 'cold'
         character_profile (dict): 캐릭터 설정이 담긴 JSON 객체
         chat_history (List[Dict]): 세션의 이전 대화 기록
+        trace (tracing.Trace): 턴 타임라인 (뉴스/업스트림/스트림 구간 기록)
+        cancel (UpstreamCancel): 스트리밍 중단 신호 (클라이언트 취소/이탈)
     
     Returns:
         str: AI의 최종 답변
     """
     
+    character_name = character_profile['name']
+
     # 1. 뉴스 처리 로직 (Cold일 때만 뉴스 가져옴)
     news_context = ""
     if mode == "cold":
-        news_context = get_formatted_news(user_query)
+        with trace.span("news", character=character_name):
+            news_context = get_formatted_news(user_query, trace=trace, character_name=character_name)
     else:
-        print("   🔥 [System] Hot 모드: 뉴스 검색 생략")
+        logger.info("   🔥 [System] Hot 모드: 뉴스 검색 생략")
         news_context = "No external news provided. Rely on your intuition and philosophy."
 
-    # 2. 시스템 프롬프트 조립 (외부에서 받은 character_profile 사용)
+    # 2. 시스템 프롬프트 조립 (모드별로 압축된 페르소나 사용)
+    prompt_started = time.perf_counter()
+    persona_block = compile_persona(character_profile, mode)
     system_instruction = f"""
-    You are an AI roleplaying as the character defined in the JSON below.
-    Internalize all attributes, especially the 'tone' and 'signature_phrases'.
+    You are an AI roleplaying as the character defined below.
+    Internalize all attributes, especially the 'Tone' and 'Signature phrases'.
 
     [CHARACTER PROFILE]
-    {json.dumps(character_profile, ensure_ascii=False)}
+    {persona_block}
 
     [CURRENT MODE: {mode.upper()}]
     """
@@ -141,7 +241,7 @@ def generate_guru_response(user_query, mode, character_profile,
         - Be polite, wise, and calm.
         - Use honorifics (존댓말).
         - Base your advice on the provided <LATEST_MARKET_NEWS>.
-        - Use phrases from 'signature_phrases_cold'.
+        - Use the 'Signature phrases'.
         """
         temperature = 0.4
     else: # hot
@@ -149,7 +249,7 @@ def generate_guru_response(user_query, mode, character_profile,
         - Be sarcastic, blunt, and aggressive.
         - Talk like a strict grandfather (or crazy genius) scolding a reckless newbie.
         - IGNORE polite tones. Use memes or slang if appropriate.
-        - Use phrases from 'signature_phrases_hot'.
+        - Use the 'Signature phrases'.
         - Don't rely on news; rely on your gut feeling and philosophy.
         [IMPORTANT RULE]
         - Keep your response VERY SHORT and PUNCHY.
@@ -170,27 +270,50 @@ def generate_guru_response(user_query, mode, character_profile,
             f"Latest User Question: {user_query}"
         )}
     ]
-
-    # 4. Qwen API 호출
+    trace.event("prompt.build", character=character_name,
+                build_ms=round((time.perf_counter() - prompt_started) * 1000, 3),
+                prompt_chars=sum(len(m["content"]) for m in messages),
+                persona_tokens=count_tokens(persona_block))
+
+    # 4. Qwen API 호출 (모드별 생성 예산 적용)
+    budget_tracker = BudgetTracker(mode)
+    budget = budget_tracker.budget
     url = f"{FLOCK_BASE_URL}/chat/completions"
     headers = {"Content-Type": "application/json", "x-litellm-api-key": FLOCK_API_KEY}
     payload = {
         "model": MODEL_ID,
         "messages": messages,
-        "temperature": temperature
+        "temperature": temperature,
+        "max_tokens": budget.max_tokens
     }
-    
-    print(f"   💬 [Engine] {character_profile['name']} ({mode.upper()}) 답변 생성 중...")
+    # The read timeout bounds a stalled upstream to what is left of the deadline
+    timeout = (UPSTREAM_CONNECT_TIMEOUT, budget_tracker.remaining_seconds())
+
+    logger.info(f"   💬 [Engine] {character_name} ({mode.upper()}) 답변 생성 중...")
 
     if stream_callback:
         payload["stream"] = True
+        # Token counts for the stats; sent in a last chunk, so only for replies read to the end
+        payload["stream_options"] = {"include_usage": True}
         collected_chunks = []
+        usage_tokens = None
         response = None
         try:
-            response = requests.post(url, headers=headers, json=payload, stream=True)
-            response.raise_for_status()
+            request_started = time.perf_counter()
+            with trace.span("upstream.connect", character=character_name) as attrs:
+                response = requests.post(url, headers=headers, json=payload, stream=True, timeout=timeout)
+                attrs["status"] = response.status_code
+                response.raise_for_status()
+            if cancel is not None:
+                cancel.attach(response)
 
             for raw_line in response.iter_lines(decode_unicode=True):
+                if cancel is not None and cancel.cancelled:
+                    budget_tracker.stop_reason = "cancelled"
+                    break
+                if budget_tracker.check_deadline():
+                    break
+                _bound_read_timeout(response, budget_tracker.remaining_seconds())
                 if not raw_line:
                     continue
                 data_line = raw_line
@@ -209,6 +332,9 @@ def generate_guru_response(user_query, mode, character_profile,
                 except json.JSONDecodeError:
                     continue
 
+                usage = event.get("usage") or {}
+                usage_tokens = usage.get("completion_tokens") or usage_tokens
+
                 choices = event.get("choices")
                 if not choices:
                     continue
@@ -218,21 +344,44 @@ def generate_guru_response(user_query, mode, character_profile,
                 if not text_chunk:
                     continue
 
-                collected_chunks.append(text_chunk)
-                try:
-                    stream_callback(text_chunk)
-                except Exception:
-                    pass
+                # Drop anything past the budget, then close the upstream stream early
+                text_chunk = budget_tracker.feed(text_chunk)
+                if text_chunk:
+                    if not collected_chunks:
+                        trace.event("upstream.first_token", character=character_name,
+                                    ttft_ms=round((time.perf_counter() - request_started) * 1000, 3))
+                    collected_chunks.append(text_chunk)
+                    try:
+                        stream_callback(text_chunk)
+                    except Exception:
+                        pass
+                if budget_tracker.exhausted:
+                    break
 
-            return "".join(collected_chunks)
-        except requests.HTTPError as err:
-            status_code = err.response.status_code if err.response is not None else 502
-            raise HTTPException(
-                status_code=status_code,
-                detail=f"LLM streaming HTTP error: {err}"
-            ) from err
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"LLM streaming error: {e}") from e
+            # A cancel can also end the stream cleanly (the closed response just stops yielding)
+            if cancel is not None and cancel.cancelled and not budget_tracker.exhausted:
+                budget_tracker.stop_reason = "cancelled"
+            return _finish_reply(budget_tracker, character_name,
+                                 "".join(collected_chunks), usage_tokens, trace)
+        except Exception as err:
+            # The read failed because we shut the socket down: a cancel, not an upstream failure
+            if cancel is not None and cancel.cancelled:
+                budget_tracker.stop_reason = "cancelled"
+                return _finish_reply(budget_tracker, character_name,
+                                     "".join(collected_chunks), usage_tokens, trace)
+            if isinstance(err, requests.HTTPError):
+                status_code = err.response.status_code if err.response is not None else 502
+                raise HTTPException(
+                    status_code=status_code,
+                    detail=f"LLM streaming HTTP error: {err}"
+                ) from err
+            if isinstance(err, (requests.Timeout, requests.ConnectionError)):
+                # A read timeout past the deadline is a budget stop, not a failure
+                if collected_chunks and budget_tracker.check_deadline():
+                    return _finish_reply(budget_tracker, character_name,
+                                         "".join(collected_chunks), usage_tokens, trace)
+                raise HTTPException(status_code=504, detail=f"LLM streaming timeout: {err}") from err
+            raise HTTPException(status_code=500, detail=f"LLM streaming error: {err}") from err
         finally:
             if response is not None:
                 response.close()
@@ -243,9 +392,11 @@ def generate_guru_response(user_query, mode, character_profile,
                     pass
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-        data = response.json()
+        with trace.span("upstream.request", character=character_name) as attrs:
+            response = requests.post(url, headers=headers, json=payload, timeout=timeout)
+            attrs["status"] = response.status_code
+            response.raise_for_status()
+            data = response.json()
 
         if 'choices' not in data:
             raise HTTPException(
@@ -253,7 +404,11 @@ def generate_guru_response(user_query, mode, character_profile,
                 detail=f"LLM API error: {json.dumps(data, ensure_ascii=False)}"
             )
 
-        return data['choices'][0]['message']['content']
+        content = budget_tracker.truncate(data['choices'][0]['message']['content'] or "")
+        usage_tokens = (data.get("usage") or {}).get("completion_tokens")
+        return _finish_reply(budget_tracker, character_name, content, usage_tokens, trace)
+    except HTTPException:
+        raise
     except requests.HTTPError as err:
         status_code = err.response.status_code if err.response is not None else 502
         raise HTTPException(
@@ -0,0 +1,210 @@
+"""Compile character profiles into compact, mode-specific persona blocks.
+
+The raw profile JSON carries every field for both modes (cold phrases in hot
+mode and vice versa), JSON punctuation and escaped keys. The compiler keeps
+only what the mode uses, as short labelled lines:
+
+    hot:  identity, tone, risk, favourite / hated topics, hot phrases
+    cold: the above (cold phrases instead) plus horizon, process, metrics
+
+Unknown profile keys are kept (as ``key: value``) so custom personas lose
+nothing. Results are cached per (character, mode, persona version), where the
+version is a digest of the profile, so an edited persona recompiles on its own.
+
+    cd backend && python -m app.utils.persona_compiler   # token report for app/data
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # optional dependency
+    tiktoken = None
+
+
+logger = logging.getLogger(__name__)
+
+# PERSONA_COMPILER=0 sends the raw profile JSON again (for A/B comparisons)
+PERSONA_COMPILER_ENABLED = os.getenv("PERSONA_COMPILER", "1") == "1"
+
+# (label, profile key) in prompt order, per mode
+_COMMON_FIELDS = [
+    ("Tone", "tone"),
+    ("Risk", "risk_profile"),
+    ("Loves", "preferred_assets"),
+    ("Scorns", "forbidden_topics"),
+]
+MODE_FIELDS: Dict[str, List[Tuple[str, str]]] = {
+    "hot": _COMMON_FIELDS + [
+        ("Signature phrases", "signature_phrases_hot"),
+    ],
+    "cold": _COMMON_FIELDS + [
+        ("Horizon", "time_horizon"),
+        ("Process", "decision_process"),
+        ("Metrics", "favorite_metrics"),
+        ("Signature phrases", "signature_phrases_cold"),
+    ],
+}
+# Shown in the identity line
+_IDENTITY_KEYS = {"id", "name", "description", "occupation", "age", "wealth"}
+# Known fields are only shown in the modes that list them; anything else is kept everywhere
+_KNOWN_KEYS = _IDENTITY_KEYS | {key for fields in MODE_FIELDS.values() for _, key in fields}
+# Phrase lists go one per line; other lists are joined inline
+_LINE_LIST_KEYS = {"signature_phrases_hot", "signature_phrases_cold"}
+
+
+def persona_version(profile: Dict) -> str:
+    canonical = json.dumps(profile, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _inline(value) -> str:
+    if isinstance(value, list):
+        return "; ".join(_inline(item) for item in value)
+    if isinstance(value, dict):
+        return "; ".join(f"{key}: {_inline(item)}" for key, item in value.items())
+    return " ".join(str(value).split())
+
+
+def _compile(profile: Dict, mode: str) -> str:
+    fields = MODE_FIELDS.get(mode, MODE_FIELDS["cold"])
+
+    identity = [str(profile.get("name", "Unknown"))]
+    details = [_inline(profile[key]) for key in ("occupation", "age", "wealth") if profile.get(key)]
+    if details:
+        identity.append(f"({', '.join(details)})")
+    lines = [" ".join(identity)]
+    if profile.get("description"):
+        lines.append(_inline(profile["description"]))
+
+    phrase_block: Optional[Tuple[str, str]] = None
+    for label, key in fields:
+        value = profile.get(key)
+        if not value:
+            continue
+        if key in _LINE_LIST_KEYS:
+            phrase_block = (label, key)
+            continue
+        lines.append(f"{label}: {_inline(value)}")
+
+    for key, value in profile.items():
+        if key not in _KNOWN_KEYS and value:
+            lines.append(f"{key}: {_inline(value)}")
+
+    if phrase_block:
+        label, key = phrase_block
+        phrases = profile[key] if isinstance(profile[key], list) else [profile[key]]
+        lines.append(f"{label}:")
+        lines.extend(f"- {_inline(phrase)}" for phrase in phrases)
+    return "\n".join(lines)
+
+
+def raw_persona(profile: Dict) -> str:
+    """What the engine sent before the compiler: the whole profile as JSON."""
+    return json.dumps(profile, ensure_ascii=False)
+
+
+_cache_lock = threading.Lock()
+_cache: Dict[Tuple[str, str, str], str] = {}
+_stats: Dict[Tuple[str, str], Dict[str, object]] = {}
+
+
+def compile_persona(profile: Dict, mode: str) -> str:
+    """Persona block for the system prompt (raw JSON when PERSONA_COMPILER=0)."""
+    if not PERSONA_COMPILER_ENABLED:
+        return raw_persona(profile)
+
+    character = str(profile.get("id") or profile.get("name"))
+    key = (character, mode, persona_version(profile))
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    compiled = _compile(profile, mode)
+    raw_tokens, compiled_tokens = count_tokens(raw_persona(profile)), count_tokens(compiled)
+    with _cache_lock:
+        # Drop blocks compiled from older versions of this persona
+        for stale in [k for k in _cache if k[:2] == key[:2]]:
+            del _cache[stale]
+        _cache[key] = compiled
+        _stats[key[:2]] = {
+            "name": profile.get("name"),
+            "version": key[2],
+            "raw_tokens": raw_tokens,
+            "compiled_tokens": compiled_tokens,
+        }
+    logger.info(f"   🧩 [Persona] {profile.get('name')} ({mode.upper()}): "
+                f"{raw_tokens} -> {compiled_tokens} tokens")
+    return compiled
+
+
+def get_persona_stats() -> Dict[str, object]:
+    """Raw vs compiled prompt tokens for every persona compiled in this process."""
+    with _cache_lock:
+        entries = [{"character_id": character, "mode": mode, **stats}
+                   for (character, mode), stats in sorted(_stats.items())]
+    raw = sum(entry["raw_tokens"] for entry in entries)
+    compiled = sum(entry["compiled_tokens"] for entry in entries)
+    return {
+        "enabled": PERSONA_COMPILER_ENABLED,
+        "tokenizer": TOKENIZER,
+        "raw_tokens": raw,
+        "compiled_tokens": compiled,
+        "saved_ratio": round(1 - compiled / raw, 3) if raw else None,
+        "personas": entries,
+    }
+
+
+# ==========================================
+# Token counting
+# ==========================================
+
+_ASCII_WORD_RE = re.compile(r"[A-Za-z0-9]+|[^\sA-Za-z0-9]")
+
+if tiktoken is not None:
+    _encoding = tiktoken.get_encoding("cl100k_base")
+    TOKENIZER = "tiktoken:cl100k_base"
+
+    def count_tokens(text: str) -> int:
+        return len(_encoding.encode(text))
+else:
+    TOKENIZER = "estimate"
+
+    def count_tokens(text: str) -> int:
+        """
+        Rough BPE estimate without a tokenizer: one token per non-ASCII
+        character (Hangul syllables mostly encode to 1-2 tokens), one per
+        punctuation mark, and one per ~4 letters of ASCII words.
+        """
+        tokens = 0
+        for piece in _ASCII_WORD_RE.findall(text):
+            if piece.isascii() and piece.isalnum():
+                tokens += (len(piece) + 3) // 4
+            else:
+                tokens += 1
+        return tokens
+
+
+def main():
+    from pathlib import Path
+
+    data_dir = Path(__file__).resolve().parent.parent / "data"
+    for path in sorted(data_dir.glob("*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            char_data = json.load(f)
+        profile = dict(char_data["persona"])
+        profile.setdefault("name", char_data["name"])
+        profile.setdefault("description", char_data["description"])
+        profile.setdefault("id", char_data.get("id", path.stem))
+        for mode in ("hot", "cold"):
+            compile_persona(profile, mode)
+    print(json.dumps(get_persona_stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Relevance router: decide which gurus in a session answer a turn.
+
+A cheap local scorer matches the question against each persona's
+'preferred_assets', 'forbidden_topics' and 'decision_process' using word
+tokens plus Hangul bigrams, so Korean and English questions both work
+without calling the LLM.
+"""
+import json
+import logging
+import math
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Field weights: a guru's favourite assets are the strongest signal, but a
+# forbidden topic is still "their business" (they will happily scold about it).
+FIELD_WEIGHTS = {
+    "preferred_assets": 1.0,
+    "forbidden_topics": 0.6,
+    "decision_process": 0.4,
+}
+
+# Minimum score a guru needs to be picked ahead of the top-k fallback
+RESPONDER_MIN_SCORE = float(os.getenv("RESPONDER_MIN_SCORE", "0.05"))
+
+# Korean terms that personas mostly spell in English (and vice versa).
+# A term matches the start of a Hangul word (see _term_in_word), never its middle.
+TERM_ALIASES = {
+    "비트코인": ["bitcoin", "btc", "crypto"],
+    "코인": ["crypto", "암호화폐"],
+    "가상화폐": ["crypto", "암호화폐"],
+    "암호화폐": ["crypto", "bitcoin"],
+    "도지": ["dogecoin"],
+    "도지코인": ["dogecoin"],
+    "테슬라": ["tesla", "tsla"],
+    "엔비디아": ["nvidia"],
+    "코스트코": ["costco"],
+    "금리": ["채권", "국채", "treasuries"],
+    "채권": ["treasuries", "국채"],
+    "인플레이션": ["inflation", "cpi"],
+    "배당": ["배당주"],
+    "레버리지": ["leverage"],
+    "공매도": ["short", "풋"],
+    "차트": ["기술적", "분석"],
+    "밈": ["meme"],
+    "블록체인": ["blockchain", "layer"],
+    "인공지능": ["ai", "로보틱스"],
+    "금": ["gold"],
+    "금값": ["gold"],
+}
+
+# Particles that may follow a term inside one word (금은, 금에, 테슬라를, 비트코인으로)
+_PARTICLES = {"은", "는", "이", "가", "을", "를", "에", "에서", "의", "도", "과", "와", "로", "으로", "만", "이랑", "랑"}
+
+_WORD_RE = re.compile(r"[a-z0-9]{2,}")
+_HANGUL_RE = re.compile(r"[가-힣]+")
+
+
+def _features(text: str) -> Set[str]:
+    """Lower-cased ASCII words plus Hangul bigrams (single syllables kept as-is)."""
+    text = text.lower()
+    features = set(_WORD_RE.findall(text))
+    for run in _HANGUL_RE.findall(text):
+        if len(run) == 1:
+            features.add(run)
+        features.update(run[i:i + 2] for i in range(len(run) - 1))
+    return features
+
+
+def _term_in_word(term: str, word: str) -> bool:
+    """
+    True if `word` starts with `term` and is the term itself, the term plus a
+    particle, or (for terms of two syllables or more) a compound such as
+    테슬라주식. One-syllable terms would otherwise match 금융, 금요일 and so on.
+    """
+    if not word.startswith(term):
+        return False
+    rest = word[len(term):]
+    return not rest or rest in _PARTICLES or len(term) > 1
+
+
+def _query_features(question: str) -> Set[str]:
+    features = _features(question)
+    words = _HANGUL_RE.findall(question.lower())
+    for term, aliases in TERM_ALIASES.items():
+        if any(_term_in_word(term, word) for word in words):
+            for alias in aliases:
+                features |= _features(alias)
+    return features
+
+
+def _persona_dict(character) -> Dict:
+    persona = character.persona_data or {}
+    if isinstance(persona, dict):
+        return persona
+    try:
+        return json.loads(persona)
+    except (TypeError, json.JSONDecodeError):
+        return {}
+
+
+def _field_features(persona: Dict, field: str) -> Set[str]:
+    values = persona.get(field) or []
+    if isinstance(values, str):
+        values = [values]
+    features = set()
+    for value in values:
+        features |= _features(str(value))
+    return features
+
+
+def score_characters(question: str, characters: Sequence) -> List[Tuple[object, float]]:
+    """
+    Score every character against the question.
+    Features shared by many gurus in the session count less (IDF weighting).
+    """
+    query = _query_features(question)
+    if not query or not characters:
+        return [(character, 0.0) for character in characters]
+
+    per_character = []
+    doc_freq: Dict[str, int] = {}
+    for character in characters:
+        persona = _persona_dict(character)
+        fields = {field: _field_features(persona, field) & query for field in FIELD_WEIGHTS}
+        per_character.append(fields)
+        for feature in set().union(*fields.values()):
+            doc_freq[feature] = doc_freq.get(feature, 0) + 1
+
+    total = len(characters)
+    scored = []
+    for character, fields in zip(characters, per_character):
+        score = 0.0
+        for field, matched in fields.items():
+            idf_sum = sum(math.log(1 + total / doc_freq[feature]) for feature in matched)
+            score += FIELD_WEIGHTS[field] * idf_sum
+        scored.append((character, round(score / len(query), 4)))
+    return scored
+
+
+def select_responders(question: str, characters: Sequence, k: Optional[int],
+                      min_score: float = RESPONDER_MIN_SCORE) -> Tuple[List, List[Tuple[object, float]]]:
+    """
+    Pick the gurus that should answer, most relevant first.
+
+    Characters scoring at least `min_score` are chosen (at most k of them). If none
+    qualifies, the top k are used anyway so the turn always gets an answer.
+    `k=None` disables routing and keeps every character in session order.
+    """
+    characters = list(characters)
+    if not k:
+        return characters, []
+    scored = score_characters(question, characters)
+    if k >= len(characters):
+        return characters, scored
+
+    ranked = sorted(scored, key=lambda item: item[1], reverse=True)
+    selected = [character for character, score in ranked if score >= min_score][:k]
+    if not selected:
+        selected = [character for character, _ in ranked[:k]]
+    return selected, scored
+
+
+def log_selection(session_id: str, question: str, scored: Iterable[Tuple[object, float]],
+                  selected: Iterable):
+    """Log one JSON line per routing decision so selections can be evaluated offline."""
+    selected_ids = [character.id for character in selected]
+    record = {
+        "session_id": session_id,
+        "question": question,
+        "scores": {character.name: score for character, score in scored},
+        "selected": selected_ids,
+    }
+    logger.info(f"   🎯 [Router] {json.dumps(record, ensure_ascii=False)}")
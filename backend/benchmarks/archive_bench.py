@@ -0,0 +1,82 @@
+"""
+Benchmark cold-storage archival: table size and message-history latency
+before and after archiving inactive sessions.
+
+    cd backend && python -m benchmarks.archive_bench [--users 200] [--sessions 5] [--messages 40]
+"""
+import argparse
+import json
+import random
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import text
+
+from app import archive, crud
+from benchmarks.common import make_engine, load_characters, seed_sessions, table_sizes, timed, summarize
+
+
+TABLES = ["messages", "session_archives", "sessions"]
+
+
+def _sample_latency(SessionLocal, session_ids, samples):
+    latencies = []
+    for session_id in samples:
+        db = SessionLocal()
+        try:
+            elapsed, _ = timed(crud.get_session_messages, db, session_id)
+            latencies.append(elapsed)
+        finally:
+            db.close()
+    return summarize(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=5, help="Sessions per user.")
+    parser.add_argument("--messages", type=int, default=40, help="Messages per session.")
+    parser.add_argument("--idle-days", type=int, default=120, help="Spread of session inactivity.")
+    parser.add_argument("--archive-after", type=int, default=30, help="Archive sessions idle this many days.")
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    db_path = str(Path(tempfile.gettempdir()) / "guruchat_archive_bench.db")
+    engine, SessionLocal = make_engine(db_path)
+    db = SessionLocal()
+    character_ids = load_characters(db)
+    session_ids = seed_sessions(db, character_ids, args.users, args.sessions, args.messages,
+                                idle_days=args.idle_days)
+    inactive = set(archive.find_inactive_sessions(db, args.archive_after))
+    db.close()
+
+    rng = random.Random(1)
+    hot_ids = [s for s in session_ids if s not in inactive]
+    hot_samples = [rng.choice(hot_ids) for _ in range(args.samples)] if hot_ids else []
+
+    report = {"config": vars(args), "archive_codec": archive.DEFAULT_CODEC}
+    report["before"] = {
+        "bytes": table_sizes(engine, TABLES),
+        "hot_history": _sample_latency(SessionLocal, session_ids, hot_samples),
+    }
+
+    db = SessionLocal()
+    elapsed, summary = timed(archive.archive_inactive_sessions, db, args.archive_after, batch_size=200)
+    db.close()
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+    summary["elapsed_ms"] = round(elapsed, 1)
+    report["archive_job"] = summary
+
+    cold_samples = rng.sample(sorted(inactive), k=min(len(inactive), 50))
+    report["after"] = {
+        "bytes": table_sizes(engine, TABLES),
+        "hot_history": _sample_latency(SessionLocal, session_ids, hot_samples),
+        "rehydrate_first_access": _sample_latency(SessionLocal, session_ids, cold_samples),
+        "rehydrated_second_access": _sample_latency(SessionLocal, session_ids, cold_samples),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
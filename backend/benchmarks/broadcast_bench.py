@@ -0,0 +1,211 @@
+"""
+Cost of watching a session: N SSE watchers on one session while chat turns run.
+
+Starts `benchmarks.fake_upstream` in a subprocess and reports:
+- server memory per idle watcher (RSS before / after opening the watch streams)
+- server CPU per watcher: CPU time of one turn with N watchers minus the same
+  turn with none, divided by N (and per delivered frame)
+- fan-out lag: when each watcher received the turn's `done` event, relative
+  to the first watcher that did
+- whether the posting client's turn got slower
+- slow consumers (separate server, long replies): how many turns it takes
+  until watchers that never read are dropped, and that a healthy watcher on
+  the same session still gets every delta
+
+    cd backend && python -m benchmarks.broadcast_bench [--watchers 1000] [--stalled 10] [--tokens 100]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+
+from benchmarks.common import summarize
+from benchmarks.transport_bench import ADMIN_TOKEN, HOST, Server, _http, _rss_kb
+
+
+def _cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime and stime are fields 14 and 15 of /proc/<pid>/stat
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class Watcher:
+    def __init__(self):
+        self.deltas = 0
+        self.done_at = None
+        self.dropped = False
+        self.turns_done = 0
+
+    async def open(self, port: int, session_id: str, user_id: str, stalled: bool = False):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if stalled:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, (HOST, port))
+        self.reader, self.writer = await asyncio.open_connection(sock=sock)
+        self.writer.write(
+            f"GET /api/sessions/chat/{session_id}/watch?user_id={user_id} HTTP/1.1\r\nHost: {HOST}\r\n\r\n".encode()
+        )
+        await self.writer.drain()
+        if not stalled:
+            # Headers and the ": watching" comment: subscribed from here on
+            while b"watching" not in await self.reader.readline():
+                pass
+
+    async def follow(self, turns: int):
+        while self.turns_done < turns:
+            line = await self.reader.readline()
+            if not line:
+                return
+            if line.startswith(b"event: delta"):
+                self.deltas += 1
+            elif line.startswith(b"event: dropped"):
+                self.dropped = True
+                return
+            elif line.startswith(b"event: done"):
+                self.turns_done += 1
+                self.done_at = time.perf_counter()
+
+    def close(self):
+        self.writer.close()
+
+
+async def _turn(server: Server, session_id: str, user_id: str) -> float:
+    body = json.dumps({"content": "bench", "style": "spicy"}).encode()
+    headers = {"X-User-ID": user_id, "Content-Type": "application/json"}
+    start = time.perf_counter()
+    await _http(server.port, "POST", f"/api/sessions/chat/{session_id}/chat", headers, body)
+    return time.perf_counter() - start
+
+
+async def _hub_stats(server: Server) -> dict:
+    response = await _http(server.port, "GET", "/api/admin/stats/broadcast", {"X-Admin-Token": ADMIN_TOKEN})
+    return json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+async def run(args):
+    env = {"FAKE_LLM_TOKENS": str(args.tokens), "FAKE_LLM_DELAY": str(args.token_delay)}
+    report = {"config": vars(args)}
+    with Server(args.port, **env) as server:
+        user_id = str(uuid.uuid4())
+        session_id = server.new_session(user_id, characters=2)
+        pid = server.proc.pid
+
+        await _turn(server, session_id, user_id)  # warm up
+        cpu = _cpu_seconds(pid)
+        baseline_turn = await _turn(server, session_id, user_id)
+        baseline_cpu = _cpu_seconds(pid) - cpu
+
+        await asyncio.sleep(0.5)
+        rss_before = _rss_kb(pid)
+        watchers = []
+        for _ in range(args.watchers):
+            watcher = Watcher()
+            await watcher.open(server.port, session_id, user_id)
+            watchers.append(watcher)
+        await asyncio.sleep(1.0)
+        rss_after = _rss_kb(pid)
+
+        followers = [asyncio.create_task(w.follow(args.turns)) for w in watchers]
+        cpu = _cpu_seconds(pid)
+        turn_seconds = []
+        for _ in range(args.turns):
+            turn_seconds.append(await _turn(server, session_id, user_id))
+        await asyncio.wait_for(asyncio.gather(*followers), timeout=120)
+        watched_cpu = (_cpu_seconds(pid) - cpu) / args.turns
+
+        stats = await _hub_stats(server)
+
+        done_at = [w.done_at for w in watchers if w.done_at]
+        first = min(done_at)
+        deltas_per_turn = 2 * args.tokens
+        extra_cpu = watched_cpu - baseline_cpu
+        report.update({
+            "memory": {
+                "rss_kb_before": rss_before,
+                "rss_kb_after": rss_after,
+                "kb_per_watcher": round((rss_after - rss_before) / args.watchers, 2),
+            },
+            "cpu": {
+                "turn_cpu_ms_without_watchers": round(baseline_cpu * 1000, 1),
+                "turn_cpu_ms_with_watchers": round(watched_cpu * 1000, 1),
+                "cpu_us_per_watcher_per_turn": round(extra_cpu / args.watchers * 1e6, 1),
+                "cpu_us_per_delivered_frame": round(extra_cpu / (args.watchers * (deltas_per_turn + 4)) * 1e6, 2),
+            },
+            "turn_seconds": {
+                "without_watchers": round(baseline_turn, 3),
+                "with_watchers": summarize([s * 1000 for s in turn_seconds]),
+            },
+            "fan_out": {
+                "watchers_with_every_delta": sum(w.deltas == deltas_per_turn * args.turns for w in watchers),
+                "done_lag_ms": summarize([(t - first) * 1000 for t in done_at]),
+            },
+            "hub": stats,
+        })
+        for watcher in watchers:
+            watcher.close()
+
+    report["stalled"] = await stall_phase(args)
+    print(json.dumps(report, indent=2))
+
+
+async def stall_phase(args):
+    """
+    Watchers that never read: the kernel send buffer (up to tcp_wmem max, 4 MiB
+    by default) fills first, then uvicorn pauses the stream, then the hub's
+    per-watcher buffer fills and the watcher is dropped. Long, fast replies get
+    there in a few turns.
+    """
+    env = {"FAKE_LLM_TOKENS": str(args.stall_tokens), "FAKE_LLM_DELAY": "0"}
+    with Server(args.port + 1, **env) as server:
+        user_id = str(uuid.uuid4())
+        session_id = server.new_session(user_id, characters=2)
+        healthy = Watcher()
+        await healthy.open(server.port, session_id, user_id)
+        stalled = []
+        for _ in range(args.stalled):
+            watcher = Watcher()
+            await watcher.open(server.port, session_id, user_id, stalled=True)
+            stalled.append(watcher)
+
+        follower = asyncio.create_task(healthy.follow(args.max_stall_turns))
+        turns, turn_seconds = 0, []
+        while turns < args.max_stall_turns:
+            if (await _hub_stats(server))["dropped"] >= args.stalled:
+                break
+            turn_seconds.append(await _turn(server, session_id, user_id))
+            turns += 1
+        await asyncio.sleep(0.5)
+        follower.cancel()
+        stats = await _hub_stats(server)
+        for watcher in stalled + [healthy]:
+            watcher.close()
+    return {
+        "watchers": args.stalled,
+        "dropped": stats["dropped"],
+        "turns_until_dropped": turns,
+        "healthy_watcher_turns_seen": healthy.turns_done,
+        "turn_ms": summarize([s * 1000 for s in turn_seconds]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8775)
+    parser.add_argument("--watchers", type=int, default=1000)
+    parser.add_argument("--stalled", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--max-stall-turns", type=int, default=300,
+                        help="turns to run while waiting for the stalled watchers to be dropped")
+    parser.add_argument("--stall-tokens", type=int, default=2000, help="deltas per guru reply in the stall phase (capped by the generation budget)")
+    parser.add_argument("--tokens", type=int, default=100, help="deltas per guru reply (2 gurus)")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="seconds between fake tokens")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
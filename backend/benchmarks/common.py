@@ -0,0 +1,155 @@
+"""Shared helpers for the benchmark scripts (run from the backend directory)."""
+import json
+import os
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from app import migrations, models
+
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "app" / "data"
+
+SAMPLE_SENTENCES = [
+    "시장은 당신의 지불 능력보다 더 오랫동안 비이성적일 수 있습니다.",
+    "모든 거품은 터지기 마련입니다. 이번에도 예외는 없습니다.",
+    "비트코인 지금 사도 될까요? 너무 늦은 건 아닌지 걱정입니다.",
+    "Price is what you pay, value is what you get.",
+    "금리가 오르면 채권 가격은 떨어지고, 성장주의 밸류에이션도 압박을 받습니다.",
+    "재무제표의 주석까지 읽어보지 않았다면 투자한 것이 아니라 도박한 겁니다.",
+    "혁신은 기하급수적으로 성장합니다. 5년 뒤를 보세요.",
+]
+
+
+def make_engine(path: str, pragmas: dict = None):
+    """Fresh SQLite database at `path` with the app schema created."""
+    if os.path.exists(path):
+        os.remove(path)
+    return open_engine(path, pragmas)
+
+
+def open_engine(path: str, pragmas: dict = None):
+    """Engine on an existing (or new) SQLite file; `pragmas` run on every connection."""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    # Same as app.database: foreign keys on so ON DELETE CASCADE applies
+    pragmas = {"foreign_keys": "ON", **(pragmas or {})}
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        for key, value in pragmas.items():
+            cursor.execute(f"PRAGMA {key}={value}")
+        cursor.close()
+
+    models.Base.metadata.create_all(bind=engine)
+    # Datasets generated by an older version get the current columns and indexes, as on app startup
+    migrations.upgrade_schema(engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def load_characters(db):
+    """Insert the real character catalog from app/data and return the IDs."""
+    ids = []
+    for file_path in sorted(DATA_DIR.glob("*.json")):
+        with open(file_path, "r", encoding="utf-8") as f:
+            char_data = json.load(f)
+        char_id = char_data.get("id", file_path.stem)
+        db.add(models.Character(
+            id=char_id,
+            name=char_data["name"],
+            description=char_data["description"],
+            persona_data=char_data["persona"],
+        ))
+        ids.append(char_id)
+    db.commit()
+    return ids
+
+
+def fake_reply(rng: random.Random, sentences: int) -> str:
+    return " ".join(rng.choice(SAMPLE_SENTENCES) for _ in range(sentences))
+
+
+def seed_sessions(db, character_ids, users: int, sessions_per_user: int, messages_per_session: int,
+                  idle_days: int = 0, seed: int = 7, batch_size: int = 5000):
+    """
+    Bulk-insert users/sessions/messages with core inserts.
+    Session activity is spread over the last `idle_days` days (0 = all active now).
+    Returns the list of created session IDs.
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    session_ids = []
+    message_batch = []
+
+    db.execute(insert(models.User), [{"id": str(uuid.uuid4()), "created_at": now} for _ in range(users)])
+    user_ids = [row[0] for row in db.execute(text("SELECT id FROM users"))]
+
+    for user_id in user_ids:
+        session_rows, link_rows = [], []
+        for _ in range(sessions_per_user):
+            session_id = str(uuid.uuid4())
+            last_activity = now - timedelta(days=rng.uniform(0, idle_days)) if idle_days else now
+            session_rows.append({
+                "id": session_id, "user_id": user_id, "title": "Benchmark chat",
+                "created_at": last_activity - timedelta(hours=1), "last_activity_at": last_activity,
+            })
+            chars = rng.sample(character_ids, k=min(len(character_ids), rng.randint(1, 3)))
+            link_rows.extend({"session_id": session_id, "character_id": c} for c in chars)
+            for i in range(messages_per_session):
+                is_user = i % (len(chars) + 1) == 0
+                message_batch.append({
+                    "session_id": session_id,
+                    "role": "user" if is_user else "assistant",
+                    "content": fake_reply(rng, 1 if is_user else rng.randint(3, 8)),
+                    "created_at": last_activity - timedelta(seconds=messages_per_session - i),
+                    "character_id": None if is_user else rng.choice(chars),
+                })
+            session_ids.append(session_id)
+        db.execute(insert(models.Session), session_rows)
+        db.execute(insert(models.session_characters), link_rows)
+        if len(message_batch) >= batch_size:
+            db.execute(insert(models.Message), message_batch)
+            message_batch = []
+    if message_batch:
+        db.execute(insert(models.Message), message_batch)
+    db.commit()
+    return session_ids
+
+
+def table_sizes(engine, tables):
+    """Bytes used by each table including its indexes (needs SQLite's dbstat)."""
+    sizes = {}
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT m.tbl_name, SUM(s.pgsize) FROM dbstat s "
+            "JOIN sqlite_master m ON m.name = s.name GROUP BY m.tbl_name"
+        )).all()
+    by_table = dict(rows)
+    for table in tables:
+        sizes[table] = by_table.get(table, 0)
+    return sizes
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def summarize(samples_ms):
+    """p50/p95/mean of a list of millisecond samples."""
+    if not samples_ms:
+        return {}
+    ordered = sorted(samples_ms)
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+    }
@@ -0,0 +1,147 @@
+"""
+Polling cost of the read endpoints: full 200 responses (identity / gzip /
+brotli) vs 304 Not Modified via If-None-Match.
+
+Runs on a copy of a synthetic dataset (benchmarks.datagen). Every request
+goes through the full ASGI stack (TestClient), so latency includes routing,
+the version-stamp query, the list/history query, serialization and
+compression. Body bytes are what goes over the wire (Content-Length after
+compression; 0 for a 304).
+
+    GET /api/characters/
+    GET /api/sessions/                      typical users / heaviest users
+    GET /api/sessions/chat/{id}/messages    typical sessions / longest sessions
+
+    cd backend && python -m benchmarks.conditional_get_bench [--scale s] [--iterations 100]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+DATA_DIR = Path(os.getenv("BENCH_DATA_DIR", Path(tempfile.gettempdir()) / "guruchat_bench"))
+DATA_DIR.mkdir(parents=True, exist_ok=True)
+# app.main creates and seeds the app database on import; keep it out of the working tree
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DATA_DIR / 'app_scratch.db'}")
+
+from fastapi.testclient import TestClient
+
+from app import database, session_cache
+from app.compression import available_encodings
+from app.main import app
+from benchmarks import datagen
+from benchmarks.common import open_engine, summarize
+
+
+def _wire_bytes(response) -> int:
+    if response.status_code == 304:
+        return 0
+    return int(response.headers.get("content-length", len(response.content)))
+
+
+def measure(client, requests, encoding, conditional):
+    """requests: [(url, headers)]; returns latency summary and mean body bytes."""
+    tags = []
+    if conditional:
+        tags = [client.get(url, headers=headers).headers["etag"] for url, headers in requests]
+
+    samples, sizes, statuses = [], [], set()
+    for index, (url, headers) in enumerate(requests):
+        headers = {**headers, "Accept-Encoding": encoding}
+        if conditional:
+            headers["If-None-Match"] = tags[index]
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+        sizes.append(_wire_bytes(response))
+        statuses.add(response.status_code)
+    return {
+        **summarize(samples),
+        "status": sorted(statuses),
+        "mean_body_bytes": round(sum(sizes) / len(sizes)),
+    }
+
+
+def run(args):
+    base_path = DATA_DIR / f"crud_{args.scale}.db"
+    meta = datagen.ensure_dataset(str(base_path), datagen.SCALES[args.scale])
+    work_path = DATA_DIR / f"conditional_get_{args.scale}.db"
+    shutil.copyfile(base_path, work_path)
+
+    rng = random.Random(args.seed)
+    with sqlite3.connect(work_path) as conn:
+        users = [row[0] for row in conn.execute("SELECT id FROM users")]
+        sessions = conn.execute("SELECT id, user_id FROM sessions").fetchall()
+        owners = dict(conn.execute(
+            f"SELECT id, user_id FROM sessions WHERE id IN ({','.join('?' * len(meta['long_sessions']))})",
+            meta["long_sessions"]
+        ))
+    users = rng.sample(users, min(args.iterations, len(users)))
+    sessions = rng.sample(sessions, min(args.iterations, len(sessions)))
+
+    engine, SessionLocal = open_engine(str(work_path), {"journal_mode": "WAL", "synchronous": "NORMAL"})
+    session_cache.session_meta_cache.clear()
+    session_cache.character_cache.clear()
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[database.get_db] = get_db
+    client = TestClient(app)
+
+    def session_list(user_ids):
+        return [("/api/sessions/", {"X-User-ID": u}) for u in user_ids]
+
+    def history(pairs):
+        return [(f"/api/sessions/chat/{s}/messages", {"X-User-ID": u}) for s, u in pairs]
+
+    endpoints = {
+        "GET /api/characters/": [("/api/characters/", {})] * args.iterations,
+        "GET /api/sessions/": session_list(users),
+        "GET /api/sessions/[heavy]": session_list(meta["heavy_users"]),
+        "GET /messages": history(sessions),
+        "GET /messages[long]": history([(s, owners[s]) for s in meta["long_sessions"]]),
+    }
+    variants = [("identity", False)] + [(encoding, False) for encoding in available_encodings()]
+    variants.append(("gzip", True))
+
+    results = {}
+    for name, requests in endpoints.items():
+        measure(client, requests[:3], "identity", False)  # warm up
+        rows = {}
+        for encoding, conditional in variants:
+            label = "304" if conditional else f"200 {encoding}"
+            rows[label] = measure(client, requests, encoding, conditional)
+        full = rows["200 identity"]
+        for row in rows.values():
+            row["bytes_vs_identity"] = round(row["mean_body_bytes"] / full["mean_body_bytes"], 3)
+            row["p50_vs_identity"] = round(row["p50_ms"] / full["p50_ms"], 3)
+        results[name] = rows
+
+    app.dependency_overrides.pop(database.get_db, None)
+    engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{work_path}{suffix}").unlink(missing_ok=True)
+    return {"scale": args.scale, "rows": meta["rows"], "encodings": available_encodings(), "endpoints": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(datagen.SCALES), default="s")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
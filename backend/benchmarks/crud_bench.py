@@ -0,0 +1,275 @@
+"""
+CRUD / endpoint latency at different data sizes and SQLite pragma profiles.
+
+For every scale a synthetic dataset is generated once (benchmarks.datagen,
+reused on later runs) and copied per pragma profile, so writes made by one
+profile do not leak into the next. Each call gets a fresh DB session, like a
+request. Timed operations:
+
+    crud.get_user_sessions        typical user / heaviest users
+    crud.get_session_messages     typical session / longest sessions
+    crud.create_message
+    crud.delete_session
+    GET /api/sessions/            typical user
+    GET /api/sessions/chat/{id}/messages   typical session
+
+Besides latency the report records SQL statements per call and, once per
+scale, SQLite's EXPLAIN QUERY PLAN for every statement an operation issues,
+so index and query changes show up in a diff of two reports.
+
+    cd backend && python -m benchmarks.crud_bench [--scales s,m] [--profiles default,wal,wal_mmap]
+        [--iterations 200] [--out report.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+DATA_DIR = Path(os.getenv("BENCH_DATA_DIR", Path(tempfile.gettempdir()) / "guruchat_bench"))
+DATA_DIR.mkdir(parents=True, exist_ok=True)
+# app.main creates and seeds the app database on import; keep it out of the working tree
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DATA_DIR / 'app_scratch.db'}")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app import crud, database, session_cache
+from app.main import app
+from benchmarks import datagen
+from benchmarks.common import open_engine, summarize
+
+
+PROFILES = {
+    # SQLite defaults: rollback journal, fsync on every commit
+    "default": {"journal_mode": "DELETE", "synchronous": "FULL"},
+    "wal": {"journal_mode": "WAL", "synchronous": "NORMAL"},
+    "wal_mmap": {"journal_mode": "WAL", "synchronous": "NORMAL", "mmap_size": 268435456,
+                 "cache_size": -65536, "temp_store": "MEMORY"},
+}
+
+MIN_SAMPLES = 5
+
+
+class StatementRecorder:
+    """Counts statements per operation and keeps the first parameters of each for EXPLAIN."""
+
+    def __init__(self, engine):
+        self.count = 0
+        self.statements = {}
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        if not executemany:
+            self.statements.setdefault(statement, parameters)
+
+    def reset(self):
+        self.count = 0
+        self.statements = {}
+
+
+def _explain(path, statements):
+    conn = sqlite3.connect(path)
+    try:
+        plans = []
+        for statement, parameters in statements.items():
+            try:
+                rows = conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            except sqlite3.Error as e:
+                rows = [(None, None, None, f"explain failed: {e}")]
+            plans.append({"sql": " ".join(statement.split())[:300], "plan": [row[3] for row in rows]})
+        return plans
+    finally:
+        conn.close()
+
+
+def _pick(rng, conn, sql, n):
+    rows = [row[0] for row in conn.execute(sql)]
+    return rng.sample(rows, min(n, len(rows)))
+
+
+def run_profile(scale, profile, base_path, meta, iterations, seed, with_plans, max_op_seconds):
+    work_path = DATA_DIR / f"crud_{scale}_{profile}.db"
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(f"{work_path}{suffix}"):
+            os.remove(f"{work_path}{suffix}")
+    shutil.copyfile(base_path, work_path)
+
+    engine, SessionLocal = open_engine(str(work_path), PROFILES[profile])
+    recorder = StatementRecorder(engine)
+    rng = random.Random(seed)
+    with sqlite3.connect(work_path) as conn:
+        users = _pick(rng, conn, "SELECT id FROM users", iterations)
+        sessions = _pick(rng, conn, "SELECT id || ' ' || user_id FROM sessions", iterations * 3)
+    sessions = [tuple(row.split(" ")) for row in sessions]
+    read_sessions, write_sessions, delete_sessions = (
+        sessions[:iterations], sessions[iterations:2 * iterations], sessions[2 * iterations:]
+    )
+    with sqlite3.connect(work_path) as conn:
+        long_sessions = [(s, conn.execute("SELECT user_id FROM sessions WHERE id = ?", (s,)).fetchone()[0])
+                         for s in meta["long_sessions"]]
+
+    session_cache.session_meta_cache.clear()
+    session_cache.character_cache.clear()
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[database.get_db] = get_db
+    client = TestClient(app)
+
+    def with_db(fn):
+        def call(*args):
+            db = SessionLocal()
+            try:
+                return fn(db, *args)
+            finally:
+                db.close()
+        return call
+
+    operations = {
+        "crud.get_user_sessions": (
+            with_db(lambda db, u: crud.get_user_sessions(db, user_id=u)), [(u,) for u in users]),
+        "crud.get_user_sessions[heavy]": (
+            with_db(lambda db, u: crud.get_user_sessions(db, user_id=u)), [(u,) for u in meta["heavy_users"]]),
+        "crud.get_session_messages": (
+            with_db(lambda db, s, _: crud.get_session_messages(db, session_id=s)), read_sessions),
+        "crud.get_session_messages[long]": (
+            with_db(lambda db, s, _: crud.get_session_messages(db, session_id=s)), long_sessions),
+        "crud.create_message": (
+            with_db(lambda db, s, _: crud.create_message(db, session_id=s, content="벤치마크 질문", role="user")),
+            write_sessions),
+        "crud.delete_session": (
+            with_db(lambda db, s, u: crud.delete_session(db, session_id=s, user_id=u)), delete_sessions),
+        "GET /api/sessions/": (
+            lambda u: client.get("/api/sessions/", headers={"X-User-ID": u}).raise_for_status(),
+            [(u,) for u in users]),
+        "GET /api/sessions/chat/{id}/messages": (
+            lambda s, u: client.get(f"/api/sessions/chat/{s}/messages",
+                                    headers={"X-User-ID": u}).raise_for_status(),
+            read_sessions),
+    }
+
+    results, plans = {}, {}
+    for name, (fn, arguments) in operations.items():
+        for args in arguments[:3]:  # warm the page cache / connection pool
+            fn(*args)
+        recorder.reset()
+        samples = []
+        deadline = time.perf_counter() + max_op_seconds
+        for args in arguments:
+            start = time.perf_counter()
+            fn(*args)
+            samples.append((time.perf_counter() - start) * 1000)
+            # Slow operations at large scales get fewer samples instead of stalling the run
+            if start > deadline and len(samples) >= MIN_SAMPLES:
+                break
+        results[name] = {**summarize(samples), "statements_per_call": round(recorder.count / len(samples), 2)}
+        if with_plans:
+            plans[name] = _explain(work_path, recorder.statements)
+
+    app.dependency_overrides.pop(database.get_db, None)
+    engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(f"{work_path}{suffix}"):
+            os.remove(f"{work_path}{suffix}")
+    return results, plans
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """p50 ratio (current / baseline) for every (scale, profile, operation) in both reports."""
+    base = {(r["scale"], r["profile"]): r["operations"] for r in baseline.get("runs", [])}
+    rows = []
+    for run in report["runs"]:
+        old_ops = base.get((run["scale"], run["profile"]))
+        if not old_ops:
+            continue
+        for name, current in run["operations"].items():
+            old = old_ops.get(name)
+            if old and old.get("p50_ms"):
+                rows.append({
+                    "scale": run["scale"], "profile": run["profile"], "operation": name,
+                    "baseline_p50_ms": old["p50_ms"], "p50_ms": current["p50_ms"],
+                    "ratio": round(current["p50_ms"] / old["p50_ms"], 3),
+                })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="s,m", help=f"comma-separated, from {sorted(datagen.SCALES)}")
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--max-op-seconds", type=float, default=30,
+                        help="stop sampling an operation after this long (min 5 samples)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline report to compare p50 latencies against")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "max_op_seconds": args.max_op_seconds,
+        },
+        "runs": [],
+        "plans": {},
+    }
+    for scale in args.scales.split(","):
+        base_path = DATA_DIR / f"crud_{scale}.db"
+        meta = datagen.ensure_dataset(
+            str(base_path), datagen.SCALES[scale],
+            progress=lambda done, total: print(f"[{scale}] generating {done}/{total} days",
+                                               file=sys.stderr, flush=True) if done % 60 == 0 else None
+        )
+        for index, profile in enumerate(args.profiles.split(",")):
+            print(f"[{scale}] profile {profile}", file=sys.stderr, flush=True)
+            operations, plans = run_profile(scale, profile, base_path, meta, args.iterations,
+                                            args.seed, with_plans=index == 0,
+                                            max_op_seconds=args.max_op_seconds)
+            report["runs"].append({
+                "scale": scale, "profile": profile, "pragmas": PROFILES[profile],
+                "rows": meta["rows"], "file_bytes": os.path.getsize(base_path),
+                "operations": operations,
+            })
+            if plans:
+                report["plans"][scale] = plans
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Synthetic dataset generator for the CRUD benchmarks.
+
+Fills the app schema with realistic volumes and shapes:
+- sessions per user and messages per session are log-normal (a few heavy
+  users and very long chats, most of them small), means 10 and 20
+- each session links 1-3 gurus, popular gurus picked more often (Zipf)
+- turns follow the app: one user message, then one reply per guru
+- rows are written in time order across all sessions, day by day, so the
+  messages of one session are spread over the table like in production
+
+Scales (users -> ~sessions / ~messages):
+    xs 200 -> 2k / 40k     s 1k -> 10k / 200k     m 10k -> 100k / 2M     l 100k -> 1M / 20M
+
+    cd backend && python -m benchmarks.datagen --scale m --out /tmp/guruchat_m.db
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.common import make_engine, load_characters, fake_reply, SAMPLE_SENTENCES
+
+
+SCALES = {"xs": 200, "s": 1_000, "m": 10_000, "l": 100_000}
+
+MEAN_SESSIONS_PER_USER = 10
+MEAN_MESSAGES_PER_SESSION = 20
+MAX_SESSIONS_PER_USER = 2_000
+MAX_MESSAGES_PER_SESSION = 2_000
+# How many of the longest sessions / busiest users to remember for the harness
+HEAVY_SAMPLE = 20
+
+
+def _lognormal_count(rng: random.Random, mean: float, cap: int, sigma: float = 1.0) -> int:
+    mu = math.log(mean) - sigma ** 2 / 2
+    return max(1, min(cap, round(rng.lognormvariate(mu, sigma))))
+
+
+def _ts(value: datetime) -> str:
+    # Same text format SQLAlchemy's SQLite DateTime type writes and parses
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _pick_characters(rng: random.Random, character_ids: List[str], weights: List[float]) -> List[str]:
+    k = min(len(character_ids), rng.randint(1, 3))
+    chosen: List[str] = []
+    while len(chosen) < k:
+        candidate = rng.choices(character_ids, weights)[0]
+        if candidate not in chosen:
+            chosen.append(candidate)
+    return chosen
+
+
+def generate(path: str, users: int, days: int = 180, seed: int = 7,
+             progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """Create a fresh database at `path` and return its bench_meta summary."""
+    engine, SessionLocal = make_engine(path)
+    db = SessionLocal()
+    character_ids = load_characters(db)
+    db.close()
+    engine.dispose()
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path, isolation_level=None)
+    # Bulk load only: no journal, no fsync
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    names = dict(conn.execute("SELECT id, name FROM characters"))
+    weights = [1 / (rank + 1) for rank in range(len(character_ids))]
+    rng.shuffle(weights)
+
+    replies = [fake_reply(rng, rng.randint(3, 8)) for _ in range(4096)]
+    questions = SAMPLE_SENTENCES
+
+    start = datetime.utcnow().replace(microsecond=0) - timedelta(days=days)
+    user_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(users)]
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO users (id, created_at) VALUES (?, ?)", ((u, _ts(start)) for u in user_ids))
+    conn.execute("COMMIT")
+
+    # Spread each user's sessions over the period, then write day by day
+    by_day: List[List[str]] = [[] for _ in range(days)]
+    sessions_per_user = {}
+    for user_id in user_ids:
+        count = _lognormal_count(rng, MEAN_SESSIONS_PER_USER, MAX_SESSIONS_PER_USER)
+        sessions_per_user[user_id] = count
+        for _ in range(count):
+            by_day[rng.randrange(days)].append(user_id)
+
+    totals = {"users": users, "sessions": 0, "messages": 0, "session_characters": 0}
+    longest: List[tuple] = []
+    for day, day_users in enumerate(by_day):
+        day_start = start + timedelta(days=day)
+        session_rows, link_rows, message_rows = [], [], []
+        for user_id in day_users:
+            session_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+            chars = _pick_characters(rng, character_ids, weights)
+            count = _lognormal_count(rng, MEAN_MESSAGES_PER_SESSION, MAX_MESSAGES_PER_SESSION)
+            at = day_start + timedelta(seconds=rng.uniform(0, 80_000))
+            created_at = at
+            for i in range(count):
+                turn_position = i % (len(chars) + 1)
+                if turn_position == 0:
+                    message_rows.append((session_id, "user", rng.choice(questions), _ts(at), None))
+                else:
+                    message_rows.append((session_id, "assistant", rng.choice(replies), _ts(at),
+                                         chars[turn_position - 1]))
+                at += timedelta(seconds=rng.uniform(2, 40))
+            session_rows.append((
+                session_id, user_id, f"New Chat with {', '.join(names[c] for c in chars)}",
+                rng.choice((None, None, None, None, None, None, None, None, 1, 2)),
+                _ts(created_at), _ts(at)
+            ))
+            link_rows.extend((session_id, c) for c in chars)
+            longest.append((count, session_id))
+
+        # Keep insertion order = time order, as the live app would produce
+        session_rows.sort(key=lambda row: row[4])
+        message_rows.sort(key=lambda row: row[3])
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO sessions (id, user_id, title, responder_k, created_at, last_activity_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)", session_rows
+        )
+        conn.executemany("INSERT INTO session_characters (session_id, character_id) VALUES (?, ?)", link_rows)
+        conn.executemany(
+            "INSERT INTO messages (session_id, role, content, created_at, character_id) VALUES (?, ?, ?, ?, ?)",
+            message_rows
+        )
+        conn.execute("COMMIT")
+
+        totals["sessions"] += len(session_rows)
+        totals["messages"] += len(message_rows)
+        totals["session_characters"] += len(link_rows)
+        longest = sorted(longest, reverse=True)[:HEAVY_SAMPLE]
+        if progress:
+            progress(day + 1, days)
+
+    heavy_users = sorted(sessions_per_user, key=sessions_per_user.get, reverse=True)[:HEAVY_SAMPLE]
+    meta = {
+        "users": users, "days": days, "seed": seed, "rows": totals,
+        "heavy_users": heavy_users,
+        "long_sessions": [session_id for _, session_id in longest],
+    }
+    conn.execute("CREATE TABLE bench_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    conn.execute("INSERT INTO bench_meta VALUES ('meta', ?)", (json.dumps(meta),))
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.close()
+    return meta
+
+
+def read_meta(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(path)
+    try:
+        row = conn.execute("SELECT value FROM bench_meta WHERE key = 'meta'").fetchone()
+        return json.loads(row[0]) if row else None
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+def ensure_dataset(path: str, users: int, days: int = 180, seed: int = 7,
+                   progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """Reuse the dataset at `path` if it was generated with the same parameters."""
+    meta = read_meta(path)
+    if meta and (meta["users"], meta["days"], meta["seed"]) == (users, days, seed):
+        return meta
+    return generate(path, users, days=days, seed=seed, progress=progress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="s")
+    parser.add_argument("--users", type=int, help="overrides --scale")
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    def progress(done, total):
+        if done % 30 == 0 or done == total:
+            print(f"[{done}/{total}] days written", file=sys.stderr, flush=True)
+
+    started = time.perf_counter()
+    meta = generate(args.out, args.users or SCALES[args.scale], days=args.days, seed=args.seed, progress=progress)
+    print(json.dumps({
+        "path": args.out, "rows": meta["rows"],
+        "file_bytes": os.path.getsize(args.out),
+        "seconds": round(time.perf_counter() - started, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
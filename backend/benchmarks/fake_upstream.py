@@ -0,0 +1,78 @@
+"""
+Run the API with a canned LLM stream instead of the real upstream, so the
+transport benchmarks measure our server and not the model.
+
+    cd backend && python -m benchmarks.fake_upstream --port 8765
+
+FAKE_LLM_TOKENS (default 40) and FAKE_LLM_DELAY (seconds per token, default 0)
+shape the fake reply. WS_DEFLATE=1 turns permessage-deflate back on (off by
+default, like the Dockerfile).
+"""
+import argparse
+import json
+import os
+import time
+
+import requests
+
+
+class _FakeStreamResponse:
+    status_code = 200
+
+    def __init__(self, tokens: int, delay: float):
+        self.tokens = tokens
+        self.delay = delay
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, decode_unicode=True):
+        for i in range(self.tokens):
+            if self.closed:
+                return
+            if self.delay:
+                time.sleep(self.delay)
+            yield "data: " + json.dumps({"choices": [{"delta": {"content": f"tok{i} "}}]})
+        yield "data: [DONE]"
+
+    def json(self):
+        return {"choices": [{"message": {"content": "benchmark query"}}], "organic": []}
+
+    def close(self):
+        self.closed = True
+
+
+def fake_post(url, headers=None, json=None, stream=False, **kwargs):
+    tokens = int(os.getenv("FAKE_LLM_TOKENS", "40"))
+    delay = float(os.getenv("FAKE_LLM_DELAY", "0"))
+    return _FakeStreamResponse(tokens, delay)
+
+
+def install():
+    """Patch the HTTP client used by app.utils.llm_chat."""
+    from app.utils import llm_chat
+    llm_chat.requests = type("FakeRequests", (), {
+        "post": staticmethod(fake_post),
+        "HTTPError": requests.HTTPError,
+        "Timeout": requests.Timeout,
+        "ConnectionError": requests.ConnectionError,
+    })
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    install()
+    from app.main import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning",
+                ws_per_message_deflate=os.getenv("WS_DEFLATE", "0") == "1")
+
+
+if __name__ == "__main__":
+    main()
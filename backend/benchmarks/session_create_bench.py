@@ -0,0 +1,116 @@
+"""
+Benchmark session-creation throughput under concurrency: the legacy path
+(SELECT user, INSERT+commit+refresh, ORM session+refresh) against the current
+crud.create_session (upsert + one transaction, no refreshes).
+
+    cd backend && python -m benchmarks.session_create_bench [--threads 8] [--per-thread 200]
+"""
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from app import crud, models, schemas
+from benchmarks.common import make_engine, load_characters
+
+
+def legacy_create_session(db, request):
+    """The pre-upsert implementation, kept here only for comparison."""
+    user_id_str = str(request.user_id)
+    user = db.query(models.User).filter(models.User.id == user_id_str).first()
+    if not user:
+        user = models.User(id=user_id_str)
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+    char_ids_str = [str(char_id) for char_id in request.character_ids]
+    characters = db.query(models.Character).filter(models.Character.id.in_(char_ids_str)).all()
+    db_session = models.Session(
+        user_id=user_id_str,
+        title=f"New Chat with {', '.join([char.name for char in characters])}",
+        characters=characters,
+    )
+    db.add(db_session)
+    db.commit()
+    db.refresh(db_session)
+    return db_session
+
+
+def run(create_fn, label, threads, per_thread, returning_users, db_path):
+    engine, SessionLocal = make_engine(db_path)
+    db = SessionLocal()
+    character_ids = load_characters(db)
+    db.close()
+    crud._known_user_ids.clear()
+
+    # A small pool of returning users makes concurrent "first visit" races likely
+    user_pool = [uuid.uuid4() for _ in range(returning_users)]
+    errors = []
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        db = SessionLocal()
+        local = []
+        try:
+            for _ in range(per_thread):
+                request = schemas.PostSessionRequest(
+                    user_id=rng.choice(user_pool),
+                    character_ids=rng.sample(character_ids, k=rng.randint(1, 3)),
+                )
+                start = time.perf_counter()
+                try:
+                    create_fn(db, request)
+                except Exception as e:
+                    db.rollback()
+                    with lock:
+                        errors.append(type(e).__name__)
+                local.append((time.perf_counter() - start) * 1000)
+        finally:
+            db.close()
+            with lock:
+                latencies.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    total = threads * per_thread
+    engine.dispose()
+    return {
+        "variant": label,
+        "sessions": total - len(errors),
+        "errors": {name: errors.count(name) for name in set(errors)},
+        "throughput_per_s": round((total - len(errors)) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--per-thread", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50, help="Size of the returning-user pool.")
+    args = parser.parse_args()
+
+    db_path = str(Path(tempfile.gettempdir()) / "guruchat_session_bench.db")
+    results = [
+        run(legacy_create_session, "legacy", args.threads, args.per_thread, args.users, db_path),
+        run(crud.create_session, "upsert", args.threads, args.per_thread, args.users, db_path),
+    ]
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
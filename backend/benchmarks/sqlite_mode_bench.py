@@ -0,0 +1,148 @@
+"""
+Concurrent chat-turn throughput: SQLITE_MODE=default vs SQLITE_MODE=production.
+
+Each worker thread plays chat turns the way chat_engine does: look up the
+session, store the user message, load the history, then for every guru wait
+for the "model" (--stream-ms) and store the reply. Reader threads keep loading
+transcripts at the same time. Both modes run on a copy of the same synthetic
+dataset (benchmarks.datagen).
+
+    cd backend && python -m benchmarks.sqlite_mode_bench [--writers 16] [--readers 4] [--seconds 15]
+"""
+import argparse
+import json
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+
+from app import crud, session_cache
+from app.database import create_session_factory
+from benchmarks import datagen
+from benchmarks.common import summarize
+
+
+def run_mode(mode, base_path, work_path, args):
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{work_path}{suffix}").unlink(missing_ok=True)
+    shutil.copyfile(base_path, work_path)
+    engine, read_engine, SessionLocal = create_session_factory(f"sqlite:///{work_path}", mode)
+    session_cache.session_meta_cache.clear()
+    session_cache.character_cache.clear()
+
+    with sqlite3.connect(work_path) as conn:
+        sessions = conn.execute(
+            "SELECT s.id, GROUP_CONCAT(sc.character_id) FROM sessions s"
+            " JOIN session_characters sc ON sc.session_id = s.id GROUP BY s.id"
+        ).fetchall()
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    turn_ms, write_ms, read_ms = [], [], []
+    errors = Counter()
+    turns = 0
+
+    def record_error(exc):
+        message = str(getattr(exc, "orig", exc)).split("\n")[0]
+        with lock:
+            errors[f"{type(exc).__name__}: {message}"[:120]] += 1
+
+    def writer(seed):
+        nonlocal turns
+        rng = random.Random(seed)
+        while not stop.is_set():
+            session_id, character_ids = rng.choice(sessions)
+            started = time.perf_counter()
+            db = SessionLocal()
+            local_writes = []
+            try:
+                crud.get_session_meta(db, session_id=session_id)
+                t = time.perf_counter()
+                crud.create_message(db, session_id=session_id, content="요즘 시장 어때요?", role="user")
+                local_writes.append((time.perf_counter() - t) * 1000)
+                crud.get_session_messages(db, session_id=session_id)
+                for character_id in character_ids.split(","):
+                    time.sleep(args.stream_ms / 1000)
+                    t = time.perf_counter()
+                    crud.create_message(db, session_id=session_id, content="버블은 언젠가 터집니다.",
+                                        role="assistant", character_id=character_id)
+                    local_writes.append((time.perf_counter() - t) * 1000)
+            except (OperationalError, PoolTimeoutError) as e:
+                db.rollback()
+                record_error(e)
+                continue
+            finally:
+                db.close()
+            with lock:
+                turns += 1
+                turn_ms.append((time.perf_counter() - started) * 1000)
+                write_ms.extend(local_writes)
+
+    def reader(seed):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            session_id, _ = rng.choice(sessions)
+            db = SessionLocal()
+            try:
+                t = time.perf_counter()
+                crud.get_session_messages(db, session_id=session_id)
+                with lock:
+                    read_ms.append((time.perf_counter() - t) * 1000)
+            except (OperationalError, PoolTimeoutError) as e:
+                record_error(e)
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(1000 + i,)) for i in range(args.readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    engine.dispose()
+    read_engine.dispose()
+    return {
+        "turns_per_s": round(turns / elapsed, 1),
+        "turns": turns,
+        "failed_turns": sum(errors.values()),
+        "errors": dict(errors),
+        "turn": summarize(turn_ms),
+        "message_write": {**summarize(write_ms), "max_ms": round(max(write_ms), 3) if write_ms else None},
+        "history_read": summarize(read_ms),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(datagen.SCALES), default="xs")
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--stream-ms", type=float, default=20, help="simulated model time per reply")
+    parser.add_argument("--modes", default="default,production")
+    args = parser.parse_args()
+
+    data_dir = Path(tempfile.gettempdir()) / "guruchat_bench"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    base_path = data_dir / f"crud_{args.scale}.db"
+    meta = datagen.ensure_dataset(str(base_path), datagen.SCALES[args.scale])
+
+    report = {"config": vars(args), "rows": meta["rows"]}
+    for mode in args.modes.split(","):
+        report[mode] = run_mode(mode, base_path, data_dir / f"sqlite_mode_{mode}.db", args)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
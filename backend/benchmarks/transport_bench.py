@@ -0,0 +1,222 @@
+"""
+Compare the WebSocket transport with one-POST-per-turn SSE.
+
+Starts `benchmarks.fake_upstream` in a subprocess (throwaway SQLite DB, canned
+LLM stream) and reports:
+- connection setup rate: fresh HTTP connection + GET /health vs WS handshake + ping
+- chat turns/s: SSE POST per turn vs turns multiplexed on one WebSocket
+- server memory per idle client: open SSE turn waiting on the model vs idle WS
+
+    cd backend && python -m benchmarks.transport_bench [--connections 300] [--turns 100] [--idle 300]
+
+Requires the 'websockets' package.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import requests
+import websockets
+
+
+HOST = "127.0.0.1"
+# Benchmark servers get this token so the benchmarks can read /api/admin stats
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "benchmark-admin-token")
+
+
+def _rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+class Server:
+    def __init__(self, port: int, **env):
+        db_path = Path(tempfile.gettempdir()) / f"guruchat_transport_{port}.db"
+        if db_path.exists():
+            db_path.unlink()
+        self.port = port
+        self.base = f"http://{HOST}:{port}"
+        self.env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", "ADMIN_TOKEN": ADMIN_TOKEN, **env}
+
+    def __enter__(self):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.fake_upstream", "--port", str(self.port)],
+            env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        for _ in range(100):
+            try:
+                requests.get(f"{self.base}/health", timeout=0.5)
+                return self
+            except requests.RequestException:
+                time.sleep(0.1)
+        raise RuntimeError("benchmark server did not start")
+
+    def __exit__(self, *exc):
+        self.proc.kill()
+        self.proc.wait()
+
+    def new_session(self, user_id: str, characters: int = 2) -> str:
+        chars = requests.get(f"{self.base}/api/characters/").json()[:characters]
+        return requests.post(f"{self.base}/api/sessions/", json={
+            "user_id": user_id, "character_ids": [c["id"] for c in chars]
+        }).json()["id"]
+
+
+async def _http(port: int, method: str, path: str, headers: dict = None, body: bytes = b"") -> bytes:
+    """One request on a fresh connection; reads until the server closes it."""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    head = [f"{method} {path} HTTP/1.1", f"Host: {HOST}", "Connection: close",
+            f"Content-Length: {len(body)}"]
+    head += [f"{key}: {value}" for key, value in (headers or {}).items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return data
+
+
+async def _bounded(concurrency: int, count: int, fn):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await fn(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return time.perf_counter() - start
+
+
+async def connection_rate(server: Server, count: int, concurrency: int):
+    async def http_health(_):
+        await _http(server.port, "GET", "/health")
+
+    async def ws_ping(_):
+        async with websockets.connect(f"ws://{HOST}:{server.port}/api/sessions/chat/ws?user_id=bench") as ws:
+            await ws.send('{"op":"ping"}')
+            await ws.recv()
+
+    http_elapsed = await _bounded(concurrency, count, http_health)
+    ws_elapsed = await _bounded(concurrency, count, ws_ping)
+    return {
+        "http_connections_per_s": round(count / http_elapsed, 1),
+        "ws_connections_per_s": round(count / ws_elapsed, 1),
+    }
+
+
+async def turn_rate(server: Server, turns: int, concurrency: int):
+    user_id = str(uuid.uuid4())
+    session_id = server.new_session(user_id)
+    body = json.dumps({"content": "bench", "style": "spicy"}).encode()
+    headers = {"X-User-ID": user_id, "Content-Type": "application/json"}
+
+    async def sse_turn(_):
+        await _http(server.port, "POST", f"/api/sessions/chat/{session_id}/chat", headers, body)
+
+    sse_elapsed = await _bounded(concurrency, turns, sse_turn)
+
+    async with websockets.connect(f"ws://{HOST}:{server.port}/api/sessions/chat/ws?user_id={user_id}") as ws:
+        done = asyncio.Event()
+        finished = 0
+
+        async def reader():
+            nonlocal finished
+            async for raw in ws:
+                message = json.loads(raw)
+                frames = message if isinstance(message[0], list) else [message]
+                for frame in frames:
+                    if frame[0] in ("f", "x"):
+                        finished += 1
+                        slots.release()
+                if finished == turns:
+                    done.set()
+                    return
+
+        slots = asyncio.Semaphore(concurrency)
+        reader_task = asyncio.create_task(reader())
+        start = time.perf_counter()
+        for i in range(turns):
+            await slots.acquire()
+            await ws.send(json.dumps({"op": "chat", "turn": str(i), "session_id": session_id,
+                                      "content": "bench", "style": "spicy"}))
+        await done.wait()
+        ws_elapsed = time.perf_counter() - start
+        await reader_task
+
+    return {
+        "sse_turns_per_s": round(turns / sse_elapsed, 1),
+        "ws_turns_per_s": round(turns / ws_elapsed, 1),
+    }
+
+
+async def idle_memory(port_ws: int, port_sse: int, clients: int):
+    report = {}
+
+    with Server(port_ws) as server:
+        await asyncio.sleep(0.5)
+        before = _rss_kb(server.proc.pid)
+        sockets = [await websockets.connect(f"ws://{HOST}:{port_ws}/api/sessions/chat/ws?user_id=idle{i}")
+                   for i in range(clients)]
+        await asyncio.sleep(1.0)
+        after = _rss_kb(server.proc.pid)
+        report["ws_idle_kb_per_client"] = round((after - before) / clients, 2)
+        for ws in sockets:
+            await ws.close()
+
+    # An "idle" SSE client is an open chat POST waiting for the (very slow) model
+    with Server(port_sse, FAKE_LLM_DELAY="600") as server:
+        user_id = str(uuid.uuid4())
+        session_id = server.new_session(user_id, characters=1)
+        await asyncio.sleep(0.5)
+        before = _rss_kb(server.proc.pid)
+        body = json.dumps({"content": "idle", "style": "spicy"}).encode()
+        request = (
+            f"POST /api/sessions/chat/{session_id}/chat HTTP/1.1\r\nHost: {HOST}\r\n"
+            f"X-User-ID: {user_id}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        ).encode() + body
+        streams = []
+        for _ in range(clients):
+            reader, writer = await asyncio.open_connection(HOST, port_sse)
+            writer.write(request)
+            await writer.drain()
+            streams.append(writer)
+        await asyncio.sleep(2.0)
+        after = _rss_kb(server.proc.pid)
+        report["sse_idle_kb_per_client"] = round((after - before) / clients, 2)
+        for writer in streams:
+            writer.close()
+
+    return report
+
+
+async def run(args):
+    report = {"config": vars(args)}
+    with Server(args.port) as server:
+        report["connections"] = await connection_rate(server, args.connections, args.concurrency)
+        report["turns"] = await turn_rate(server, args.turns, 4)
+    report["idle_memory"] = await idle_memory(args.port + 1, args.port + 2, args.idle)
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--connections", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--idle", type=int, default=300)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Tests run against throwaway SQLite files: the app creates and seeds its
+database (and the trace store) on import, so point both at a temp dir first.
+
+    cd backend && python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+_TMP = Path(tempfile.mkdtemp(prefix="guruchat_tests_"))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TMP / 'app.db'}")
+os.environ.setdefault("TRACE_DB_PATH", str(_TMP / "traces.db"))
+os.environ.setdefault("ADMIN_TOKEN", "test-admin-token")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The app over TestClient, with the canned LLM stream of benchmarks.fake_upstream."""
+    from benchmarks import fake_upstream
+    fake_upstream.install()
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def new_session(client):
+    """Create a session with two gurus for a fresh user; returns (session_id, user_id)."""
+    def create(characters: int = 2):
+        user_id = str(uuid.uuid4())
+        character_ids = [c["id"] for c in client.get("/api/characters/").json()[:characters]]
+        response = client.post("/api/sessions/", json={"user_id": user_id, "character_ids": character_ids})
+        assert response.status_code == 200, response.text
+        return response.json()["id"], user_id
+    return create
+
+
+@pytest.fixture
+def chat(client):
+    """POST one chat turn; the (buffered) SSE body is in response.text."""
+    def post(session_id: str, user_id: str, content: str = "hello", headers=None):
+        return client.post(f"/api/sessions/chat/{session_id}/chat",
+                           json={"content": content, "style": "spicy"},
+                           headers={"X-User-ID": user_id, **(headers or {})})
+    return post
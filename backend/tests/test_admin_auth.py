@@ -0,0 +1,26 @@
+import pytest
+
+from app.routers import admin
+
+ADMIN_PATHS = [
+    "/api/admin/stats/generation",
+    "/api/admin/stats/cache",
+    "/api/admin/stats/personas",
+    "/api/admin/stats/tracing",
+    "/api/admin/stats/broadcast",
+    "/api/admin/traces/unknown",
+    "/api/admin/sessions/unknown/traces",
+]
+
+
+@pytest.mark.parametrize("path", ADMIN_PATHS)
+def test_admin_endpoints_require_the_token(client, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={"X-Admin-Token": "wrong"}).status_code == 401
+    assert client.get(path, headers={"X-Admin-Token": "test-admin-token"}).status_code in (200, 404)
+
+
+def test_admin_api_is_disabled_without_a_configured_token(client, monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", None)
+    response = client.get("/api/admin/stats/cache", headers={"X-Admin-Token": "test-admin-token"})
+    assert response.status_code == 403
@@ -0,0 +1,128 @@
+import json
+import uuid
+
+from sqlalchemy import insert
+
+from app import archive, crud, database, models
+
+ADMIN = {"X-Admin-Token": "test-admin-token"}
+
+
+def _export(client, session_id, user_id):
+    response = client.get(f"/api/sessions/{session_id}/export", headers={"X-User-ID": user_id})
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def _as_new_session(records):
+    """The same transcript under a fresh session ID (so it is not skipped as existing)."""
+    session_id = str(uuid.uuid4())
+    for record in records:
+        record["id" if record["type"] == "session" else "session_id"] = session_id
+    return session_id, "\n".join(json.dumps(record) for record in records)
+
+
+def _import(client, body, headers=ADMIN, **params):
+    return client.post("/api/admin/import", content=body.encode(), headers=headers, params=params)
+
+
+def _messages(client, session_id, user_id):
+    return client.get(f"/api/sessions/chat/{session_id}/messages", headers={"X-User-ID": user_id}).json()
+
+
+def test_import_requires_the_admin_token(client):
+    assert _import(client, "", headers={}).status_code == 401
+    assert _import(client, "", headers={"X-Admin-Token": "wrong"}).status_code == 401
+
+
+def test_import_assigns_fresh_message_ids_by_default(client, new_session, chat):
+    session_id, user_id = new_session()
+    chat(session_id, user_id)
+    records = _export(client, session_id, user_id)
+    imported_id, body = _as_new_session(records)
+
+    response = _import(client, body)
+    assert response.status_code == 200
+    assert response.json()["sessions"] == 1 and response.json()["messages"] == 3
+
+    original = _messages(client, session_id, user_id)
+    copy = _messages(client, imported_id, user_id)
+    assert [m["content"] for m in copy] == [m["content"] for m in original]
+    assert not {m["id"] for m in copy} & {m["id"] for m in original}
+
+
+def test_conflicting_ids_are_rejected_with_409_and_nothing_is_kept(client, new_session, chat):
+    session_id, user_id = new_session()
+    chat(session_id, user_id)
+    imported_id, body = _as_new_session(_export(client, session_id, user_id))
+
+    response = _import(client, body, keep_ids="true", batch_size=1)
+    assert response.status_code == 409
+    assert client.get(f"/api/sessions/chat/{imported_id}/messages",
+                      headers={"X-User-ID": user_id}).status_code == 404
+
+
+def test_invalid_record_rolls_back_the_session_in_progress(client, new_session, chat):
+    session_id, user_id = new_session()
+    chat(session_id, user_id)
+    imported_id, body = _as_new_session(_export(client, session_id, user_id))
+
+    response = _import(client, body + "\n{\"type\": \"bogus\"}\n", batch_size=1)
+    assert response.status_code == 400
+    assert client.get(f"/api/sessions/chat/{imported_id}/messages",
+                      headers={"X-User-ID": user_id}).status_code == 404
+
+
+def test_sessions_before_an_error_are_kept_and_skipped_on_resend(client, new_session, chat):
+    session_id, user_id = new_session()
+    chat(session_id, user_id)
+    records = _export(client, session_id, user_id)
+    first_id, first = _as_new_session([dict(r) for r in records])
+    second_id, second = _as_new_session([dict(r) for r in records])
+
+    response = _import(client, first + "\n" + second + "\n{\"type\": \"bogus\"}\n")
+    assert response.status_code == 400
+    assert "1 sessions before it" in response.json()["detail"]
+    assert len(_messages(client, first_id, user_id)) == 3
+    assert client.get(f"/api/sessions/chat/{second_id}/messages",
+                      headers={"X-User-ID": user_id}).status_code == 404
+
+    response = _import(client, first + "\n" + second)
+    assert response.status_code == 200
+    assert response.json()["skipped_sessions"] == 1 and response.json()["sessions"] == 1
+    assert len(_messages(client, second_id, user_id)) == 3
+
+
+def test_export_merges_archived_and_hot_messages(client, new_session, chat):
+    session_id, user_id = new_session()
+    chat(session_id, user_id)
+    db = database.SessionLocal()
+    try:
+        archive.archive_session(db, session_id)
+        # Written after archiving without a rehydration: stays hot next to the blob
+        later = crud.create_message(db, session_id, "after archiving", "user").id
+    finally:
+        db.close()
+
+    messages = [r for r in _export(client, session_id, user_id) if r["type"] == "message"]
+    assert len(messages) == 4
+    assert [m["id"] for m in messages] == sorted(m["id"] for m in messages)
+    assert messages[-1]["id"] == later
+
+
+def test_export_of_a_half_rehydrated_session_has_no_duplicates(client, new_session, chat):
+    session_id, user_id = new_session()
+    chat(session_id, user_id)
+    db = database.SessionLocal()
+    try:
+        archive.archive_session(db, session_id)
+        # Rows restored but the blob not deleted yet
+        blob = db.get(models.SessionArchive, session_id)
+        rows = json.loads(archive.decompress(blob.payload, blob.codec))
+        db.execute(insert(models.Message), [archive._row_to_values(session_id, row) for row in rows])
+        db.commit()
+    finally:
+        db.close()
+
+    messages = [r for r in _export(client, session_id, user_id) if r["type"] == "message"]
+    assert [m["id"] for m in messages] == [row["id"] for row in rows]
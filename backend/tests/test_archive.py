@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+
+from app import archive, database, models
+
+
+def _history(client, session_id, user_id):
+    response = client.get(f"/api/sessions/chat/{session_id}/messages", headers={"X-User-ID": user_id})
+    assert response.status_code == 200
+    return [(m["role"], m["content"]) for m in response.json()]
+
+
+def test_new_turn_after_archiving_keeps_the_full_history(client, new_session, chat):
+    session_id, user_id = new_session()
+    assert chat(session_id, user_id, "first question").status_code == 200
+    before = _history(client, session_id, user_id)
+    assert len(before) == 3  # question + two guru replies
+
+    db = database.SessionLocal()
+    try:
+        assert archive.archive_session(db, session_id)["message_count"] == 3
+    finally:
+        db.close()
+
+    response = chat(session_id, user_id, "second question")
+    assert response.status_code == 200
+    assert response.text.count("data: {\"content\": \" \"}") == 2  # both gurus finished
+
+    after = _history(client, session_id, user_id)
+    assert after[:3] == before
+    assert after[3] == ("user", "second question")
+    assert len(after) == 6
+
+    db = database.SessionLocal()
+    try:
+        assert db.get(models.SessionArchive, session_id) is None
+        assert db.get(models.Session, session_id).archived_at is None
+    finally:
+        db.close()
+
+
+def test_reading_history_rehydrates_an_archived_session(client, new_session, chat):
+    session_id, user_id = new_session()
+    chat(session_id, user_id, "question")
+    before = _history(client, session_id, user_id)
+
+    db = database.SessionLocal()
+    try:
+        archive.archive_session(db, session_id)
+    finally:
+        db.close()
+    assert _history(client, session_id, user_id) == before
+
+
+def _make_idle(session_id, days=40):
+    db = database.SessionLocal()
+    try:
+        db.query(models.Session).filter(models.Session.id == session_id)\
+            .update({"last_activity_at": datetime.now(timezone.utc) - timedelta(days=days)})
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_session_active_again_during_the_job_is_not_archived(client, new_session, chat, monkeypatch):
+    session_id, user_id = new_session()
+    chat(session_id, user_id, "question")
+    _make_idle(session_id)
+
+    find = archive.find_inactive_sessions
+
+    def find_then_chat(db, days):
+        candidates = find(db, days)
+        assert session_id in candidates
+        chat(session_id, user_id, "back again")  # arrives while the job runs
+        return [session_id]
+
+    monkeypatch.setattr(archive, "find_inactive_sessions", find_then_chat)
+    db = database.SessionLocal()
+    try:
+        summary = archive.archive_inactive_sessions(db, days=30)
+        assert summary["candidates"] == 1 and summary["archived_sessions"] == 0
+        assert db.get(models.SessionArchive, session_id) is None
+        assert db.get(models.Session, session_id).archived_at is None
+    finally:
+        db.close()
+    assert len(_history(client, session_id, user_id)) == 6
+
+
+def test_rehydrated_session_is_not_archived_again(client, new_session, chat):
+    session_id, user_id = new_session()
+    chat(session_id, user_id, "question")
+    _make_idle(session_id)
+
+    db = database.SessionLocal()
+    try:
+        assert archive.archive_inactive_sessions(db, days=30)["archived_sessions"] >= 1
+        _history(client, session_id, user_id)  # only read: rehydrates
+        assert session_id not in archive.find_inactive_sessions(db, days=30)
+    finally:
+        db.close()
@@ -0,0 +1,79 @@
+import asyncio
+
+from app.broadcast import BroadcastHub
+
+
+def _drain(subscriber):
+    chunks = []
+    while not subscriber.queue.empty():
+        chunks.append(subscriber.queue.get_nowait())
+    return chunks
+
+
+def test_each_flush_reaches_every_watcher_as_one_write():
+    async def scenario():
+        hub = BroadcastHub(buffer_writes=4, flush_ms=1)
+        watchers = [hub.subscribe("s1") for _ in range(3)]
+        other = hub.subscribe("s2")
+        hub.publish("s1", "delta", {"content": "a"})
+        hub.publish("s1", "done", {"status": "completed"})
+        await asyncio.sleep(0.02)
+        return hub, watchers, other
+
+    hub, watchers, other = asyncio.run(scenario())
+    for watcher in watchers:
+        [chunk] = _drain(watcher)
+        assert chunk.index("event: delta") < chunk.index("event: done")
+    assert _drain(other) == []
+    stats = hub.stats()
+    assert stats["published"] == 2 and stats["flushes"] == 1 and stats["delivered"] == 3
+
+
+def test_slow_watcher_is_dropped_without_holding_back_the_others():
+    async def scenario():
+        hub = BroadcastHub(buffer_writes=2, flush_ms=1)
+        slow, fast = hub.subscribe("s1"), hub.subscribe("s1")
+        received = []
+        for turn in range(3):
+            hub.publish("s1", "delta", {"content": str(turn)})
+            await asyncio.sleep(0.01)
+            received += _drain(fast)
+        frames = [frame async for frame in hub.stream(slow)]
+        return hub, fast, received, frames
+
+    hub, fast, received, frames = asyncio.run(scenario())
+    assert len(received) == 3
+    assert frames[0] == ": watching\n\n"
+    assert frames[1].startswith("event: dropped") and len(frames) == 2
+    stats = hub.stats()
+    assert stats["dropped"] == 1 and stats["watchers"] == 1
+
+
+def test_topic_is_removed_with_its_last_watcher():
+    async def scenario():
+        hub = BroadcastHub(flush_ms=1000)
+        first, second = hub.subscribe("s1"), hub.subscribe("s1")
+        hub.publish("s1", "delta", {"content": "pending"})
+        hub.unsubscribe(first)
+        assert hub.stats()["sessions"] == 1
+
+        # A disconnecting client closes its stream, which unsubscribes it
+        stream = hub.stream(second)
+        assert await stream.__anext__() == ": watching\n\n"
+        await stream.aclose()
+        assert hub.stats()["sessions"] == 0 and hub.stats()["watchers"] == 0
+
+        hub.publish("s1", "delta", {"content": "nobody listens"})
+        return hub
+
+    hub = asyncio.run(scenario())
+    assert hub.stats()["published"] == 1 and hub.stats()["flushes"] == 0
+
+
+def test_watch_requires_the_session_owner(client, new_session):
+    session_id, user_id = new_session()
+    path = f"/api/sessions/chat/{session_id}/watch"
+    assert client.get(path, headers={"X-User-ID": "someone-else"}).status_code == 404
+    assert client.get(path, params={"user_id": "someone-else"}).status_code == 404
+    assert client.get(path).status_code == 404
+    assert client.get("/api/sessions/chat/no-such-session/watch", params={"user_id": user_id}).status_code == 404
@@ -0,0 +1,135 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from app.cache import Cache, FallbackBackend, MemoryBackend, RedisBackend, base
+from app.cache.fake_redis import FakeRedisServer
+
+
+@pytest.fixture
+def redis_server():
+    server = FakeRedisServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(autouse=True)
+def no_version_check_delay(monkeypatch):
+    monkeypatch.setattr(base, "VERSION_CHECK_SECONDS", 0)
+
+
+def test_redis_backend_commands(redis_server):
+    backend = RedisBackend(redis_server.url)
+    assert backend.ping()
+    assert backend.get("missing") is None
+    backend.set("key", b"value")
+    assert backend.get("key") == b"value"
+    backend.set("short", b"x", ttl=0.01)
+    time.sleep(0.05)
+    assert backend.get("short") is None
+    assert backend.incr("counter") == 1 and backend.incr("counter") == 2
+    backend.delete("key")
+    assert backend.get("key") is None
+    backend.close()
+
+
+def test_invalidations_reach_every_worker_sharing_redis(redis_server):
+    # Two workers: separate connections and Cache objects over the same server
+    first = Cache(RedisBackend(redis_server.url), "meta", default_ttl=60)
+    second = Cache(RedisBackend(redis_server.url), "meta", default_ttl=60)
+    first.set("session", {"title": "old"})
+    assert second.get("session") == {"title": "old"}
+
+    second.delete("session")
+    assert first.get("session") is None
+
+    first.set("session", {"title": "new"})
+    second.clear()
+    assert first.get("session") is None
+
+
+def test_local_ttl_caps_entries_only_on_process_local_backends(redis_server):
+    local = Cache(MemoryBackend(), "meta", default_ttl=3600, local_ttl=0.01)
+    shared = Cache(RedisBackend(redis_server.url), "meta", default_ttl=3600, local_ttl=0.01)
+    local.set("key", "value")
+    shared.set("key", "value")
+    time.sleep(0.05)
+    assert local.get("key") is None
+    assert shared.get("key") == "value"
+
+
+def test_fallback_serves_from_memory_while_redis_is_down_and_replays_invalidations():
+    server = FakeRedisServer().start()
+    port = int(server.url.rsplit(":", 1)[1].split("/")[0])
+    backend = FallbackBackend(RedisBackend(server.url), make_fallback=MemoryBackend, retry_seconds=0)
+    cache = Cache(backend, "meta", default_ttl=60, local_ttl=30)
+    cache.set("kept", "v1")
+    cache.set("deleted", "v1")
+    version = cache.version()
+
+    server.stop()
+    assert cache.get("kept") is None  # no exception: answered by the in-process fallback
+    assert not backend.shared and "fallback" in backend.name
+    cache.set("during", "v2")
+    cache.delete("deleted")
+    cache.clear()
+
+    restarted = FakeRedisServer(port=port, store=server.store).start()
+    try:
+        assert cache.version() == version + 1  # first call after the restart replays the clear()
+        assert backend.shared and backend.name == "redis"
+        assert backend.primary.get(f"meta:v{version}:deleted") is None
+        assert backend.primary.get(f"meta:v{version}:kept") is not None
+        assert backend.outages == 1
+    finally:
+        restarted.stop()
+
+
+def test_failed_connection_is_closed_not_leaked():
+    server = FakeRedisServer().start()
+    backend = RedisBackend(server.url)
+    backend.get("key")
+    conn = backend._connections[0]
+    server.stop()
+    with pytest.raises(OSError):
+        backend.get("key")
+    assert conn.sock.fileno() == -1
+    assert backend._connections == []
+
+
+def test_error_replies_fall_back_instead_of_raising(redis_server):
+    backend = FallbackBackend(RedisBackend(redis_server.url), make_fallback=MemoryBackend, retry_seconds=60)
+    backend.set("counter", b"not a number")
+    assert backend.incr("counter") == 1  # ERR from Redis: answered by the fallback
+    assert backend.outages == 1 and not backend.shared
+
+
+def test_probe_runs_outside_the_lock_with_a_short_timeout(monkeypatch):
+    # Accepts connections but never answers, like a blackholed Redis
+    blackhole = socket.socket()
+    blackhole.bind(("127.0.0.1", 0))
+    blackhole.listen(16)
+    port = blackhole.getsockname()[1]
+    try:
+        backend = FallbackBackend(RedisBackend(f"redis://127.0.0.1:{port}/0"), make_fallback=MemoryBackend,
+                                  retry_seconds=0, probe_timeout=0.2)
+        backend._primary_failed(ConnectionError("down"))
+
+        start = time.monotonic()
+        assert backend.get("key") is None
+        assert time.monotonic() - start < 1.0  # one short probe, not connect + retry timeouts
+
+        probe = backend.primary.probe
+        monkeypatch.setattr(backend.primary, "probe", lambda timeout: (time.sleep(0.5), probe(timeout)))
+        prober = threading.Thread(target=backend.get, args=("key",))
+        prober.start()
+        time.sleep(0.1)
+        start = time.monotonic()
+        backend.get("key")  # served by the fallback while the other call probes
+        assert time.monotonic() - start < 0.1
+        prober.join()
+        assert "fallback" in backend.name
+    finally:
+        blackhole.close()
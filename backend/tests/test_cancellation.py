@@ -0,0 +1,84 @@
+import http.server
+import threading
+import time
+
+import pytest
+
+from app.utils import generation_budget, llm_chat
+
+
+class _StallingUpstream(http.server.BaseHTTPRequestHandler):
+    """Streams one chunk, then stalls for longer than any test should take."""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        data = b'data: {"choices": [{"delta": {"content": "Partial"}}]}\n\n'
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+        time.sleep(10)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stalling_upstream(monkeypatch):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _StallingUpstream)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(llm_chat, "FLOCK_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(llm_chat, "requests", __import__("requests"))
+    yield
+    server.shutdown()
+
+
+def test_cancel_interrupts_a_stalled_upstream_read(stalling_upstream):
+    cancel = llm_chat.UpstreamCancel()
+    first_chunk = threading.Event()
+    result = {}
+
+    def worker():
+        result["text"] = llm_chat.generate_guru_response(
+            "q", "hot", {"name": "Tester"}, stream_callback=lambda chunk: first_chunk.set(), cancel=cancel
+        )
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    assert first_chunk.wait(5)
+    started = time.monotonic()
+    cancel.cancel()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert time.monotonic() - started < 1
+    assert result["text"] == "Partial"
+
+
+def test_ws_cancel_stops_the_upstream_stream(client, new_session, monkeypatch):
+    # 400 fake tokens at 10ms each: the reply would take 4s if nothing stopped it
+    monkeypatch.setenv("FAKE_LLM_TOKENS", "400")
+    monkeypatch.setenv("FAKE_LLM_DELAY", "0.01")
+    generation_budget.reset_generation_stats()
+    session_id, user_id = new_session(characters=1)
+
+    with client.websocket_connect(f"/api/sessions/chat/ws?user_id={user_id}") as ws:
+        ws.send_json({"op": "chat", "turn": "t1", "session_id": session_id, "content": "hi", "style": "cold"})
+        frame = ws.receive_json()
+        assert frame[0] == "s"
+        while not (frame[0] == "d" or isinstance(frame[0], list)):
+            frame = ws.receive_json()
+        ws.send_json({"op": "cancel", "turn": "t1"})
+
+        deadline = time.monotonic() + 2
+        stats = {}
+        while time.monotonic() < deadline:
+            stats = generation_budget.get_generation_stats().get("cold", {})
+            if stats.get("replies"):
+                break
+            time.sleep(0.02)
+    assert stats.get("stop_reasons") == {"cancelled": 1}
+    assert stats["mean_chunks"] < 200
@@ -0,0 +1,61 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.compression import CompressionMiddleware
+
+brotli = pytest.importorskip("brotli")
+
+BODY = b"".join(b"line %d of a fairly repetitive export\n" % i for i in range(500))
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/plain")
+    def plain():
+        return PlainTextResponse(BODY)
+
+    @app.get("/export")
+    def export():
+        return StreamingResponse((BODY[i:i + 1000] for i in range(0, len(BODY), 1000)),
+                                 media_type="application/x-ndjson")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter([b"data: x\n\n" * 200]), media_type="text/event-stream")
+
+    return app
+
+
+def _raw(client, path, accept_encoding):
+    with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response.headers, b"".join(response.iter_raw())
+
+
+@pytest.mark.parametrize("path", ["/plain", "/export"])
+def test_brotli_when_accepted(path):
+    with TestClient(_app()) as client:
+        headers, raw = _raw(client, path, "gzip, br")
+    assert headers["content-encoding"] == "br"
+    assert "accept-encoding" in headers["vary"].lower()
+    assert len(raw) < len(BODY)
+    assert brotli.decompress(raw) == BODY
+
+
+def test_gzip_when_brotli_refused():
+    with TestClient(_app()) as client:
+        headers, raw = _raw(client, "/plain", "br;q=0, gzip")
+    assert headers["content-encoding"] == "gzip"
+    assert gzip.decompress(raw) == BODY
+
+
+def test_event_stream_is_not_compressed():
+    with TestClient(_app()) as client:
+        headers, raw = _raw(client, "/events", "br")
+    assert "content-encoding" not in headers
+    assert raw == b"data: x\n\n" * 200
@@ -0,0 +1,62 @@
+from app.utils import generation_budget
+from app.utils.generation_budget import BudgetTracker, GenerationBudget
+
+
+def _tracker(max_sentences=None, max_tokens=1000):
+    return BudgetTracker("hot", GenerationBudget(max_tokens=max_tokens, max_sentences=max_sentences,
+                                                 deadline_seconds=60))
+
+
+def test_env_int_falls_back_to_default_for_non_positive_values(monkeypatch):
+    for value in ("0", "-5", "abc"):
+        monkeypatch.setenv("GEN_BUDGET_TEST_MAX_TOKENS", value)
+        assert generation_budget._env_int("GEN_BUDGET_TEST_MAX_TOKENS", 200) == 200
+    monkeypatch.setenv("GEN_BUDGET_TEST_MAX_TOKENS", "50")
+    assert generation_budget._env_int("GEN_BUDGET_TEST_MAX_TOKENS", 200) == 50
+
+
+def test_env_int_zero_turns_off_optional_limits(monkeypatch):
+    monkeypatch.setenv("GEN_BUDGET_TEST_MAX_SENTENCES", "0")
+    assert generation_budget._env_int("GEN_BUDGET_TEST_MAX_SENTENCES", 3, allow_off=True) is None
+
+
+def test_env_float_falls_back_to_default_for_invalid_deadlines(monkeypatch):
+    for value in ("0", "-1.5", "soon", "nan", "inf"):
+        monkeypatch.setenv("GEN_BUDGET_TEST_DEADLINE_SECONDS", value)
+        assert generation_budget._env_float("GEN_BUDGET_TEST_DEADLINE_SECONDS", 20.0) == 20.0
+    monkeypatch.setenv("GEN_BUDGET_TEST_DEADLINE_SECONDS", "7.5")
+    assert generation_budget._env_float("GEN_BUDGET_TEST_DEADLINE_SECONDS", 20.0) == 7.5
+
+
+def test_sentence_limit_cuts_after_last_allowed_sentence():
+    tracker = _tracker(max_sentences=2)
+    kept = "".join(tracker.feed(chunk) for chunk in ["One. ", "Two!", "\" Three. Four."])
+    assert kept == "One. Two!\""
+    assert tracker.stop_reason == "sentences"
+
+
+def test_abbreviations_and_initials_do_not_end_a_sentence():
+    tracker = _tracker(max_sentences=1)
+    kept = tracker.feed("Buy index funds, e.g. the S&P 500 in the U.S. market. Then wait.")
+    assert kept == "Buy index funds, e.g. the S&P 500 in the U.S. market."
+
+
+def test_abbreviation_split_across_chunks():
+    tracker = _tracker(max_sentences=1)
+    kept = "".join(tracker.feed(chunk) for chunk in ["Stocks, bonds, e", ".g", ". ", "gold. More."])
+    assert kept == "Stocks, bonds, e.g. gold."
+
+
+def test_chunks_and_usage_tokens_are_reported_separately():
+    generation_budget.reset_generation_stats()
+    tracker = _tracker(max_tokens=3)
+    for chunk in ["a ", "b ", "c ", "d "]:
+        tracker.feed(chunk)
+    assert tracker.chunks == 3 and tracker.stop_reason == "max_tokens"
+    assert tracker.finish()["tokens"] is None
+    _tracker().finish(usage_tokens=42)
+
+    stats = generation_budget.get_generation_stats()["hot"]
+    assert stats["replies"] == 2
+    assert stats["mean_chunks"] == 1.5
+    assert stats["usage_replies"] == 1 and stats["mean_tokens"] == 42
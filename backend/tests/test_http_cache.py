@@ -0,0 +1,76 @@
+from app import archive, crud, database
+
+
+def _get(client, path, user_id, etag=None):
+    headers = {"X-User-ID": user_id}
+    if etag:
+        headers["If-None-Match"] = etag
+    return client.get(path, headers=headers)
+
+
+def test_messages_304_until_a_new_message(client, new_session, chat):
+    session_id, user_id = new_session()
+    path = f"/api/sessions/chat/{session_id}/messages"
+    chat(session_id, user_id)
+    first = _get(client, path, user_id)
+    etag = first.headers["ETag"]
+
+    cached = _get(client, path, user_id, etag)
+    assert cached.status_code == 304 and cached.content == b""
+    assert cached.headers["ETag"] == etag
+
+    chat(session_id, user_id, "again")
+    changed = _get(client, path, user_id, etag)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()) == len(first.json()) + 3
+
+
+def test_etag_of_an_archived_session_matches_its_body(client, new_session, chat):
+    session_id, user_id = new_session()
+    path = f"/api/sessions/chat/{session_id}/messages"
+    chat(session_id, user_id)
+    before = _get(client, path, user_id)
+    db = database.SessionLocal()
+    try:
+        archive.archive_session(db, session_id)
+    finally:
+        db.close()
+
+    rehydrated = _get(client, path, user_id)
+    assert rehydrated.json() == before.json()
+    assert rehydrated.headers["ETag"] == before.headers["ETag"]
+    assert _get(client, path, user_id, rehydrated.headers["ETag"]).status_code == 304
+
+
+def test_session_list_tag_moves_on_title_change(client, new_session):
+    session_id, user_id = new_session()
+    etag = _get(client, "/api/sessions/", user_id).headers["ETag"]
+    assert _get(client, "/api/sessions/", user_id, etag).status_code == 304
+
+    response = client.patch(f"/api/sessions/{session_id}/title", json={"title": "renamed"},
+                            headers={"X-User-ID": user_id})
+    assert response.status_code == 200
+    changed = _get(client, "/api/sessions/", user_id, etag)
+    assert changed.status_code == 200
+    assert changed.json()[0]["title"] == "renamed"
+
+
+def test_catalog_change_moves_every_tag_that_embeds_characters(client, new_session, chat):
+    session_id, user_id = new_session()
+    chat(session_id, user_id)
+    paths = ["/api/characters/", "/api/sessions/", f"/api/sessions/chat/{session_id}/messages"]
+    etags = {path: _get(client, path, user_id).headers["ETag"] for path in paths}
+
+    db = database.SessionLocal()
+    try:
+        character = crud.get_all_characters(db)[0]
+        original = character.persona_data
+        crud.update_character_persona(db, character.id, {**original, "tone": "changed for the test"})
+        try:
+            for path, etag in etags.items():
+                assert _get(client, path, user_id, etag).status_code == 200, path
+        finally:
+            crud.update_character_persona(db, character.id, original)
+    finally:
+        db.close()
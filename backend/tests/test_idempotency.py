@@ -0,0 +1,36 @@
+from app import chat_engine
+
+
+def test_completed_turn_is_replayed(client, new_session, chat):
+    session_id, user_id = new_session()
+    headers = {"Idempotency-Key": "k-ok"}
+    first = chat(session_id, user_id, headers=headers)
+    assert first.status_code == 200
+    assert first.headers["Idempotent-Replayed"] == "false"
+
+    retry = chat(session_id, user_id, headers=headers)
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.text.count('data: {"content": " "}') == 2
+    messages = client.get(f"/api/sessions/chat/{session_id}/messages", headers={"X-User-ID": user_id}).json()
+    assert [m["role"] for m in messages].count("user") == 1
+
+
+def test_failed_turn_reports_an_error_and_is_not_replayed(client, new_session, chat, monkeypatch):
+    async def failing_turn_events(*args):
+        raise RuntimeError("upstream exploded")
+        yield
+
+    monkeypatch.setattr(chat_engine, "_turn_events", failing_turn_events)
+    session_id, user_id = new_session()
+    headers = {"Idempotency-Key": "k-fail"}
+
+    first = chat(session_id, user_id, headers=headers)
+    assert first.status_code == 200
+    assert "event: error" in first.text
+    assert "upstream exploded" in first.text
+
+    retry = chat(session_id, user_id, headers=headers)
+    assert retry.status_code == 500
+    assert retry.headers["Idempotent-Replayed"] == "failed"
+    assert "new key" in retry.json()["detail"]
@@ -0,0 +1,98 @@
+import json
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app import archive, crud, migrations, models
+
+# The sessions / messages tables as the first release created them
+OLD_SCHEMA = [
+    "CREATE TABLE users (id VARCHAR PRIMARY KEY, created_at DATETIME)",
+    "CREATE TABLE characters (id VARCHAR PRIMARY KEY, name VARCHAR, description VARCHAR, "
+    "persona_data JSON NOT NULL, created_at DATETIME)",
+    "CREATE TABLE sessions (id VARCHAR PRIMARY KEY, user_id VARCHAR REFERENCES users (id), "
+    "title VARCHAR, created_at DATETIME)",
+    "CREATE TABLE messages (id INTEGER PRIMARY KEY, session_id VARCHAR REFERENCES sessions (id), "
+    "role VARCHAR, content TEXT, created_at DATETIME, character_id VARCHAR REFERENCES characters (id))",
+    "CREATE TABLE session_characters (session_id VARCHAR REFERENCES sessions (id), "
+    "character_id VARCHAR REFERENCES characters (id), PRIMARY KEY (session_id, character_id))",
+    "INSERT INTO users VALUES ('u1', '2025-01-01 00:00:00')",
+    "INSERT INTO sessions VALUES ('s1', 'u1', 'old', '2025-01-01 00:00:00')",
+    "INSERT INTO sessions VALUES ('s2', 'u1', 'empty', '2025-01-02 00:00:00')",
+    "INSERT INTO messages VALUES (1, 's1', 'user', 'hi', '2025-01-05 00:00:00', NULL)",
+]
+
+
+def test_upgrade_schema_adds_and_backfills_new_session_columns(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.execute(text(statement))
+
+    models.Base.metadata.create_all(bind=engine)
+    added = migrations.upgrade_schema(engine)
+    assert set(added) == {"sessions.responder_k", "sessions.archived_at", "sessions.last_activity_at",
+                          "messages.id AUTOINCREMENT"}
+    assert "ix_sessions_last_activity_at" in {i["name"] for i in inspect(engine).get_indexes("sessions")}
+    assert migrations.upgrade_schema(engine) == []
+
+    db = sessionmaker(bind=engine)()
+    try:
+        sessions = {s.id: s for s in crud.get_user_sessions(db, "u1")}
+        assert str(sessions["s1"].last_activity_at) == "2025-01-05 00:00:00"
+        assert str(sessions["s2"].last_activity_at) == "2025-01-02 00:00:00"
+        assert sessions["s1"].archived_at is None and sessions["s1"].responder_k is None
+    finally:
+        db.close()
+    engine.dispose()
+
+
+def test_delete_session_on_a_schema_without_cascades(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    event.listen(engine, "connect", lambda conn, record: conn.execute("PRAGMA foreign_keys=ON"))
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO users VALUES ('u2', '2025-01-01 00:00:00')"))
+        conn.execute(text("INSERT INTO sessions VALUES ('s3', 'u2', 'other', '2025-01-01 00:00:00')"))
+        conn.execute(text("INSERT INTO messages VALUES (2, 's3', 'user', 'keep me', '2025-01-05 00:00:00', NULL)"))
+    models.Base.metadata.create_all(bind=engine)
+    migrations.upgrade_schema(engine)
+
+    db = sessionmaker(bind=engine)()
+    try:
+        assert not crud.delete_session(db, "s1", user_id="u2")  # not the owner
+        assert crud.delete_session(db, "s1", user_id="u1")
+        assert crud.delete_user_sessions_chunked(db, "u1", pause=0) == 1
+        assert db.query(models.Message).count() == 1
+        assert [s.id for s in db.query(models.Session)] == ["s3"]
+    finally:
+        db.close()
+    engine.dispose()
+
+
+def test_messages_rebuilt_with_autoincrement_past_archived_ids(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.execute(text(statement))
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # s2's newest messages (IDs 2 and 3) were archived before the upgrade
+        rows = [{"id": 2, "role": "user", "content": "a", "created_at": None, "character_id": None},
+                {"id": 3, "role": "user", "content": "b", "created_at": None, "character_id": None}]
+        raw = json.dumps(rows).encode()
+        conn.execute(models.SessionArchive.__table__.insert().values(
+            session_id="s2", codec="zlib", payload=archive.compress(raw, "zlib"),
+            message_count=2, raw_size=len(raw)))
+    migrations.upgrade_schema(engine)
+    assert "ix_messages_session_id" in {i["name"] for i in inspect(engine).get_indexes("messages")}
+
+    db = sessionmaker(bind=engine)()
+    try:
+        assert crud.create_message(db, "s2", "new", "user").id == 4
+        assert archive.rehydrate_session(db, "s2") == 2
+        assert sorted(m.id for m in db.query(models.Message)) == [1, 2, 3, 4]
+    finally:
+        db.close()
+    engine.dispose()
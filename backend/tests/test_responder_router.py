@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app.session_cache import CharacterInfo
+from app.utils.responder_router import _term_in_word, score_characters, select_responders
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "app" / "data"
+
+
+@pytest.fixture(scope="module")
+def gurus():
+    characters = []
+    for path in sorted(DATA_DIR.glob("*.json")):
+        data = json.loads(path.read_text(encoding="utf-8"))
+        characters.append(CharacterInfo(id=data["id"], name=data["name"],
+                                        description=data["description"], persona_data=data["persona"]))
+    return characters
+
+
+def _scores(question, characters):
+    return {character.name: score for character, score in score_characters(question, characters)}
+
+
+@pytest.mark.parametrize("term, word, expected", [
+    ("금", "금", True),
+    ("금", "금에", True),
+    ("금", "지금", False),
+    ("금", "현금", False),
+    ("금", "금융주", False),
+    ("금", "금리", False),
+    ("테슬라", "테슬라를", True),
+    ("테슬라", "테슬라주식", True),
+    ("코인", "비트코인", False),
+])
+def test_aliases_match_at_word_start(term, word, expected):
+    assert _term_in_word(term, word) is expected
+
+
+@pytest.mark.parametrize("question", ["지금 삼성전자 사도 돼?", "현금 비중 어떻게?", "금융주 어때?", "금리 전망은?"])
+def test_gold_alias_does_not_fire_inside_other_words(gurus, question):
+    assert _scores(question, gurus)["Michael Burry"] == 0.0
+
+
+@pytest.mark.parametrize("question", ["금 사도 돼?", "금값 어때?", "금에 투자할까"])
+def test_gold_questions_reach_the_gold_bug(gurus, question):
+    selected, _ = select_responders(question, gurus, k=2)
+    assert "Michael Burry" in [character.name for character in selected]
+
+
+def test_korean_alias_matches_english_persona_terms(gurus):
+    scores = _scores("비트코인은 어때?", gurus)
+    assert max(scores, key=scores.get) == "Brian Armstrong"
+    assert scores["Satoshi Nakamoto"] > 0
+    assert scores["Warren Buffett"] == 0.0
+
+
+def test_no_match_falls_back_to_top_k(gurus):
+    selected, scored = select_responders("ㅎㅎ", gurus, k=2)
+    assert len(selected) == 2
+    assert all(score == 0.0 for _, score in scored)
+
+
+def test_routing_off_keeps_session_order(gurus):
+    selected, scored = select_responders("금 사도 돼?", gurus, k=None)
+    assert selected == gurus
+    assert scored == []
@@ -0,0 +1,54 @@
+import pytest
+
+from app import crud, database
+from app.cache import base
+from app.session_cache import character_cache
+
+
+@pytest.fixture(autouse=True)
+def no_version_check_delay(monkeypatch):
+    monkeypatch.setattr(base, "VERSION_CHECK_SECONDS", 0)
+
+
+@pytest.fixture
+def db(client):
+    db = database.SessionLocal()
+    yield db
+    db.close()
+
+
+def test_all_hit_lookup_counts_the_one_query_it_avoids(db):
+    character_ids = [character.id for character in crud.get_all_characters(db)[:2]]
+    crud.get_characters_cached(db, character_ids)  # warm
+
+    saved = character_cache.stats()["queries_saved"]
+    crud.get_characters_cached(db, character_ids)
+    assert character_cache.stats()["queries_saved"] == saved + 1
+
+    crud.get_characters_cached(db, character_ids + ["not-cached"])  # still queries
+    assert character_cache.stats()["queries_saved"] == saved + 1
+
+
+def test_persona_update_invalidates_cached_characters(db):
+    character = crud.get_all_characters(db)[0]
+    original = character.persona_data
+    [cached] = crud.get_characters_cached(db, [character.id])
+    assert cached.persona_data == original
+
+    crud.update_character_persona(db, character.id, {**original, "tone": "changed for the test"})
+    try:
+        [fresh] = crud.get_characters_cached(db, [character.id])
+        assert fresh.persona_data["tone"] == "changed for the test"
+    finally:
+        crud.update_character_persona(db, character.id, original)
+
+
+def test_title_change_invalidates_cached_session_meta(client, new_session, db):
+    session_id, user_id = new_session()
+    assert crud.get_session_meta(db, session_id).title != "renamed"
+    assert crud.get_session_meta(db, session_id) is not None  # served from the cache
+
+    response = client.patch(f"/api/sessions/{session_id}/title", json={"title": "renamed"},
+                            headers={"X-User-ID": user_id})
+    assert response.status_code == 200
+    assert crud.get_session_meta(db, session_id).title == "renamed"
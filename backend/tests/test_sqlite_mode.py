@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.exc import TimeoutError
+
+from app import crud, database, models
+from app.database import create_session_factory
+
+
+def _production_db(tmp_path):
+    engine, read_engine, SessionLocal = create_session_factory(f"sqlite:///{tmp_path / 'prod.db'}", "production")
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(models.User(id="u1"))
+    db.add(models.Session(id="s1", user_id="u1", title="t"))
+    db.commit()
+    db.close()
+    return SessionLocal
+
+
+def test_idle_writer_connection_does_not_block_other_writes(tmp_path):
+    SessionLocal = _production_db(tmp_path)
+    holder, other = SessionLocal(), SessionLocal()
+    try:
+        # Like a session parked across an await after checking out the writer engine
+        holder.connection()
+        message = crud.create_message(other, "s1", "hello", "user")
+        assert message.id is not None
+    finally:
+        holder.close()
+        other.close()
+
+
+def test_concurrent_writes_wait_for_sqlite_lock(tmp_path):
+    SessionLocal = _production_db(tmp_path)
+    errors = []
+
+    def write_messages():
+        db = SessionLocal()
+        try:
+            for i in range(20):
+                crud.create_message(db, "s1", f"message {i}", "user")
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=write_messages) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    db = SessionLocal()
+    try:
+        assert db.query(models.Message).count() == 160
+    finally:
+        db.close()
+
+
+def test_write_transactions_run_one_at_a_time(tmp_path):
+    SessionLocal = _production_db(tmp_path)
+    holder, other = SessionLocal(), SessionLocal()
+    committed = []
+    try:
+        holder.execute(update(models.Session).values(title="held"))
+
+        def write():
+            crud.create_message(other, "s1", "after the holder", "user")
+            committed.append("other")
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join(0.3)
+        assert thread.is_alive()  # waiting on the writer lock, not failing
+
+        committed.append("holder")
+        holder.commit()
+        thread.join(5)
+        assert committed == ["holder", "other"]
+    finally:
+        holder.close()
+        other.close()
+
+
+def test_writer_wait_is_bounded(tmp_path, monkeypatch):
+    SessionLocal = _production_db(tmp_path)
+    monkeypatch.setattr(database, "SQLITE_BUSY_TIMEOUT_MS", 100)
+    holder, other = SessionLocal(), SessionLocal()
+    try:
+        holder.execute(update(models.Session).values(title="held"))
+        with pytest.raises(TimeoutError):
+            crud.create_message(other, "s1", "blocked", "user")
+        holder.rollback()
+        other.rollback()
+        assert crud.create_message(other, "s1", "free again", "user").id is not None
+    finally:
+        holder.close()
+        other.close()